@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ea.settings')
+# Serve the async versions of the dashboard, overview and notifications.
+os.environ.setdefault('EXPENSES_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'expenses.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,6 +64,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'expenses.context_processors.unread_notifications',
             ],
         },
     },
@@ -80,6 +83,55 @@ DATABASES = {
     }
 }
 
+# SQLite performance profile, on with EXPENSES_SQLITE_TUNED=1. Every new
+# connection switches to WAL (readers and the writer no longer block each
+# other) with a larger page cache, memory-mapped reads and in-memory temp
+# tables; synchronous=NORMAL is still crash-safe in WAL mode. Connections are
+# kept between requests, writers wait up to the busy timeout for the lock,
+# and transactions take it up front (BEGIN IMMEDIATE) so they never have to
+# upgrade from a read lock. See expenses/retry.py for what still collides.
+EXPENSES_SQLITE_TUNED = os.environ.get("EXPENSES_SQLITE_TUNED") == "1"
+EXPENSES_SQLITE_PROFILE = {
+    "OPTIONS": {
+        "init_command": (
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            "PRAGMA cache_size=-65536;"       # KiB, i.e. 64 MiB
+            "PRAGMA mmap_size=268435456;"     # 256 MiB
+            "PRAGMA temp_store=MEMORY;"
+        ),
+        "transaction_mode": "IMMEDIATE",
+        "timeout": 10,
+    },
+    "CONN_MAX_AGE": 600,
+    "CONN_HEALTH_CHECKS": True,
+}
+if EXPENSES_SQLITE_TUNED:
+    DATABASES["default"].update(EXPENSES_SQLITE_PROFILE)
+
+# Read replica for the analytics views (expenses/replicas.py). Off unless
+# EXPENSES_REPLICA_DB names a copy of the database, kept current by whatever
+# replicates it or by `manage.py sync_replica`. After changing anything, a
+# user reads from the primary for EXPENSES_REPLICA_PIN_SECONDS, which should
+# exceed the replica's lag.
+DATABASES["replica"] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': os.environ.get("EXPENSES_REPLICA_DB", BASE_DIR / 'replica.sqlite3'),
+    # A second file in tests as well, refreshed with replicas.sync().
+    'TEST': {'NAME': BASE_DIR / 'test_replica.sqlite3'},
+}
+if EXPENSES_SQLITE_TUNED:
+    DATABASES["replica"].update(EXPENSES_SQLITE_PROFILE)
+EXPENSES_REPLICA_ALIAS = "replica" if os.environ.get("EXPENSES_REPLICA_DB") else None
+EXPENSES_REPLICA_PIN_SECONDS = 5
+
+DATABASE_ROUTERS = ["expenses.replicas.ReplicaRouter"]
+
+# expenses/retry.py: how often a write view that finds the database locked
+# is retried, and the first wait in seconds (doubled each time).
+EXPENSES_WRITE_RETRIES = 4
+EXPENSES_WRITE_RETRY_DELAY = 0.05
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -117,5 +169,89 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Default primary key field type
+# https://docs.djangoproject.com/en/6.0/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# ProfileBackend loads the profile with the session user (unread badge);
+# ModelBackend stays listed so sessions it created remain valid.
+AUTHENTICATION_BACKENDS = [
+    'expenses.backends.ProfileBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dash/'
+
+
+# Expenses app
+
+# Rows per page on the keyset-paginated expense lists.
+EXPENSES_LIST_PAGE_SIZE = 50
+EXPENSES_PENDING_PAGE_SIZE = 50
+
+# Status given to expenses posted by run_recurring; PENDING puts them on the
+# pending list until they are marked paid.
+EXPENSES_RECURRING_STATUS = "PENDING"
+
+# generate_notifications: percent-of-budget levels that raise an alert, and
+# how many days ahead recurring bills are announced.
+EXPENSES_BUDGET_ALERT_LEVELS = (80, 100)
+EXPENSES_DUE_REMINDER_DAYS = 3
+
+# Months shown by the budget history page unless ?months= asks otherwise.
+EXPENSES_BUDGET_HISTORY_MONTHS = 12
+
+# archive_expenses (expenses/archive.py): expenses older than this many days
+# move to the archive table, this many per transaction. Keep the age above
+# the year of history the forecast and anomaly checks read.
+EXPENSES_ARCHIVE_AFTER_DAYS = 730
+EXPENSES_ARCHIVE_BATCH_SIZE = 500
+
+# Admin changelists for millions of rows (expenses/changelists.py): joined
+# list queries, autocomplete filters, keyset paging and no count past
+# EXPENSES_ADMIN_COUNT_LIMIT rows. EXPENSES_ADMIN_PERFORMANCE=0 turns it off.
+EXPENSES_ADMIN_PERFORMANCE = os.environ.get("EXPENSES_ADMIN_PERFORMANCE", "1") == "1"
+EXPENSES_ADMIN_COUNT_LIMIT = 10000
+
+# Per-user context cache (expenses/caching.py). EXPENSES_CACHE picks the
+# backend: "file" (default) or "redis" (EXPENSES_REDIS_URL, any
+# Redis-compatible server) are shared by every process, so a write by a
+# management command reaches the web workers; "locmem" is per process and
+# only right when nothing else writes.
+EXPENSES_CACHE_ALIAS = "expenses"
+EXPENSES_CACHE_TIMEOUT = 3600
+
+_EXPENSES_CACHES = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "expenses",
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("EXPENSES_CACHE_DIR", str(BASE_DIR / ".cache")),
+    },
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("EXPENSES_REDIS_URL", "redis://127.0.0.1:6379/1"),
+    },
+}
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    EXPENSES_CACHE_ALIAS: _EXPENSES_CACHES[os.environ.get("EXPENSES_CACHE", "file")],
+}
+
+# Async versions of the dashboard, monthly overview and notifications, which
+# run their independent queries concurrently (expenses/parallel.py). On by
+# default under ASGI (ea/asgi.py); WSGI keeps the sync views.
+EXPENSES_ASYNC_VIEWS = os.environ.get("EXPENSES_ASYNC_VIEWS") == "1"
+
+# Per-view latency/SQL metrics (expenses/metrics.py), served at /metrics/ in
+# Prometheus text format. Off unless EXPENSES_METRICS=1. With a threshold,
+# requests issuing more queries than it are logged with their SQL.
+EXPENSES_METRICS = os.environ.get("EXPENSES_METRICS") == "1"
+EXPENSES_QUERY_LOG_THRESHOLD = (
+    int(os.environ["EXPENSES_QUERY_LOG_THRESHOLD"]) if os.environ.get("EXPENSES_QUERY_LOG_THRESHOLD") else None
+)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import UserProfile, Category, Expense, RecurringExpense, Budget, Goal, Notification, ExportLog
+from .changelists import PerformanceAdmin
+from .models import UserProfile, Category, Expense, ArchivedExpense, RecurringExpense, Budget, Goal, GoalContribution, Notification, ExportLog
 
 
 admin.site.site_header = "Expense Manager Admin"
@@ -23,22 +24,35 @@ class CategoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(Expense)
-class ExpenseAdmin(admin.ModelAdmin):
+class ExpenseAdmin(PerformanceAdmin):
     list_display = ("title", "user", "category", "amount", "date", "status")
     search_fields = ("title", "category__name", "user__username")
     list_filter = ("status", "category", "user", "date")
     list_editable = ("status",)
     ordering = ("-date",)
     date_hierarchy = "date"
+    keyset_field = "date"
+    autocomplete_fields = ("user", "category", "recurring")
+
+
+@admin.register(ArchivedExpense)
+class ArchivedExpenseAdmin(admin.ModelAdmin):
+    list_display = ("title", "user", "category", "amount", "date", "status", "archived_at")
+    search_fields = ("title", "user__username")
+    list_filter = ("status",)
+    ordering = ("-date",)
+    readonly_fields = ("archived_at",)
 
 
 @admin.register(RecurringExpense)
-class RecurringExpenseAdmin(admin.ModelAdmin):
+class RecurringExpenseAdmin(PerformanceAdmin):
     list_display = ("title", "user", "category", "amount", "cycle", "next_date")
     search_fields = ("title", "category__name", "user__username")
     list_filter = ("cycle", "category", "user")
     ordering = ("next_date",)
     date_hierarchy = "next_date"
+    keyset_field = "next_date"
+    autocomplete_fields = ("user", "category")
 
 
 @admin.register(Budget)
@@ -57,20 +71,32 @@ class GoalAdmin(admin.ModelAdmin):
     list_filter = ("deadline",)
     ordering = ("deadline",)
     date_hierarchy = "deadline"
+    # Maintained from the contributions.
+    readonly_fields = ("current_progress", "contribution_count", "first_contribution")
+
+
+@admin.register(GoalContribution)
+class GoalContributionAdmin(admin.ModelAdmin):
+    list_display = ("goal", "user", "amount", "date", "note")
+    search_fields = ("goal__title", "user__username", "note")
+    ordering = ("-date",)
+    date_hierarchy = "date"
 
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(PerformanceAdmin):
     list_display = ("message", "user", "created_at", "is_read")
     search_fields = ("message", "user__username")
-    list_filter = ("is_read", "created_at")
+    list_filter = ("is_read", "user", "created_at")
     ordering = ("-created_at",)
     readonly_fields = ("created_at",)
+    keyset_field = "created_at"
+    autocomplete_fields = ("user",)
 
 
 @admin.register(ExportLog)
 class ExportLogAdmin(admin.ModelAdmin):
-    list_display = ("user", "exported_at")
+    list_display = ("user", "exported_at", "row_count", "byte_count", "duration_ms", "gzipped")
     search_fields = ("user__username",)
     ordering = ("-exported_at",)
     readonly_fields = ("exported_at",)
\ No newline at end of file
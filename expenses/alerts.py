@@ -0,0 +1,137 @@
+"""
+Batch generation of budget alerts and recurring-bill reminders.
+
+Both kinds are computed for every user at once: one query finds the
+budgets whose month-to-date spend has crossed an alert level, one indexed
+query finds the recurring bills due soon. Each alert has a stable ``key``
+(unique on Notification), so existing ones are filtered out before they are
+inserted and a run can be repeated as often as wanted. Alerts are handled
+as plain tuples and written with one ``executemany``; building model
+instances cost more than the queries at this scale.
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import budgets, bulk, caching, unread
+from .models import Budget, Notification, RecurringExpense
+
+
+BATCH_SIZE = 5000
+
+COLUMNS = ["user", "key", "message", "icon", "is_read", "created_at"]
+
+
+class AlertResult:
+    def __init__(self):
+        self.budget_alerts = 0
+        self.due_reminders = 0
+        self.created = 0
+        self.duplicates = 0
+        self.timings = []
+
+    @contextmanager
+    def phase(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.timings.append((name, time.monotonic() - started))
+
+
+def budget_alerts(today):
+    """Notifications for budgets of this month past an alert level."""
+    levels = sorted(settings.EXPENSES_BUDGET_ALERT_LEVELS)
+    month_start = today.replace(day=1)
+    rows = (
+        budgets.with_spent(Budget.objects.filter(month=month_start, amount__gt=0), end=today)
+        .filter(spent__gte=F("amount") * levels[0] / 100)
+        .values_list("id", "user_id", "category__name", "amount", "spent")
+    )
+    for pk, user_id, category, amount, spent in rows.iterator(chunk_size=BATCH_SIZE):
+        used = spent * 100 / amount
+        reached = [level for level in levels if used >= level]
+        if not reached:
+            # Rounding in the database put it on the line; not crossed yet.
+            continue
+        # Only the highest level reached; lower ones are implied.
+        level = reached[-1]
+        if level >= 100:
+            message = f"You've gone over your {category} budget: ₹{spent} of ₹{amount} spent in {month_start:%B}."
+            icon = "🚨"
+        else:
+            message = f"You've used {used:.0f}% of your {category} budget for {month_start:%B} (₹{spent} of ₹{amount})."
+            icon = "⚠️"
+        yield user_id, f"budget:{pk}:{level}", message, icon
+
+
+def due_reminders(today, days):
+    """Notifications for recurring bills due within ``days`` days."""
+    rows = (
+        RecurringExpense.objects.filter(next_date__gte=today, next_date__lte=today + timedelta(days=days))
+        .values_list("id", "user_id", "title", "amount", "next_date")
+    )
+    for pk, user_id, title, amount, next_date in rows.iterator(chunk_size=BATCH_SIZE):
+        when = "today" if next_date == today else f"on {next_date:%b} {next_date.day}"
+        yield user_id, f"due:{pk}:{next_date.isoformat()}", f"{title} (₹{amount}) is due {when}.", "🔔"
+
+
+def unsent(pending):
+    """The alerts in ``pending`` whose key has not been sent yet."""
+    sent = set()
+    for i in range(0, len(pending), BATCH_SIZE):
+        keys = [alert[1] for alert in pending[i:i + BATCH_SIZE]]
+        sent.update(Notification.objects.filter(key__in=keys).values_list("key", flat=True))
+    return [alert for alert in pending if alert[1] not in sent]
+
+
+def send(new):
+    """Insert ``(user_id, key, message, icon)`` alerts; returns how many."""
+    if not new:
+        return 0
+    # Conflicts are ignored in case a concurrent run inserted the same keys;
+    # only the rows stamped with this run's created_at are counted.
+    now = timezone.now()
+    created_at = Notification._meta.get_field("created_at").get_db_prep_save(now, connection)
+    sql = bulk.insert_sql(Notification, COLUMNS, ignore_conflicts=True)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [(*alert, False, created_at) for alert in new])
+        inserted = Counter()
+        for i in range(0, len(new), BATCH_SIZE):
+            keys = [alert[1] for alert in new[i:i + BATCH_SIZE]]
+            inserted.update(
+                Notification.objects.filter(key__in=keys, created_at=now).values_list("user_id", flat=True)
+            )
+        unread.adjust_many(inserted)
+        caching.bump_many(inserted)
+    return sum(inserted.values())
+
+
+def generate(today=None, days=None):
+    today = today or date.today()
+    days = settings.EXPENSES_DUE_REMINDER_DAYS if days is None else days
+    result = AlertResult()
+
+    with result.phase("budgets"):
+        pending = list(budget_alerts(today))
+        result.budget_alerts = len(pending)
+    with result.phase("reminders"):
+        reminders = list(due_reminders(today, days))
+        result.due_reminders = len(reminders)
+        pending += reminders
+
+    with result.phase("dedupe"):
+        new = unsent(pending)
+        result.duplicates = len(pending) - len(new)
+
+    with result.phase("insert"):
+        result.created = send(new)
+
+    return result
@@ -0,0 +1,124 @@
+"""
+Payloads for the JSON analytics endpoints.
+
+Every payload is columnar: one array per field, all the same length, so a
+series of N points costs N values per field instead of N objects with
+repeated keys, and charts can take the arrays as they are. Amounts are
+plain numbers; they are for display, the pages keep the exact Decimals.
+
+Everything is read from the SpendingRollup buckets, so the cost follows
+the number of days in the range, not the number of expenses.
+"""
+from datetime import datetime, time, timezone as dt_timezone
+
+from . import budgets, caching, rollups
+from .models import Budget
+
+
+STATUSES = ("PAID", "PENDING")
+
+# The most buckets a grouped range may span; every bucket is built even
+# when it is empty.
+MAX_BUCKETS = {"day": 3660, "week": 520, "month": 1200, "year": 100}
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+def parse_range(params, today, group=None):
+    """
+    ``(start, end)`` from ``from``/``to`` (YYYY-MM-DD); this month by default.
+    With a ``group``, the range may span at most its MAX_BUCKETS.
+    """
+    try:
+        start = datetime.strptime(params["from"], "%Y-%m-%d").date() if params.get("from") else today.replace(day=1)
+        end = datetime.strptime(params["to"], "%Y-%m-%d").date() if params.get("to") else today
+    except ValueError:
+        raise InvalidQuery("from and to must be YYYY-MM-DD")
+    if start > end:
+        raise InvalidQuery("from must not be after to")
+    if group is not None and rollups.bucket_count(start, end, group) > MAX_BUCKETS[group]:
+        raise InvalidQuery(f"a range grouped by {group} may span at most {MAX_BUCKETS[group]} {group}s")
+    return start, end
+
+
+def parse_status(params):
+    status = params.get("status") or None
+    if status is not None and status not in STATUSES:
+        raise InvalidQuery(f"status must be one of {', '.join(STATUSES)}")
+    return status
+
+
+def parse_group(params):
+    group = params.get("group") or "day"
+    if group not in rollups.GROUPINGS:
+        raise InvalidQuery(f"group must be one of {', '.join(rollups.GROUPINGS)}")
+    return group
+
+
+def _number(value):
+    return float(value or 0)
+
+
+def _envelope(start, end, **columns):
+    return {"from": start.isoformat(), "to": end.isoformat(), **columns}
+
+
+def spend_series(user, group, start, end, status=None):
+    rows = list(rollups.by_period(user, group, start, end, status))
+    return _envelope(
+        start, end, group=group, status=status,
+        period=[row["period"].isoformat() for row in rows],
+        total=[_number(row["total"]) for row in rows],
+        count=[row["count"] for row in rows],
+    )
+
+
+def spend_by_category(user, start, end, status=None):
+    rows = list(rollups.by_category(user, start, end, status))
+    return _envelope(
+        start, end, status=status,
+        category=[row["name"] for row in rows],
+        total=[_number(row["total"]) for row in rows],
+    )
+
+
+def budget_vs_actual(user, start, end):
+    """
+    Budgets of every month overlapping the range against PAID spend in
+    their category and month, counted within the range. One query.
+    """
+    rows = list(
+        budgets.with_spent(
+            Budget.objects.filter(user=user, month__gte=start.replace(day=1), month__lte=end),
+            start, end,
+        )
+        .order_by("month")
+        .values_list("month", "category__name", "amount", "spent")
+    )
+    # Ordered by name here; in SQL that would sort past the month index.
+    rows.sort(key=lambda row: (row[0], row[1]))
+    return _envelope(
+        start, end,
+        month=[month.isoformat() for month, *_ in rows],
+        category=[name for _, name, _, _ in rows],
+        budget=[_number(amount) for _, _, amount, _ in rows],
+        spent=[_number(spent) for *_, spent in rows],
+    )
+
+
+# ------------------------------------------------------
+# CONDITIONAL GET
+# ------------------------------------------------------
+def etag(user, today):
+    """Changes whenever the user's data does (or the day, for default ranges)."""
+    return f"{user.pk}-{caching.data_version(user.pk)}-{today.isoformat()}"
+
+
+def last_modified(user, today):
+    """
+    When the user's data last changed, but no earlier than the start of
+    ``today``, as responses with a default range move on with the date.
+    """
+    return max(caching.changed_at(user.pk), datetime.combine(today, time.min, tzinfo=dt_timezone.utc))
@@ -0,0 +1,239 @@
+"""
+Spending anomaly detection.
+
+A user's recent expenses are loaded as NumPy arrays (date ordinals, amounts
+in cents, category ids) and three checks run over them as whole-array
+operations, with no Python loop per expense:
+
+* outliers: an expense more than ``Z_THRESHOLD`` standard deviations above
+  the previous ``WINDOW`` expenses of its category;
+* jumps: a category's month total at least ``JUMP_RATIO`` times the month
+  before;
+* duplicates: the same amount in the same category within
+  ``DUPLICATE_DAYS`` days.
+
+``notify`` sends what was found recently as keyed Notifications (see
+alerts.py, so re-running sends nothing twice); the dashboard's insights
+card lists the latest of them.
+"""
+import itertools
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import connection
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+
+from . import alerts
+from .models import Category, Expense
+
+
+HISTORY_DAYS = 365
+# Only findings this recent are announced; older ones were (or should have
+# been) announced by an earlier run.
+RECENT_DAYS = 7
+
+WINDOW = 30
+MIN_HISTORY = 5
+Z_THRESHOLD = 3.0
+
+JUMP_RATIO = 1.5
+JUMP_MIN_CENTS = 100_00
+
+DUPLICATE_DAYS = 1
+DUPLICATE_MIN_CENTS = 500_00
+
+KEY_PREFIX = "anomaly:"
+
+NO_CATEGORY = -1
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class History:
+    """A user's expenses as parallel arrays."""
+
+    def __init__(self, ids, days, cents, categories):
+        self.ids = ids
+        self.days = days
+        self.cents = cents
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """From ``(id, date, amount, category_id)`` rows as the driver returns them."""
+        if not rows:
+            return cls(*(np.empty(0, dtype=np.int64) for _ in range(4)))
+        # One flat object array sliced into columns; zip(*rows) would build
+        # four million-element tuples first.
+        table = np.fromiter(
+            itertools.chain.from_iterable(rows), dtype=object, count=4 * len(rows)
+        ).reshape(len(rows), 4)
+        return cls(
+            table[:, 0].astype(np.int64),
+            table[:, 1].astype("datetime64[D]").astype(np.int64) + EPOCH_ORDINAL,
+            np.rint(table[:, 2].astype(np.float64) * 100).astype(np.int64),
+            table[:, 3].astype(np.int64),
+        )
+
+
+def load(user, today, days=HISTORY_DAYS):
+    """The user's expenses of the last ``days`` days up to ``today``."""
+    qs = (
+        Expense.objects.filter(user=user, date__gt=today - timedelta(days=days), date__lte=today)
+        .order_by()
+        .values_list("id", "date", "amount", Coalesce("category_id", Value(NO_CATEGORY)))
+    )
+    # Straight from the cursor: skipping Django's per-value converters is
+    # most of the load time at a million rows.
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return History.from_rows(cursor.fetchall())
+
+
+# ------------------------------------------------------
+# CHECKS
+# ------------------------------------------------------
+def outliers(history):
+    """
+    ``(index, z, mean_cents)`` arrays for expenses far above the mean of the
+    ``WINDOW`` expenses before them in the same category.
+    """
+    order = np.lexsort((history.ids, history.days, history.categories))
+    categories = history.categories[order]
+    # In currency units: squares of cents summed over a million rows would
+    # run past float64's exact range.
+    x = history.cents[order] / 100.0
+
+    pos = np.arange(len(x))
+    group_start = np.maximum.accumulate(
+        np.where(np.r_[True, categories[1:] != categories[:-1]], pos, 0)
+    )
+    lo = np.maximum(group_start, pos - WINDOW)
+    count = pos - lo
+
+    sums = np.r_[0.0, np.cumsum(x)]
+    squares = np.r_[0.0, np.cumsum(x * x)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = (sums[pos] - sums[lo]) / count
+        std = np.sqrt(np.maximum((squares[pos] - squares[lo]) / count - mean * mean, 0))
+        z = (x - mean) / std
+    flagged = (count >= MIN_HISTORY) & (std > 0) & (z >= Z_THRESHOLD)
+    return order[flagged], z[flagged], np.rint(mean[flagged] * 100).astype(np.int64)
+
+
+def jumps(history):
+    """
+    ``(category, month, total_cents, previous_cents)`` arrays for category
+    months that spent ``JUMP_RATIO`` times the month before. ``month`` is a
+    ``datetime64[M]``.
+    """
+    months = (history.days - EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    if not len(months):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty.astype("datetime64[M]"), empty, empty
+    first = months.min()
+    span = months.max() - first + 1
+    codes, category_index = np.unique(history.categories, return_inverse=True)
+
+    keys, inverse = np.unique(category_index * span + (months - first), return_inverse=True)
+    totals = np.rint(np.bincount(inverse, weights=history.cents)).astype(np.int64)
+
+    # The month before is key - 1, unless the key is the category's first month.
+    before = np.searchsorted(keys, keys - 1)
+    has_before = (keys % span > 0) & (before < len(keys))
+    has_before[has_before] = keys[before[has_before]] == keys[has_before] - 1
+    previous = np.where(has_before, totals[np.minimum(before, len(keys) - 1)], 0)
+
+    flagged = (previous > 0) & (totals >= previous * JUMP_RATIO) & (totals - previous >= JUMP_MIN_CENTS)
+    keys = keys[flagged]
+    return (
+        codes[keys // span],
+        (keys % span + first).astype("datetime64[M]"),
+        totals[flagged],
+        previous[flagged],
+    )
+
+
+def duplicates(history):
+    """``(index, earlier_index)`` arrays for charges repeating an earlier one."""
+    order = np.lexsort((history.days, history.cents, history.categories))
+    categories = history.categories[order]
+    cents = history.cents[order]
+    days = history.days[order]
+    same = (
+        (categories[1:] == categories[:-1])
+        & (cents[1:] == cents[:-1])
+        & (days[1:] - days[:-1] <= DUPLICATE_DAYS)
+        & (cents[1:] >= DUPLICATE_MIN_CENTS)
+    )
+    return order[1:][same], order[:-1][same]
+
+
+# ------------------------------------------------------
+# FINDINGS
+# ------------------------------------------------------
+def _money(cents):
+    return f"₹{cents / 100:.2f}"
+
+
+def _day(ordinal):
+    day = date.fromordinal(int(ordinal))
+    return f"{day:%b} {day.day}"
+
+
+def detect(user, today, history=None):
+    """
+    ``(user_id, key, message, icon)`` alerts for anomalies found in the last
+    ``RECENT_DAYS`` days.
+    """
+    history = load(user, today) if history is None else history
+    if not len(history):
+        return []
+    names = dict(Category.objects.filter(user=user).values_list("id", "name"))
+    names[NO_CATEGORY] = "Uncategorized"
+    recent = today.toordinal() - RECENT_DAYS
+    found = []
+
+    index, z, mean = outliers(history)
+    keep = history.days[index] > recent
+    for i, score, usual in zip(index[keep].tolist(), z[keep].tolist(), mean[keep].tolist()):
+        found.append((
+            user.pk, f"{KEY_PREFIX}outlier:{history.ids[i]}",
+            f"Unusual {names.get(int(history.categories[i]), 'expense')} charge of "
+            f"{_money(history.cents[i])} on {_day(history.days[i])} "
+            f"(usually about {_money(usual)}; {score:.1f}σ above).",
+            "📈",
+        ))
+
+    categories, months, totals, previous = jumps(history)
+    this_month = np.datetime64(today, "M")
+    keep = months == this_month
+    for category, total, before in zip(categories[keep].tolist(), totals[keep].tolist(), previous[keep].tolist()):
+        found.append((
+            user.pk, f"{KEY_PREFIX}jump:{category}:{today:%Y-%m}",
+            f"{names.get(category, 'Spending')} is at {_money(total)} in {today:%B}, "
+            f"{total / before:.1f}× last month's {_money(before)}.",
+            "🚀",
+        ))
+
+    index, earlier = duplicates(history)
+    keep = history.days[index] > recent
+    for i, j in zip(index[keep].tolist(), earlier[keep].tolist()):
+        found.append((
+            user.pk, f"{KEY_PREFIX}duplicate:{history.ids[i]}",
+            f"Possible duplicate: {_money(history.cents[i])} in "
+            f"{names.get(int(history.categories[i]), 'an expense')} was charged twice "
+            f"({_day(history.days[j])} and {_day(history.days[i])}).",
+            "👯",
+        ))
+    return found
+
+
+def notify(user, today=None):
+    """Send the user's new anomalies as notifications; returns how many."""
+    today = today or date.today()
+    return alerts.send(alerts.unsent(detect(user, today)))
@@ -0,0 +1,84 @@
+"""
+Moving old expenses out of the hot table.
+
+Expenses dated before the cutoff (``EXPENSES_ARCHIVE_AFTER_DAYS`` ago) are
+moved into ArchivedExpense in batches of ``EXPENSES_ARCHIVE_BATCH_SIZE``,
+each copied and deleted in a transaction of its own, so a run can stop at
+any point and the next one carries on where it left off. The expense
+lists, search and pagination then only ever touch the recent rows.
+
+Rows move with ``INSERT ... SELECT`` and a plain ``DELETE``, so no model
+signals fire: the rollup keeps the archived amounts, and everything summed
+from it (dashboards, range reports, the analytics API, the forecast) still
+covers the whole history. The search triggers drop archived rows from the
+index. Readers of individual rows that can reach back past the cutoff,
+like the CSV export, add the archive with ``union``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import caching
+from .models import ArchivedExpense, Expense
+
+
+FIELDS = ["id", "user", "category", "title", "amount", "date", "note", "status", "recurring"]
+
+
+def cutoff(today=None):
+    """The first day that stays in the hot table."""
+    today = today or timezone.now().date()
+    return today - timedelta(days=settings.EXPENSES_ARCHIVE_AFTER_DAYS)
+
+
+def _move(ids, archived_at):
+    ops = connection.ops
+    columns = ", ".join(ops.quote_name(Expense._meta.get_field(name).column) for name in FIELDS)
+    hot = ops.quote_name(Expense._meta.db_table)
+    archive = ops.quote_name(ArchivedExpense._meta.db_table)
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {archive} ({columns}, {ops.quote_name('archived_at')}) "
+            f"SELECT {columns}, %s FROM {hot} WHERE id IN ({placeholders})",
+            [ops.adapt_datetimefield_value(archived_at), *ids],
+        )
+        cursor.execute(f"DELETE FROM {hot} WHERE id IN ({placeholders})", ids)
+
+
+def archive(before=None, batch_size=None, max_batches=None, progress=None):
+    """
+    Move every expense dated before ``before`` (default: ``cutoff()``) into
+    the archive, ``batch_size`` rows per transaction. With ``max_batches``
+    the run stops after that many; calling again resumes. ``progress`` is
+    called with the running total after each batch. Returns rows moved.
+    """
+    before = before or cutoff()
+    batch_size = batch_size or settings.EXPENSES_ARCHIVE_BATCH_SIZE
+    # One placeholder per id, plus the timestamp.
+    batch_size = min(batch_size, (connection.features.max_query_params or batch_size + 1) - 1)
+
+    moved = batches = 0
+    for user_id in User.objects.order_by("pk").values_list("pk", flat=True):
+        while max_batches is None or batches < max_batches:
+            with transaction.atomic():
+                # Read inside the transaction: an edit may have just moved
+                # an expense past the cutoff.
+                ids = list(
+                    Expense.objects.filter(user_id=user_id, date__lt=before)
+                    .order_by("date", "pk").values_list("pk", flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+                _move(ids, timezone.now())
+                caching.bump(user_id)
+            moved += len(ids)
+            batches += 1
+            if progress:
+                progress(moved)
+        else:
+            break
+    return moved
@@ -0,0 +1,124 @@
+"""
+Budget versus actual spend.
+
+Each budget is annotated with a correlated subquery that sums the
+SpendingRollup buckets of its user, category and month, an indexed range
+of at most a month of days. The month's end is worked out in SQL from the
+budget's own month, so budgets of any number of months come back with
+their spend in one query.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import (
+    DateField, DecimalField, ExpressionWrapper, OuterRef, Subquery, Sum, Value,
+)
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .models import Budget, SpendingRollup
+
+
+MAX_HISTORY_MONTHS = 60
+
+
+def month_end(month_start):
+    return (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def month_starts(today, months):
+    """The first days of the last ``months`` months up to ``today``'s, newest first."""
+    index = today.year * 12 + today.month - 1
+    return [
+        today.replace(year=(index - k) // 12, month=(index - k) % 12 + 1, day=1)
+        for k in range(months)
+    ]
+
+
+def with_spent(budgets, start=None, end=None):
+    """
+    Annotate ``budgets`` with ``spent``: PAID spend in the budget's category
+    and month, counted from ``start`` and up to ``end`` when given (today,
+    for month-to-date).
+    """
+    # Budget months are first days, so 31 days on is always next month.
+    next_month = TruncMonth(ExpressionWrapper(
+        OuterRef("month") + timedelta(days=31), output_field=DateField(),
+    ))
+    buckets = SpendingRollup.objects.filter(
+        user=OuterRef("user"), category=OuterRef("category"), status="PAID",
+        day__gte=OuterRef("month"), day__lt=next_month,
+    )
+    if start is not None:
+        buckets = buckets.filter(day__gte=start)
+    if end is not None:
+        buckets = buckets.filter(day__lte=end)
+    spent = buckets.order_by().values("category").annotate(total=Sum("total")).values("total")
+
+    return budgets.annotate(
+        spent=Coalesce(
+            Subquery(spent),
+            Value(0),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        ),
+    )
+
+
+def progress(budgets, start=None, end=None):
+    """
+    ``with_spent`` evaluated, each budget also given ``remaining``,
+    ``used_percent`` (None for a zero budget) and ``state``: "over" past its
+    amount, "near" from the lowest of ``EXPENSES_BUDGET_ALERT_LEVELS``,
+    otherwise "ok". Worked out here rather than in SQL, where each would
+    repeat the spend subquery.
+    """
+    near = min(settings.EXPENSES_BUDGET_ALERT_LEVELS)
+    rows = list(with_spent(budgets, start, end))
+    for budget in rows:
+        budget.remaining = budget.amount - budget.spent
+        budget.used_percent = budget.spent * 100 / budget.amount if budget.amount > 0 else None
+        if budget.spent > budget.amount:
+            budget.state = "over"
+        elif budget.used_percent is not None and budget.used_percent >= near:
+            budget.state = "near"
+        else:
+            budget.state = "ok"
+    return rows
+
+
+def month_total(user, month_start):
+    """The sum of ``user``'s budgets for the month starting ``month_start``."""
+    return (
+        Budget.objects.filter(user=user, month=month_start)
+        .aggregate(total=Sum("amount"))["total"] or 0
+    )
+
+
+class Month:
+    """A month's budgets, from ``progress``, by category name, and their totals."""
+
+    def __init__(self, start, budgets):
+        self.start = start
+        self.budgets = sorted(budgets, key=lambda budget: budget.category.name)
+        self.amount = sum(budget.amount for budget in budgets)
+        self.spent = sum(budget.spent for budget in budgets)
+        self.remaining = self.amount - self.spent
+        self.over = sum(budget.state == "over" for budget in budgets)
+
+
+def history(user, today, months):
+    """
+    A ``Month`` for each of the last ``months`` months, newest first, with
+    every budget's progress up to ``today``. One query.
+    """
+    starts = month_starts(today, months)
+    rows = progress(
+        Budget.objects.filter(user=user, month__gte=starts[-1], month__lte=starts[0])
+        .select_related("category")
+        .order_by("-month"),
+        end=today,
+    )
+    by_month = defaultdict(list)
+    for budget in rows:
+        by_month[budget.month].append(budget)
+    return [Month(start, by_month[start]) for start in starts]
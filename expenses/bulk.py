@@ -0,0 +1,138 @@
+"""
+Set-based writes shared by the batch jobs (import, recurring postings) and
+the bulk actions on the expense and notification lists.
+
+At hundreds of thousands of rows the ORM's per-object SQL compilation costs
+more than the database work, so rows are passed as plain tuples and written
+with one ``executemany`` per call. Callers keep the rollup in step
+themselves, since no model signals fire.
+
+The list actions change a user's selection with one filtered ``UPDATE`` or
+``DELETE`` each. The rollup moves by bucket, from one grouped read of the
+selection taken in the same transaction, and the unread counter by the
+number of rows changed, so their cost doesn't grow with the selection.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.constants import OnConflict
+
+from . import caching, rollups, search, unread
+from .models import Expense, Notification
+
+
+# One placeholder per selected id, well under SQLite's 999.
+MAX_SELECTION = 500
+
+
+def insert_sql(model, fields, ignore_conflicts=False):
+    """
+    A parameterised INSERT for ``fields`` of ``model``. With
+    ``ignore_conflicts`` rows that violate a unique constraint are skipped,
+    in each backend's own dialect, as ``bulk_create`` would.
+    """
+    ops = connection.ops
+    on_conflict = OnConflict.IGNORE if ignore_conflicts else None
+    model_fields = [model._meta.get_field(name) for name in fields]
+    sql = "{} {} ({}) VALUES ({})".format(
+        ops.insert_statement(on_conflict=on_conflict),
+        ops.quote_name(model._meta.db_table),
+        ", ".join(ops.quote_name(f.column) for f in model_fields),
+        ", ".join(["%s"] * len(model_fields)),
+    )
+    suffix = ops.on_conflict_suffix_sql(model_fields, on_conflict, None, None)
+    return f"{sql} {suffix}" if suffix else sql
+
+
+def insert_expenses(fields, rows):
+    """
+    Insert expense ``rows``, tuples of database-ready values in ``fields``
+    order, and index them for search. Must run inside a transaction.
+    """
+    if not rows:
+        return
+    with search.bulk_insert(), connection.cursor() as cursor:
+        cursor.executemany(insert_sql(Expense, fields), rows)
+
+
+# ------------------------------------------------------
+# LIST ACTIONS
+# ------------------------------------------------------
+def _raw_delete(queryset):
+    # QuerySet.delete() would load every row to send its delete signals.
+    return queryset._raw_delete(queryset.db)
+
+
+def _bucket_moves(user_id, expenses, changes=None):
+    """
+    Rollup deltas for ``expenses`` taking ``changes`` (``category_id``,
+    ``date`` and/or ``status``), or for deleting them when None.
+    """
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    buckets = (
+        expenses.order_by().values("category_id", "date", "status")
+        .annotate(total=Sum("amount"), n=Count("id"))
+    )
+    for bucket in buckets:
+        old = (user_id, bucket["category_id"], bucket["date"], bucket["status"])
+        deltas[old][0] -= bucket["total"]
+        deltas[old][1] -= bucket["n"]
+        if changes is not None:
+            new = (
+                user_id,
+                changes.get("category_id", bucket["category_id"]),
+                changes.get("date", bucket["date"]),
+                changes.get("status", bucket["status"]),
+            )
+            deltas[new][0] += bucket["total"]
+            deltas[new][1] += bucket["n"]
+    return {key: tuple(value) for key, value in deltas.items()}
+
+
+def update_expenses(user, ids, **changes):
+    """
+    Set ``changes`` on ``user``'s expenses among ``ids`` that differ from
+    them; returns how many changed. Raises IntegrityError, changing
+    nothing, if two postings of one recurring bill would share a date.
+    """
+    expenses = Expense.objects.filter(user=user, pk__in=ids).exclude(**changes)
+    with transaction.atomic():
+        moves = _bucket_moves(user.pk, expenses, changes)
+        changed = expenses.update(**changes)
+        rollups.apply_many(moves)
+        caching.bump(user.pk)
+    return changed
+
+
+def delete_expenses(user, ids):
+    """Delete ``user``'s expenses among ``ids``; returns how many went."""
+    expenses = Expense.objects.filter(user=user, pk__in=ids)
+    with transaction.atomic():
+        moves = _bucket_moves(user.pk, expenses)
+        deleted = _raw_delete(expenses)
+        rollups.apply_many(moves)
+        caching.bump(user.pk)
+    return deleted
+
+
+def mark_notifications_read(user, ids):
+    """Mark ``user``'s notifications among ``ids`` read; returns how many were unread."""
+    with transaction.atomic():
+        changed = Notification.objects.filter(user=user, pk__in=ids, is_read=False).update(is_read=True)
+        unread.adjust(user.pk, -changed)
+        caching.bump(user.pk)
+    return changed
+
+
+def delete_notifications(user, ids):
+    """Delete ``user``'s notifications among ``ids``; returns how many went."""
+    notifications = Notification.objects.filter(user=user, pk__in=ids)
+    with transaction.atomic():
+        # Unread ones first, so the counter drops by exactly their number.
+        was_unread = _raw_delete(notifications.filter(is_read=False))
+        deleted = was_unread + _raw_delete(notifications)
+        unread.adjust(user.pk, -was_unread)
+        caching.bump(user.pk)
+    return deleted
@@ -0,0 +1,171 @@
+"""
+Per-user cache for computed page contexts.
+
+Every user has a data version, stored in the cache itself. Cached contexts
+are keyed on it, and any write to the user's data (see signals.py, plus the
+bulk jobs that bypass signals) replaces it with a new value, so the next
+read misses and rebuilds. Nothing has to be deleted; stale entries simply
+stop being addressed and expire.
+
+The backend is the ``EXPENSES_CACHE_ALIAS`` entry of ``CACHES``: a file
+cache by default, or Redis, both shared by every process, so the versions
+bumped by management commands reach the web workers (see the
+EXPENSES_CACHE setting). Local memory only suits a single process that
+does every write itself.
+"""
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+_lock = threading.Lock()
+_counters = Counter()
+
+
+def _cache():
+    return caches[settings.EXPENSES_CACHE_ALIAS]
+
+
+def _version_key(user_id):
+    return f"expenses:version:{user_id}"
+
+
+def _new_version():
+    # Never reused, so a version can't come back after the key is evicted.
+    return time.time_ns()
+
+
+def _generation_key(user_id):
+    return f"expenses:generation:{user_id}"
+
+
+def _get_or_add(key):
+    cache = _cache()
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _new_version(), None)
+        value = cache.get(key)
+    return value
+
+
+def data_version(user_id):
+    return _get_or_add(_version_key(user_id))
+
+
+def new_user(user_id):
+    """
+    Forget everything cached under ``user_id``, daily entries included.
+    Ids can be handed out again after a rollback, so a new user must not
+    inherit what was cached for the old one.
+    """
+    _cache().set(_generation_key(user_id), _new_version(), None)
+    bump(user_id)
+
+
+def changed_at(user_id):
+    """When the user's data last changed, as far as the cache knows."""
+    return datetime.fromtimestamp(data_version(user_id) / 1e9, tz=timezone.utc)
+
+
+def bump(user_id):
+    bump_many([user_id])
+
+
+def bump_many(user_ids):
+    """
+    Invalidate everything cached for ``user_ids``. Done straight away and
+    again when the surrounding transaction commits, so a reader that
+    rebuilt from the old rows in between can't leave a stale entry behind.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    def apply():
+        version = _new_version()
+        _cache().set_many({_version_key(pk): version for pk in user_ids}, None)
+
+    apply()
+    transaction.on_commit(apply)
+
+
+def cached_context(user, name, parts, build):
+    """
+    Return ``build()``'s result for ``user``, from the cache when the user's
+    data hasn't changed since it was stored. ``parts`` are whatever else the
+    result depends on (dates, query parameters).
+    """
+    cache = _cache()
+    key = _context_key(user, name, parts)
+    context = cache.get(key)
+    if context is not None:
+        _count(name, "hits")
+        return context
+
+    _count(name, "misses")
+    context = build()
+    cache.set(key, context, settings.EXPENSES_CACHE_TIMEOUT)
+    return context
+
+
+async def acached_context(user, name, parts, build):
+    """``cached_context`` for async views; ``build`` is a coroutine function."""
+    cache = _cache()
+    key = _context_key(user, name, parts)
+    context = await cache.aget(key)
+    if context is not None:
+        _count(name, "hits")
+        return context
+
+    _count(name, "misses")
+    context = await build()
+    await cache.aset(key, context, settings.EXPENSES_CACHE_TIMEOUT)
+    return context
+
+
+def _context_key(user, name, parts):
+    return ":".join(["expenses", "ctx", name, str(user.pk), str(data_version(user.pk)), *map(str, parts)])
+
+
+def cached_daily(user, name, today, build):
+    """
+    Like ``cached_context``, but kept for the whole of ``today`` whatever
+    the user changes; for results that are costly and only need to be
+    fresh once a day.
+    """
+    cache = _cache()
+    generation = _get_or_add(_generation_key(user.pk))
+    key = ":".join(["expenses", "daily", name, str(user.pk), str(generation), today.isoformat()])
+    value = cache.get(key)
+    if value is not None:
+        _count(name, "hits")
+        return value
+
+    _count(name, "misses")
+    value = build()
+    cache.set(key, value, 24 * 3600)
+    return value
+
+
+def _count(name, outcome):
+    with _lock:
+        _counters[(name, outcome)] += 1
+
+
+def stats():
+    """Hit/miss counts per context name for this process."""
+    with _lock:
+        result = {}
+        for (name, outcome), value in _counters.items():
+            result.setdefault(name, {"hits": 0, "misses": 0})[outcome] = value
+        return result
+
+
+def reset_stats():
+    with _lock:
+        _counters.clear()
@@ -0,0 +1,318 @@
+"""
+Admin changelists that stay fast on millions of rows.
+
+With ``EXPENSES_ADMIN_PERFORMANCE`` on, a ModelAdmin built on
+PerformanceAdmin:
+
+* joins the foreign keys in ``list_display`` into the list query instead of
+  fetching them row by row;
+* shows foreign-key ``list_filter`` entries as AutocompleteFilter, a search
+  box over the admin's autocomplete view, instead of a link for every user
+  or category there is;
+* leaves out ``date_hierarchy``, whose drill-down reads the distinct dates
+  of the whole filtered list;
+* offers no facet counts, which count every filter choice;
+* never counts more than ``EXPENSES_ADMIN_COUNT_LIMIT`` rows: an unfiltered
+  list shows the database's own row estimate, a filtered one "10000+";
+* in its default order, pages by keyset (the previous page's last
+  ``keyset_field`` value and id) instead of ``OFFSET``, so a late page costs
+  what the first does. Sorting by a column falls back to numbered pages.
+
+With it off they are stock changelists.
+"""
+from django import forms
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters, ShowFacets
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.db.models import ForeignKey, Q
+from django.utils.functional import cached_property
+
+
+AFTER_VAR = "after"
+BEFORE_VAR = "before"
+CURSOR_VARS = (AFTER_VAR, BEFORE_VAR)
+
+
+def performance_mode():
+    return settings.EXPENSES_ADMIN_PERFORMANCE
+
+
+# ------------------------------------------------------
+# COUNTS
+# ------------------------------------------------------
+def estimated_count(model, using="default"):
+    """
+    ``model``'s row count as last measured by ANALYZE (SQLite's
+    ``sqlite_stat1``, PostgreSQL's ``pg_class``); None when never analyzed.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+            # One row per index, each starting with the rows it covers;
+            # partial indexes cover fewer than the table has.
+            counts = [int(stat.split()[0]) for stat, in cursor.fetchall()]
+            return max(counts) if counts else None
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+    return None
+
+
+def capped_count(queryset, limit=None):
+    """``(count, exact)``, counting no further than ``limit`` rows."""
+    limit = limit or settings.EXPENSES_ADMIN_COUNT_LIMIT
+    count = queryset.order_by()[:limit + 1].count()
+    return min(count, limit), count <= limit
+
+
+class CappedPaginator(Paginator):
+    """Numbered pages over ``capped_count``; pages past the cap can't be reached."""
+
+    @cached_property
+    def count(self):
+        count, self.exact = capped_count(self.object_list)
+        return count
+
+
+# ------------------------------------------------------
+# FILTERS
+# ------------------------------------------------------
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    A foreign-key filter chosen through a search box backed by the admin's
+    autocomplete view, so only the selected row is ever read. The related
+    model's admin needs ``search_fields``.
+    """
+    template = "admin/expenses/autocomplete_filter.html"
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f"{field_path}__{field.target_field.name}__exact"
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.widget = autocomplete_widget(field, model_admin.admin_site, field_path)
+        self.title = field.verbose_name
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        value = self.used_parameters.get(self.lookup_kwarg)
+        value = value[-1] if isinstance(value, list) else value
+        yield {
+            "widget": self.widget.render(self.lookup_kwarg, value),
+            "id": self.widget.attrs["id"],
+            # The script puts the chosen id in place of the marker.
+            "select_url": changelist.get_query_string({self.lookup_kwarg: "__value__"}),
+            "clear_url": changelist.get_query_string(remove=[self.lookup_kwarg]),
+        }
+
+
+def autocomplete_widget(field, admin_site, field_path=None):
+    choice = forms.ModelChoiceField(
+        queryset=field.remote_field.model._default_manager.all(),
+        widget=AutocompleteSelect(field, admin_site, attrs={
+            "id": f"autocomplete-filter-{field_path or field.name}", "data-width": "100%",
+        }),
+        required=False,
+    )
+    return choice.widget
+
+
+# ------------------------------------------------------
+# KEYSET PAGING
+# ------------------------------------------------------
+def encode_cursor(obj, field):
+    return f"{getattr(obj, field).isoformat()}.{obj.pk}"
+
+
+def decode_cursor(value, model, field):
+    """``(value, id)`` or None for a missing or malformed cursor."""
+    if not value:
+        return None
+    try:
+        key, pk = value.rsplit(".", 1)
+        key = model._meta.get_field(field).to_python(key)
+        return (key, int(pk)) if key is not None else None
+    except (ValueError, ValidationError):
+        return None
+
+
+def past(cursor, field, descending):
+    """Rows after ``cursor`` in (``field``, id) order, newest first when ``descending``."""
+    key, pk = cursor
+    op = "lt" if descending else "gt"
+    # A range on the field plus a tie-break, so the field's index bounds the scan.
+    return Q(**{f"{field}__{op}": key}) | Q(**{f"pk__{op}": pk}), Q(**{f"{field}__{op}e": key})
+
+
+class PerformanceChangeList(ChangeList):
+    def __init__(self, request, model, list_display, list_display_links, list_filter,
+                 date_hierarchy, *args, **kwargs):
+        self.request = request
+        self.cursor = {var: request.GET.get(var) for var in CURSOR_VARS}
+        super().__init__(
+            request, model, list_display, list_display_links, list_filter, None, *args, **kwargs
+        )
+        for var in CURSOR_VARS:
+            # Not carried into a new search.
+            self.params.pop(var, None)
+
+    def get_filters_params(self, params=None):
+        params = super().get_filters_params(params)
+        for var in CURSOR_VARS:
+            params.pop(var, None)
+        return params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # A new filter, search or sort starts from the first page.
+        return super().get_query_string(new_params, [*CURSOR_VARS, *(remove or [])])
+
+    @cached_property
+    def keyset(self):
+        """``(field, descending)`` when paging by keyset, else None."""
+        field = self.model_admin.keyset_field
+        ordering = self.model_admin.get_ordering(self.request) or ()
+        if not field or ORDER_VAR in self.params or not ordering:
+            return None
+        if ordering[0].lstrip("-") != field:
+            return None
+        return field, ordering[0].startswith("-")
+
+    def get_results(self, request):
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_count_estimated = False
+        if self.keyset:
+            self.get_keyset_results()
+        else:
+            self.get_numbered_results()
+
+    def get_numbered_results(self):
+        paginator = CappedPaginator(self.queryset, self.list_per_page)
+        self.result_count = paginator.count
+        self.result_count_exact = paginator.exact
+        self.can_show_all = self.result_count <= self.list_max_show_all
+        self.multi_page = self.result_count > self.list_per_page
+        if (self.show_all and self.can_show_all) or not self.multi_page:
+            self.result_list = self.queryset._clone()
+        else:
+            try:
+                self.result_list = paginator.page(self.page_num).object_list
+            except InvalidPage:
+                raise IncorrectLookupParameters
+        self.paginator = paginator
+
+    def get_keyset_results(self):
+        field, descending = self.keyset
+        queryset = self.queryset
+        order = [f"-{field}", "-pk"] if descending else [field, "pk"]
+        reverse = [name[1:] if name.startswith("-") else f"-{name}" for name in order]
+        per_page = self.list_per_page
+
+        estimate = None if queryset.query.has_filters() else estimated_count(self.model, queryset.db)
+        if estimate is not None:
+            self.result_count, self.result_count_exact = estimate, False
+            self.result_count_estimated = True
+        else:
+            self.result_count, self.result_count_exact = capped_count(queryset)
+
+        after = decode_cursor(self.cursor[AFTER_VAR], self.model, field)
+        before = decode_cursor(self.cursor[BEFORE_VAR], self.model, field)
+        if before:
+            ids = list(
+                queryset.filter(*past(before, field, not descending))
+                .order_by(*reverse).values_list("pk", flat=True)[:per_page + 1]
+            )
+            self.has_prev, self.has_next = len(ids) > per_page, True
+            self.result_list = queryset.filter(pk__in=ids[:per_page]).order_by(*order)
+        else:
+            page = queryset.filter(*past(after, field, descending)) if after else queryset
+            self.result_list = page.order_by(*order)[:per_page]
+            rows = list(self.result_list)  # cached on the queryset for the template
+            self.has_prev = after is not None
+            self.has_next = len(rows) == per_page and queryset.filter(
+                *past((getattr(rows[-1], field), rows[-1].pk), field, descending)
+            ).exists()
+        # Links come from next_url/prev_url; there are no page numbers.
+        self.multi_page = self.can_show_all = False
+        self.paginator = None
+
+    @cached_property
+    def next_url(self):
+        return self.page_url(AFTER_VAR, -1) if self.keyset and self.has_next else None
+
+    @cached_property
+    def prev_url(self):
+        return self.page_url(BEFORE_VAR, 0) if self.keyset and self.has_prev else None
+
+    def page_url(self, var, index):
+        rows = list(self.result_list)
+        return self.get_query_string({var: encode_cursor(rows[index], self.keyset[0])}) if rows else None
+
+
+# ------------------------------------------------------
+# MODEL ADMIN
+# ------------------------------------------------------
+class PerformanceAdmin(admin.ModelAdmin):
+    """
+    A ModelAdmin whose changelist follows ``EXPENSES_ADMIN_PERFORMANCE``.
+    ``keyset_field`` names the field the default ordering starts with; it
+    needs an index that ends in the primary key (any index, on SQLite).
+    """
+    keyset_field = None
+
+    @property
+    def show_facets(self):
+        return ShowFacets.NEVER if performance_mode() else ShowFacets.ALLOW
+
+    def _foreign_keys(self, names):
+        fields = []
+        for name in names:
+            if not isinstance(name, str):
+                continue
+            try:
+                field = self.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if isinstance(field, ForeignKey):
+                fields.append(field)
+        return fields
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if not performance_mode():
+            return list_filter
+        foreign_keys = {field.name for field in self._foreign_keys(list_filter)}
+        return [
+            (name, AutocompleteFilter) if isinstance(name, str) and name in foreign_keys else name
+            for name in list_filter
+        ]
+
+    def get_list_select_related(self, request):
+        if not performance_mode():
+            return super().get_list_select_related(request)
+        return [field.name for field in self._foreign_keys(self.get_list_display(request))]
+
+    def get_changelist(self, request, **kwargs):
+        if not performance_mode():
+            return super().get_changelist(request, **kwargs)
+        return PerformanceChangeList
+
+    @property
+    def media(self):
+        media = super().media
+        foreign_keys = self._foreign_keys(self.list_filter)
+        if performance_mode() and foreign_keys:
+            media += autocomplete_widget(foreign_keys[0], self.admin_site).media
+        return media
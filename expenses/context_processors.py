@@ -0,0 +1,9 @@
+from . import unread
+
+
+def unread_notifications(request):
+    """Unread notification count for the badge in base.html."""
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {"notifications_unread_count": unread.count_for(user)}
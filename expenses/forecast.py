@@ -0,0 +1,240 @@
+"""
+Month-end and 12-month spending forecast.
+
+Spend is split into scheduled bills and everything else. Scheduled bills
+come from the RecurringExpense definitions, expanded by cycle from their
+``next_date``. Everything else is forecast per category from the SpendingRollup
+history: the level is the average of the last ``LEVEL_MONTHS`` complete
+months, scaled by how that calendar month compared with the yearly average
+last year. For the current month, that expected amount is blended with
+this month's own daily rate so far.
+
+The history-based part (``model``) is the expensive one and is cached per
+user per day. ``project`` adds this month's actual spend to it, which costs
+one grouped query on the rollup.
+"""
+import calendar
+from datetime import date
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+from . import caching, rollups
+from .anomalies import EPOCH_ORDINAL, NO_CATEGORY
+from .models import Category, Expense, RecurringExpense
+from .recurring import MONTHS
+
+
+HORIZON = 12
+LEVEL_MONTHS = 3
+SEASON_LIMITS = (0.5, 2.0)
+# How many days of "expected" spend the current month's observed rate is
+# weighed against; early in the month the history dominates.
+PRIOR_DAYS = 10
+
+WEEKLY_OCCURRENCES = HORIZON * 5 + 1
+
+
+def _month_index(ordinals):
+    """Months since January 1970 for date ordinals."""
+    return (np.asarray(ordinals) - EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+def _month_start(month_index):
+    return np.asarray(month_index).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+
+
+def _month_date(month_index):
+    return date.fromordinal(int(_month_start(month_index)))
+
+
+def _codes(category_ids):
+    return np.array([NO_CATEGORY if pk is None else pk for pk in category_ids], dtype=np.int64)
+
+
+class Model:
+    """The part of a forecast that only changes from day to day."""
+
+    def __init__(self, today, categories, names, expected, scheduled, posted, prior_weight):
+        self.today = today
+        self.categories = categories      # category ids, sorted; NO_CATEGORY first
+        self.names = names                # {category id: name}
+        self.expected = expected          # (categories, HORIZON) non-scheduled spend
+        self.scheduled = scheduled        # (categories, HORIZON) bills still to post
+        self.posted = posted              # (categories,) bills posted this month
+        self.prior_weight = prior_weight
+
+
+def _history(user, first_month, today):
+    """``(category ids, month indexes, totals)`` of all spend and of posted bills."""
+    start = _month_date(first_month)
+    spend = [
+        (row["category_id"], row["month"], row["total"])
+        for row in rollups.by_category_month(user, start, today)
+    ]
+    bills = [
+        (row["category_id"], row["month"], row["total"])
+        for row in Expense.objects.filter(
+            user=user, date__gte=start, date__lte=today, recurring__isnull=False,
+        )
+        .values("category_id", month=TruncMonth("date"))
+        .annotate(total=Sum("amount"))
+        .order_by()
+    ]
+
+    def columns(rows):
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        categories, months, totals = zip(*rows)
+        return (
+            _codes(categories),
+            _month_index([month.toordinal() for month in months]),
+            np.array(totals, dtype=np.float64),
+        )
+
+    return columns(spend), columns(bills)
+
+
+def expand(next_dates, cycles, amounts, first_month, months=HORIZON):
+    """
+    Total per (definition, month) of the occurrences of recurring
+    definitions in ``months`` months from ``first_month``. Occurrences
+    before it (overdue, about to be posted) count towards the first month.
+    Unknown cycles are skipped.
+    """
+    next_dates = np.asarray(next_dates, dtype=np.int64)
+    kinds = [(cycle or "").strip().lower() for cycle in cycles]
+    weekly = np.array([kind == "weekly" for kind in kinds], dtype=bool)
+    step = np.array([MONTHS.get(kind, 0) for kind in kinds], dtype=np.int64)
+    known = weekly | (step > 0)
+
+    n = np.arange(WEEKLY_OCCURRENCES)[None, :]
+    by_week = next_dates[:, None] + 7 * n
+
+    anchor = (next_dates - _month_start(_month_index(next_dates)) + 1)[:, None]
+    month = _month_index(next_dates)[:, None] + np.maximum(step, 1)[:, None] * n
+    days_in_month = _month_start(month + 1) - _month_start(month)
+    by_month = _month_start(month) + np.minimum(anchor, days_in_month) - 1
+
+    occurrences = np.where(weekly[:, None], by_week, by_month)
+    offset = np.maximum(_month_index(occurrences) - first_month, 0)
+    counts = np.zeros((len(next_dates), months))
+    keep = known[:, None] & (offset < months)
+    rows = np.broadcast_to(np.arange(len(next_dates))[:, None], keep.shape)
+    np.add.at(counts, (rows[keep], offset[keep]), 1)
+    return counts * np.asarray(amounts, dtype=np.float64)[:, None]
+
+
+def build(user, today):
+    current = int(_month_index(today.toordinal()))
+    first = current - 12
+    (spend_cat, spend_month, spend), (bill_cat, bill_month, bills) = _history(user, first, today)
+    definitions = list(
+        RecurringExpense.objects.filter(user=user)
+        .values_list("category_id", "next_date", "cycle", "amount")
+    )
+    def_cat = _codes([row[0] for row in definitions])
+    names = dict(Category.objects.filter(user=user).values_list("id", "name"))
+    names[NO_CATEGORY] = "Uncategorized"
+
+    categories = np.unique(np.concatenate([spend_cat, bill_cat, def_cat, [NO_CATEGORY]]))
+    size = (len(categories), 13)
+    history = np.zeros(size)
+    np.add.at(history, (np.searchsorted(categories, spend_cat), spend_month - first), spend)
+    posted = np.zeros(size)
+    np.add.at(posted, (np.searchsorted(categories, bill_cat), bill_month - first), bills)
+    other = np.maximum(history - posted, 0)
+
+    # Months before the user's first spend say nothing about seasons.
+    active = np.zeros(13, dtype=bool)
+    if len(spend_month):
+        active[spend_month.min() - first:] = True
+    complete = active[:12]
+    past = other[:, :12]
+
+    recent = complete[-LEVEL_MONTHS:]
+    level = past[:, -LEVEL_MONTHS:][:, recent].sum(axis=1) / max(recent.sum(), 1)
+    yearly = past[:, complete].sum(axis=1) / max(complete.sum(), 1)
+    # Month k of the horizon is calendar month current + k, last seen 12 months earlier.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        season = np.where(complete[None, :] & (yearly[:, None] > 0), past / yearly[:, None], 1.0)
+    season = np.clip(season, *SEASON_LIMITS)
+    expected = level[:, None] * season
+
+    scheduled = np.zeros((len(categories), HORIZON))
+    if definitions:
+        amounts = expand(
+            [row[1].toordinal() for row in definitions],
+            [row[2] for row in definitions],
+            [row[3] for row in definitions],
+            current,
+        )
+        np.add.at(scheduled, np.searchsorted(categories, def_cat), amounts)
+
+    return Model(
+        today, categories, names, expected, scheduled, posted[:, 12],
+        prior_weight=PRIOR_DAYS if complete.any() else 0,
+    )
+
+
+def model(user, today):
+    return caching.cached_daily(user, "forecast", today, lambda: build(user, today))
+
+
+class Forecast:
+    def __init__(self, months, rows, month_to_date, month_end):
+        self.months = months                # first day of each month in the horizon
+        self.rows = rows                    # [(category name, [amount per month])]
+        self.month_to_date = month_to_date
+        self.month_end = month_end
+
+    @property
+    def totals(self):
+        return [sum(values) for values in zip(*(amounts for _, amounts in self.rows))]
+
+
+def project(user, today):
+    """The Forecast for ``user`` as of ``today``."""
+    base = model(user, today)
+    actual = [
+        (row["category_id"], row["name"], row["total"])
+        for row in rollups.by_category(user, today.replace(day=1), today)
+    ]
+    names = dict(base.names)
+    names.update((NO_CATEGORY if pk is None else pk, name) for pk, name, _ in actual)
+
+    categories = np.union1d(base.categories, _codes([row[0] for row in actual]))
+    at = np.searchsorted(categories, base.categories)
+    expected = np.zeros((len(categories), HORIZON))
+    expected[at] = base.expected
+    scheduled = np.zeros((len(categories), HORIZON))
+    scheduled[at] = base.scheduled
+    posted = np.zeros(len(categories))
+    posted[at] = base.posted
+    spent = np.zeros(len(categories))
+    if actual:
+        np.add.at(
+            spent, np.searchsorted(categories, _codes([row[0] for row in actual])),
+            np.array([row[2] for row in actual], dtype=np.float64),
+        )
+
+    days = calendar.monthrange(today.year, today.month)[1]
+    other = np.maximum(spent - posted, 0)
+    rate = (other + expected[:, 0] / days * base.prior_weight) / (today.day + base.prior_weight)
+    outlook = expected + scheduled
+    outlook[:, 0] = spent + rate * (days - today.day) + scheduled[:, 0]
+    outlook = np.round(outlook, 2)
+
+    order = np.argsort(-outlook.sum(axis=1), kind="stable")
+    rows = [
+        (names.get(int(categories[i]), "Other"), outlook[i].tolist())
+        for i in order if outlook[i].any()
+    ]
+    current = int(_month_index(today.toordinal()))
+    return Forecast(
+        months=[_month_date(current + k) for k in range(HORIZON)],
+        rows=rows,
+        month_to_date=round(float(spent.sum()), 2),
+        month_end=round(float(outlook[:, 0].sum()), 2),
+    )
@@ -0,0 +1,162 @@
+"""
+Goal progress from the contribution ledger.
+
+Every GoalContribution write moves its goal's running total
+(``current_progress``), ``contribution_count`` and ``first_contribution``
+with one ``UPDATE ... SET x = x + delta`` from signals.py, so concurrent
+contributions can't lose each other's updates and showing a goal never
+sums its ledger. Bulk paths (seeding) set the fields themselves.
+``recompute`` rebuilds every goal from its ledger in one statement, for
+when the two drift apart.
+
+The projected completion assumes the average rate since the first
+contribution carries on.
+"""
+import math
+from datetime import timedelta
+
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Least, TruncMonth
+
+from .models import Goal, GoalContribution
+
+
+# Projections further out than this are shown as "not at this rate".
+MAX_PROJECTION_DAYS = 100 * 365
+
+
+def _earliest_contribution():
+    return Subquery(
+        GoalContribution.objects.filter(goal=OuterRef("pk"))
+        .order_by("date").values("date")[:1]
+    )
+
+
+def _normalize(amount, day):
+    # Views assign raw POST strings to the model before saving.
+    amount = GoalContribution._meta.get_field("amount").to_python(amount)
+    day = GoalContribution._meta.get_field("date").to_python(day)
+    return amount, day
+
+
+def apply_delta(goal_id, amount, count, day=None):
+    """
+    Add ``amount``/``count`` to a goal. With ``day`` (a contribution being
+    added) the first date only moves earlier; without, it is looked up
+    again from the ledger's (goal, date) index.
+    """
+    if day is not None:
+        first = Coalesce(Least("first_contribution", Value(day)), Value(day))
+    else:
+        first = _earliest_contribution()
+    Goal.objects.filter(pk=goal_id).update(
+        current_progress=F("current_progress") + amount,
+        contribution_count=F("contribution_count") + count,
+        first_contribution=first,
+    )
+
+
+# ------------------------------------------------------
+# SIGNAL HOOKS
+# ------------------------------------------------------
+def snapshot(instance):
+    """Remember the stored goal and amount of a contribution about to be saved."""
+    instance._goal_old = None
+    if instance._state.adding or instance.pk is None:
+        return
+    instance._goal_old = (
+        GoalContribution.objects.filter(pk=instance.pk)
+        .values_list("goal_id", "amount")
+        .first()
+    )
+
+
+def record_save(instance):
+    amount, day = _normalize(instance.amount, instance.date)
+    old = getattr(instance, "_goal_old", None)
+    instance._goal_old = None
+
+    if old is None:
+        apply_delta(instance.goal_id, amount, 1, day)
+        return
+    old_goal_id, old_amount = old
+    if old_goal_id == instance.goal_id:
+        apply_delta(instance.goal_id, amount - old_amount, 0)
+    else:
+        apply_delta(old_goal_id, -old_amount, -1)
+        apply_delta(instance.goal_id, amount, 1, day)
+
+
+def record_delete(instance):
+    amount, _ = _normalize(instance.amount, instance.date)
+    apply_delta(instance.goal_id, -amount, -1)
+
+
+# ------------------------------------------------------
+# PROGRESS
+# ------------------------------------------------------
+def projected_completion(goal, today):
+    """
+    The day ``goal`` is reached if saving goes on at its average daily rate
+    since the first contribution; None when already reached, with nothing
+    saved yet, or more than MAX_PROJECTION_DAYS away.
+    """
+    saved, target = goal.current_progress, goal.target_amount
+    if saved >= target or saved <= 0 or goal.first_contribution is None:
+        return None
+    days = max((today - goal.first_contribution).days + 1, 1)
+    needed = math.ceil((target - saved) * days / saved)
+    if needed > MAX_PROJECTION_DAYS:
+        return None
+    return today + timedelta(days=needed)
+
+
+def progress(goals, today):
+    """
+    ``goals`` as a list, each given ``percent`` (capped at 100),
+    ``remaining``, ``reached``, ``projected`` (see projected_completion) and
+    ``on_track`` (projected to finish by the deadline). Reads nothing.
+    """
+    goals = list(goals)
+    for goal in goals:
+        saved, target = goal.current_progress, goal.target_amount
+        goal.reached = saved >= target
+        goal.remaining = max(target - saved, 0)
+        goal.percent = min(saved * 100 / target, 100) if target > 0 else 100
+        goal.projected = projected_completion(goal, today)
+        goal.on_track = goal.reached or (goal.projected is not None and goal.projected <= goal.deadline)
+    return goals
+
+
+def monthly_totals(goal):
+    """``[(month start, contributed, running total)]``, oldest first, for charting."""
+    rows = (
+        GoalContribution.objects.filter(goal=goal)
+        .values(month=TruncMonth("date"))
+        .annotate(total=Sum("amount"))
+        .order_by("month")
+        .values_list("month", "total")
+    )
+    running = 0
+    result = []
+    for month, total in rows:
+        running += total
+        result.append((month, total, running))
+    return result
+
+
+# ------------------------------------------------------
+# RECOMPUTE
+# ------------------------------------------------------
+def recompute():
+    """Rebuild every goal's totals from its contributions; returns the goals updated."""
+    ledger = GoalContribution.objects.filter(goal=OuterRef("pk")).order_by().values("goal")
+    return Goal.objects.update(
+        current_progress=Coalesce(
+            Subquery(ledger.annotate(total=Sum("amount")).values("total")),
+            Value(0),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+        contribution_count=Coalesce(Subquery(ledger.annotate(n=Count("id")).values("n")), Value(0)),
+        first_contribution=_earliest_contribution(),
+    )
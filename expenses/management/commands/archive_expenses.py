@@ -0,0 +1,36 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move expenses older than the archive cutoff out of the expense table, "
+        "in batches. Safe to interrupt; the next run resumes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--before", type=date.fromisoformat,
+            help=f"Archive expenses dated before this day (default: {settings.EXPENSES_ARCHIVE_AFTER_DAYS} days ago).",
+        )
+        parser.add_argument("--batch-size", type=int, default=settings.EXPENSES_ARCHIVE_BATCH_SIZE)
+        parser.add_argument("--max-batches", type=int, help="Stop after this many batches.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        before = options["before"] or archive.cutoff()
+
+        def progress(moved):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  {moved} archived")
+
+        moved = archive.archive(
+            before, batch_size=options["batch_size"],
+            max_batches=options["max_batches"], progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} expenses dated before {before}."))
@@ -0,0 +1,116 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from expenses import changelists, metrics, seeding
+from expenses.models import Category, Expense
+
+from .bench_views import percentile
+
+
+# label, changelist, query string; "{page}" is a late page, addressed by
+# number with the performance mode off and by cursor with it on.
+PAGES = [
+    ("expenses", "expense", ""),
+    ("expenses, late page", "expense", "{page}"),
+    ("expenses by user", "expense", "?user__id__exact={user}"),
+    ("expenses by category", "expense", "?category__id__exact={category}"),
+    ("expenses pending", "expense", "?status__exact=PENDING"),
+    ("expenses by amount", "expense", "?o=4"),
+    ("notifications", "notification", ""),
+    ("recurring expenses", "recurringexpense", ""),
+]
+LATE_PAGE = 1000
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the expense, notification and recurring expense admin "
+        "changelists with EXPENSES_ADMIN_PERFORMANCE off and on, over "
+        "synthetic users. All generated data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--expenses", type=int, default=1_000_000, help="Expenses in total.")
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--notifications", type=int, default=1000, help="Notifications per user.")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed requests per page and mode.")
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["repeat"] < 1:
+            raise CommandError("--users and --repeat must be at least 1.")
+        try:
+            with transaction.atomic():
+                fixture = self.populate(options)
+                self.compare(fixture, options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def populate(self, options):
+        started = time.perf_counter()
+        per_user = options["expenses"] // options["users"]
+        users = [
+            seeding.seed_user(
+                f"__bench_admin_{i}__", per_user, notifications=options["notifications"], seed=i,
+            )
+            for i in range(options["users"])
+        ]
+        # What the estimated counts read; a real database gets it from a
+        # periodic ANALYZE (or PRAGMA optimize).
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.stdout.write(
+            f"Seeded {options['users']} users x {per_user} expenses "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+        admin = User.objects.create_superuser("__bench_admin__", password=None)
+        late = Expense.objects.order_by("-date", "-id")[LATE_PAGE * 100 - 1:LATE_PAGE * 100].get()
+        return {
+            "admin": admin,
+            "user": users[0].pk,
+            "category": Category.objects.filter(user=users[0]).order_by("pk").first().pk,
+            "page": {
+                False: f"?p={LATE_PAGE + 1}",
+                True: f"?{changelists.AFTER_VAR}={changelists.encode_cursor(late, 'date')}",
+            },
+        }
+
+    def compare(self, fixture, repeat):
+        client = Client()
+        client.force_login(fixture["admin"])
+        self.stdout.write(f"{'changelist':<26}{'off: queries':>13}{'p50 ms':>10}{'on: queries':>13}{'p50 ms':>10}")
+        for label, model, query in PAGES:
+            row = []
+            for mode in (False, True):
+                url = reverse(f"admin:expenses_{model}_changelist") + query.format(
+                    user=fixture["user"], category=fixture["category"], page=fixture["page"][mode],
+                )
+                with override_settings(EXPENSES_ADMIN_PERFORMANCE=mode):
+                    row.append(self.time_url(client, url, repeat))
+            (off_queries, off_ms), (on_queries, on_ms) = row
+            self.stdout.write(f"{label:<26}{off_queries:>13}{off_ms:>10.1f}{on_queries:>13}{on_ms:>10.1f}")
+
+    def time_url(self, client, url, repeat):
+        samples = []
+        for _ in range(repeat + 1):
+            sample = metrics.Sample(keep_sql=False)
+            with sample.wrapping():
+                response = client.get(url)
+            sample.seconds = time.perf_counter() - sample.started
+            if response.status_code >= 400:
+                raise CommandError(f"{url} returned {response.status_code}")
+            samples.append(sample)
+        # The first request only warms up.
+        ms = sorted(sample.seconds * 1000 for sample in samples[1:])
+        return max(sample.queries for sample in samples), percentile(ms, 50)
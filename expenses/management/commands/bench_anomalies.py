@@ -0,0 +1,52 @@
+import statistics
+import time
+from datetime import date
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from expenses import anomalies
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the anomaly checks on one synthetic user's history of N expenses "
+        "(generated in memory; the database is not touched)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--categories", type=int, default=12)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        history = self.synthetic(options["rows"], options["categories"], options["seed"])
+        checks = [
+            ("outliers", lambda: anomalies.outliers(history)[0]),
+            ("jumps", lambda: anomalies.jumps(history)[0]),
+            ("duplicates", lambda: anomalies.duplicates(history)[0]),
+        ]
+        self.stdout.write(f"{len(history)} expenses, {options['categories']} categories")
+        self.stdout.write(f"{'check':<12}{'found':>10}{'median ms':>12}")
+        total = 0
+        for name, check in checks:
+            samples = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                found = check()
+                samples.append((time.perf_counter() - started) * 1000)
+            median = statistics.median(samples)
+            total += median
+            self.stdout.write(f"{name:<12}{len(found):>10}{median:>12.1f}")
+        self.stdout.write(self.style.SUCCESS(f"{'all':<12}{'':>10}{total:>12.1f}"))
+
+    def synthetic(self, rows, categories, seed):
+        rng = np.random.default_rng(seed)
+        today = date.today().toordinal()
+        return anomalies.History(
+            ids=np.arange(1, rows + 1, dtype=np.int64),
+            days=np.sort(rng.integers(today - anomalies.HISTORY_DAYS + 1, today + 1, rows)),
+            cents=rng.lognormal(7, 1, rows).astype(np.int64) + 1,
+            categories=rng.integers(1, categories + 1, rows),
+        )
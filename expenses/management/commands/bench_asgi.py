@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from expenses import caching, seeding
+
+from .bench_concurrency import copy_database, use_database
+from .bench_views import percentile
+
+
+PAGES = ["dash", "monthly_overview", "notifications"]
+USER_PREFIX = "__bench_asgi_"
+
+
+def summary(latencies):
+    ms = sorted(seconds * 1000 for seconds in latencies)
+    if not ms:
+        return {"count": 0, "p50_ms": 0, "p99_ms": 0}
+    return {"count": len(ms), "p50_ms": round(percentile(ms, 50), 2), "p99_ms": round(percentile(ms, 99), 2)}
+
+
+def wsgi_get(app, path, cookie):
+    environ = {
+        "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": "", "SCRIPT_NAME": "",
+        "SERVER_NAME": "localhost", "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": "localhost", "HTTP_COOKIE": cookie,
+        "wsgi.version": (1, 0), "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr, "wsgi.multithread": True, "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    status = []
+    response = app(environ, lambda line, headers, exc_info=None: status.append(line))
+    try:
+        for _ in response:
+            pass
+    finally:
+        response.close()
+    return int(status[0].split()[0])
+
+
+async def asgi_get(app, path, cookie):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"cookie", cookie.encode())],
+        "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+    }
+    request_sent = False
+    status = None
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The client never disconnects; Django cancels this once it has replied.
+        await asyncio.Future()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+class Load:
+    """One load run: ``workers`` clients, each requesting PAGES in turn."""
+
+    def __init__(self, users, seconds, warm):
+        self.users = users            # [(user id, session cookie)]
+        self.seconds = seconds
+        self.warm = warm
+        self.paths = [(name, reverse(name)) for name in PAGES]
+        self.latencies = {name: [] for name in PAGES}
+        self.errors = 0
+
+    def before(self, user_id):
+        # Cold by default: every request rebuilds its context, which is
+        # where the queries (and so the concurrency) are.
+        if not self.warm:
+            caching.bump(user_id)
+
+    def record(self, name, status, started):
+        if status is not None and status < 400:
+            self.latencies[name].append(time.perf_counter() - started)
+        else:
+            self.errors += 1
+
+    def run_wsgi(self):
+        from django.core.wsgi import get_wsgi_application
+
+        app = get_wsgi_application()
+        deadline = time.perf_counter() + self.seconds
+
+        def worker(user_id, cookie):
+            try:
+                while time.perf_counter() < deadline:
+                    for name, path in self.paths:
+                        self.before(user_id)
+                        started = time.perf_counter()
+                        self.record(name, wsgi_get(app, path, cookie), started)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=user) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_asgi(self):
+        from django.core.asgi import get_asgi_application
+
+        app = get_asgi_application()
+
+        async def worker(user_id, cookie, deadline):
+            while time.perf_counter() < deadline:
+                for name, path in self.paths:
+                    await sync_to_async(self.before)(user_id)
+                    started = time.perf_counter()
+                    self.record(name, await asgi_get(app, path, cookie), started)
+
+        async def main():
+            deadline = time.perf_counter() + self.seconds
+            await asyncio.gather(*(worker(user_id, cookie, deadline) for user_id, cookie in self.users))
+
+        asyncio.run(main())
+
+    def result(self):
+        every = [latency for latencies in self.latencies.values() for latency in latencies]
+        return {
+            "requests_per_second": round(len(every) / self.seconds, 1),
+            "errors": self.errors,
+            "all": summary(every),
+            "pages": {name: summary(latencies) for name, latencies in self.latencies.items()},
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the WSGI app (sync views) with the ASGI app (async views with "
+        "concurrent queries) on the dashboard, monthly overview and "
+        "notifications under concurrent load. Each runs in its own process "
+        "on a temporary copy of the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=16, help="Simultaneous clients, one user each.")
+        parser.add_argument("--seconds", type=float, default=10.0)
+        parser.add_argument("--expenses", type=int, default=20000, help="Expenses seeded per user.")
+        parser.add_argument("--warm", action="store_true", help="Let requests hit the context cache.")
+        # Internal: run one side of the comparison against an already seeded copy.
+        parser.add_argument("--worker", choices=["wsgi", "asgi"], help=argparse.SUPPRESS)
+        parser.add_argument("--database", help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("bench_asgi runs on temporary copies of a SQLite database.")
+        if options["worker"]:
+            self.run_worker(options)
+            return
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.sqlite3")
+            copy_database(path)
+            with use_database(path):
+                started = time.perf_counter()
+                for i in range(options["concurrency"]):
+                    seeding.seed_user(f"{USER_PREFIX}{i}__", options["expenses"], seed=i)
+                self.stdout.write(
+                    f"Seeded {options['concurrency']} users x {options['expenses']} expenses "
+                    f"in {time.perf_counter() - started:.1f}s"
+                )
+            results = {mode: self.spawn(mode, path, options) for mode in ["wsgi", "asgi"]}
+
+        self.stdout.write(
+            f"\n{options['concurrency']} concurrent clients, {options['seconds']:g}s, "
+            f"{'warm' if options['warm'] else 'cold'} context cache"
+        )
+        self.stdout.write(f"{'':<22}{'req/s':>8}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}")
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:<22}{result['requests_per_second']:>8}{result['errors']:>8}"
+                f"{result['all']['p50_ms']:>10.1f}{result['all']['p99_ms']:>10.1f}"
+            )
+            for page, stats in result["pages"].items():
+                self.stdout.write(f"  {page:<20}{'':>16}{stats['p50_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+
+    def spawn(self, mode, path, options):
+        env = dict(os.environ, EXPENSES_ASYNC_VIEWS="1" if mode == "asgi" else "0")
+        command = [
+            sys.executable, str(settings.BASE_DIR / "manage.py"), "bench_asgi",
+            "--worker", mode, "--database", path,
+            "--concurrency", str(options["concurrency"]), "--seconds", str(options["seconds"]),
+        ]
+        if options["warm"]:
+            command.append("--warm")
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise CommandError(f"The {mode} run failed:\n{completed.stderr}")
+        return json.loads(completed.stdout)
+
+    def run_worker(self, options):
+        with use_database(options["database"]):
+            users = []
+            for user in User.objects.filter(username__startswith=USER_PREFIX).order_by("pk")[:options["concurrency"]]:
+                client = Client()
+                client.force_login(user)
+                cookie = client.cookies[settings.SESSION_COOKIE_NAME]
+                users.append((user.pk, f"{cookie.key}={cookie.value}"))
+            connections.close_all()
+
+            load = Load(users, options["seconds"], options["warm"])
+            getattr(load, f"run_{options['worker']}")()
+            self.stdout.write(json.dumps(load.result()))
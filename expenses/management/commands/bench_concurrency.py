@@ -0,0 +1,177 @@
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from expenses import seeding
+
+
+READS = ["dash", "expenses_list", "monthly_overview", "api_spend"]
+
+# Django's own defaults: rollback journal, a new connection per request,
+# deferred transactions and sqlite3's 5 second busy timeout.
+PROFILES = {
+    "default": {"OPTIONS": {}, "CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False},
+    "tuned": settings.EXPENSES_SQLITE_PROFILE,
+}
+
+
+def copy_database(path):
+    """Copy the default database to the file ``path``."""
+    connection.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
+
+
+@contextmanager
+def use_database(path, profile=None):
+    """Point the default connection, in every thread, at ``path`` with ``profile``."""
+    profile = profile or {}
+    settings_dict = connections.settings["default"]
+    saved = {key: settings_dict.get(key) for key in ["NAME", *profile]}
+    connections.close_all()
+    settings_dict.update(profile, NAME=path)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        settings_dict.update(saved)
+
+
+class RetryCounter(logging.Handler):
+    """Counts the lock retries expenses/retry.py logs."""
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+class Worker(threading.Thread):
+    def __init__(self, client, category_id, deadline, write_share, seed):
+        super().__init__()
+        self.client = client
+        self.category_id = category_id
+        self.deadline = deadline
+        self.write_share = write_share
+        self.rng = random.Random(seed)
+        self.latencies = []
+        self.writes = 0
+        self.errors = 0
+
+    def run(self):
+        try:
+            while time.perf_counter() < self.deadline:
+                self.request()
+        finally:
+            connections.close_all()
+
+    def request(self):
+        write = self.rng.random() < self.write_share
+        started = time.perf_counter()
+        # What the request_started/request_finished signals do for a real
+        # request; the test client leaves them out.
+        close_old_connections()
+        try:
+            if write:
+                response = self.client.post(reverse("expense_add"), {
+                    "title": "Coffee", "amount": f"{self.rng.uniform(50, 500):.2f}",
+                    "category": self.category_id, "date": date.today().isoformat(),
+                })
+            else:
+                response = self.client.get(reverse(self.rng.choice(READS)))
+            ok = response.status_code < 400
+        except OperationalError:
+            ok = False
+        finally:
+            close_old_connections()
+        if ok:
+            self.latencies.append(time.perf_counter() - started)
+            self.writes += write
+        else:
+            self.errors += 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare request throughput under concurrent reads and writes with "
+        "Django's default SQLite settings and with EXPENSES_SQLITE_PROFILE. "
+        "Runs on temporary copies of the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--seconds", type=float, default=10.0)
+        parser.add_argument("--write-share", type=float, default=0.2, help="Fraction of requests that add an expense.")
+        parser.add_argument("--expenses", type=int, default=2000, help="Expenses seeded per thread's user.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("bench_concurrency compares SQLite settings.")
+
+        self.stdout.write(
+            f"{options['threads']} threads, {options['seconds']:g}s, "
+            f"{options['write_share']:.0%} writes"
+        )
+        self.stdout.write(f"{'profile':<10}{'req/s':>10}{'writes/s':>10}{'retries':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}")
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, profile in PROFILES.items():
+                path = os.path.join(tmp, f"{name}.sqlite3")
+                copy_database(path)
+                with use_database(path, profile):
+                    self.run_profile(name, options)
+
+    def run_profile(self, name, options):
+        clients = []
+        for i in range(options["threads"]):
+            user = seeding.seed_user(f"__bench_concurrency_{i}__", options["expenses"], seed=i)
+            client = Client()
+            client.force_login(user)
+            clients.append((client, user.category_set.values_list("pk", flat=True).first()))
+        connections.close_all()
+
+        retry_log = logging.getLogger("expenses.retry")
+        retries = RetryCounter()
+        level = retry_log.level
+        retry_log.addHandler(retries)
+        retry_log.setLevel(logging.INFO)
+
+        deadline = time.perf_counter() + options["seconds"]
+        workers = [
+            Worker(client, category_id, deadline, options["write_share"], seed=i)
+            for i, (client, category_id) in enumerate(clients)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        retry_log.removeHandler(retries)
+        retry_log.setLevel(level)
+
+        latencies = sorted(latency * 1000 for worker in workers for latency in worker.latencies)
+        writes = sum(worker.writes for worker in workers)
+        errors = sum(worker.errors for worker in workers)
+        seconds = options["seconds"]
+        p50 = statistics.median(latencies) if latencies else 0
+        p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+        self.stdout.write(
+            f"{name:<10}{len(latencies) / seconds:>10.1f}{writes / seconds:>10.1f}"
+            f"{retries.count:>9}{errors:>8}{p50:>10.1f}{p95:>10.1f}"
+        )
@@ -0,0 +1,100 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from expenses import search
+from expenses.models import Category, Expense
+from expenses.seeding import CATEGORY_NAMES, NOTES, TITLES
+
+
+QUERIES = ["coffee", "uber air", "rent", "transport", "12.5", "2023-06", "2021", "reimbursable"]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the FTS5 search index with the old icontains filter on a "
+        "synthetic user. All generated data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            raise CommandError("bench_search needs SQLite with FTS5.")
+        try:
+            with transaction.atomic():
+                user = self.populate(options["rows"])
+                self.compare(user, options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def populate(self, rows):
+        started = time.perf_counter()
+        user = User.objects.create_user("__bench_search__")
+        category_ids = [
+            Category.objects.create(user=user, name=name).pk for name in CATEGORY_NAMES
+        ]
+        # Generated in SQL so the insert triggers do the indexing, exactly as
+        # they would for rows written by the app.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                WITH RECURSIVE seq(n) AS (
+                    SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < %s
+                )
+                INSERT INTO expenses_expense (user_id, category_id, title, amount, date, note, status)
+                SELECT
+                    %s,
+                    json_extract(%s, '$[' || (n %% %s) || ']'),
+                    json_extract(%s, '$[' || (n * 7 %% %s) || ']'),
+                    (n * 7919 %% 50000) / 100.0,
+                    date('2020-01-01', '+' || (n %% 2000) || ' days'),
+                    json_extract(%s, '$[' || (n * 13 %% %s) || ']'),
+                    CASE WHEN n %% 5 = 0 THEN 'PENDING' ELSE 'PAID' END
+                FROM seq
+                """,
+                [
+                    rows, user.pk,
+                    json.dumps(category_ids), len(category_ids),
+                    json.dumps(TITLES), len(TITLES),
+                    json.dumps(NOTES), len(NOTES),
+                ],
+            )
+        self.stdout.write(f"Inserted {rows} expenses in {time.perf_counter() - started:.1f}s")
+        return user
+
+    def time_ms(self, fn, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
+
+    def compare(self, user, repeat):
+        base = Expense.objects.filter(user=user).select_related("category")
+        self.stdout.write(f"{'query':<16}{'matches':>10}{'icontains ms':>16}{'fts5 ms':>12}{'speedup':>10}")
+        for text in QUERIES:
+            legacy = search._like_filter(base, text)
+            indexed = search.filter_expenses(base, user, text)
+
+            def run(qs):
+                return lambda: (list(qs.order_by("-date", "-id")[:50]), qs.count())
+
+            legacy_ms = self.time_ms(run(legacy), repeat)
+            indexed_ms = self.time_ms(run(indexed), repeat)
+            self.stdout.write(
+                f"{text:<16}{indexed.count():>10}{legacy_ms:>16.1f}{indexed_ms:>12.1f}"
+                f"{legacy_ms / indexed_ms:>9.1f}x"
+            )
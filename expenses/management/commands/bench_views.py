@@ -0,0 +1,250 @@
+import json
+import math
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from expenses import metrics, seeding
+from expenses.models import Budget, Category, Expense, Goal, RecurringExpense
+from expenses.pagination import encode_cursor
+from expenses.urls import urlpatterns
+
+
+# Every page that is safe to request repeatedly, with the fixture whose id
+# it takes and the query strings worth timing separately.
+VIEWS = [
+    ("home", None, [""]),
+    ("login", None, [""]),
+    ("register", None, [""]),
+    ("dash", None, [""]),
+    ("expenses_list", None, ["", "?status=PENDING", "?category={category}", "?search=coffee", "?after={cursor}"]),
+    ("expense_add", None, [""]),
+    ("expense_import", None, [""]),
+    ("expense_view", "expense", [""]),
+    ("expense_edit", "expense", [""]),
+    ("pending_expenses", None, [""]),
+    ("recurring_list", None, [""]),
+    ("recurring_add", None, [""]),
+    ("recurring_edit", "recurring", [""]),
+    ("categories_list", None, [""]),
+    ("category_add", None, [""]),
+    ("category_edit", "category", [""]),
+    ("budgets_list", None, [""]),
+    ("budget_history", None, ["", "?months=36"]),
+    ("budget_add", None, [""]),
+    ("budget_edit", "budget", [""]),
+    ("set_budget", None, [""]),
+    ("goal_detail", "goal", ["", "?after={cursor}"]),
+    ("monthly_overview", None, [""]),
+    ("monthly_report", None, [""]),
+    ("range_report", None, ["", "?group=week", "?from=2000-01-01&group=year"]),
+    ("api_spend", None, ["", "?group=month"]),
+    ("api_categories", None, [""]),
+    ("api_budgets", None, [""]),
+    ("notifications", None, [""]),
+    ("profile", None, [""]),
+    ("export_csv", None, [""]),
+]
+
+# URL names left out on purpose.
+SKIPPED = {
+    "expense_delete": "deletes on GET",
+    "recurring_delete": "deletes on GET",
+    "category_delete": "deletes on GET",
+    "budget_delete": "deletes on GET",
+    "contribution_delete": "deletes on GET",
+    "goal_contribute": "only writes, on POST",
+    "expenses_bulk": "only writes, on POST",
+    "notifications_bulk": "only writes, on POST",
+    "notifications_mark_all_read": "writes on GET",
+    "notification_toggle_read": "writes on GET",
+    "metrics": "only served with EXPENSES_METRICS",
+}
+
+DEFAULT_SCALES = "1000,100000,1000000"
+# Below this a p50 change is timer noise, whatever the percentage.
+NOISE_MS = 1.0
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of sorted ``samples``."""
+    return samples[max(math.ceil(p / 100 * len(samples)) - 1, 0)]
+
+
+def unlisted_views():
+    listed = {name for name, _, _ in VIEWS} | set(SKIPPED)
+    return sorted(p.name for p in urlpatterns if p.name and p.name not in listed)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every page in expenses/urls.py through the test client for a "
+        "synthetic user at each scale, reporting latency percentiles and "
+        "query counts. All generated data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales", default=DEFAULT_SCALES,
+            help=f"Comma-separated expense counts (default {DEFAULT_SCALES}).",
+        )
+        parser.add_argument("--repeat", type=int, default=20, help="Timed requests per URL.")
+        parser.add_argument("--days", type=int, default=730)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--save", metavar="PATH", help="Write the results as a JSON baseline.")
+        parser.add_argument("--baseline", metavar="PATH", help="Compare with a saved baseline.")
+        parser.add_argument(
+            "--tolerance", type=float, default=25.0,
+            help="Percent a p50 may grow over the baseline before it counts as a regression.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(scale) for scale in options["scales"].split(",")]
+        except ValueError:
+            raise CommandError("--scales takes comma-separated integers, e.g. 1000,100000.")
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1.")
+        for name in unlisted_views():
+            self.stderr.write(f"warning: {name} is neither benchmarked nor skipped")
+
+        results = {}
+        for scale in scales:
+            results[str(scale)] = self.run_scale(scale, options)
+
+        report = {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": self.commit(),
+            "repeat": options["repeat"],
+            "scales": results,
+        }
+        if options["save"]:
+            with open(options["save"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Saved {options['save']}")
+        if options["baseline"]:
+            with open(options["baseline"], encoding="utf-8") as f:
+                baseline = json.load(f)
+            regressions = self.compare(baseline, report, options["tolerance"])
+            if regressions:
+                raise CommandError(f"{regressions} views regressed against {options['baseline']}.")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def run_scale(self, scale, options):
+        results = {}
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                user = seeding.seed_user(
+                    f"__bench_views_{scale}__", scale, days=options["days"], seed=options["seed"],
+                )
+                self.stdout.write(f"\n{scale} expenses (seeded in {time.perf_counter() - started:.1f}s)")
+                fixture = self.fixture(user)
+                client = Client()
+                client.force_login(user)
+
+                self.stdout.write(f"{'view':<40}{'queries':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+                for name, obj, variants in VIEWS:
+                    args = [fixture[obj].pk] if obj else []
+                    for query in variants:
+                        url = reverse(name, args=args) + query.format(
+                            category=fixture["category"].pk,
+                            cursor=encode_cursor(fixture["expense"]),
+                        )
+                        # Keyed by the template, not the URL: fixture ids
+                        # differ between databases.
+                        label = name + query
+                        result = results[label] = self.time_url(client, url, options["repeat"])
+                        self.stdout.write(
+                            f"{label:<40}{result['queries']:>8}{result['p50_ms']:>10.1f}"
+                            f"{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                        )
+                raise Rollback
+        except Rollback:
+            pass
+        return results
+
+    def fixture(self, user):
+        def first(model):
+            return model.objects.filter(user=user).order_by("pk").first()
+
+        return {
+            "expense": Expense.objects.filter(user=user).order_by("-date", "-id").first(),
+            "category": first(Category),
+            "recurring": first(RecurringExpense),
+            "budget": first(Budget),
+            "goal": first(Goal),
+        }
+
+    def request(self, client, url):
+        sample = metrics.Sample(keep_sql=False)
+        with sample.wrapping():
+            response = client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        sample.seconds = time.perf_counter() - sample.started
+        if response.status_code >= 400:
+            raise CommandError(f"{url} returned {response.status_code}")
+        return sample
+
+    def time_url(self, client, url, repeat):
+        # One untimed request first, so the context cache is as warm as it
+        # would be for a returning user.
+        self.request(client, url)
+        samples = [self.request(client, url) for _ in range(repeat)]
+        ms = sorted(sample.seconds * 1000 for sample in samples)
+        return {
+            "queries": max(sample.queries for sample in samples),
+            "mean_ms": round(statistics.fmean(ms), 2),
+            "p50_ms": round(percentile(ms, 50), 2),
+            "p95_ms": round(percentile(ms, 95), 2),
+            "p99_ms": round(percentile(ms, 99), 2),
+        }
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def compare(self, baseline, report, tolerance):
+        self.stdout.write(
+            f"\nAgainst {baseline.get('commit') or 'baseline'} "
+            f"({baseline.get('created')}), p50 tolerance {tolerance:g}%"
+        )
+        regressions = 0
+        for scale, results in report["scales"].items():
+            before = baseline.get("scales", {}).get(scale)
+            if before is None:
+                self.stdout.write(f"{scale}: not in the baseline")
+                continue
+            for label, now in results.items():
+                old = before.get(label)
+                if old is None:
+                    continue
+                slower = (
+                    now["p50_ms"] > old["p50_ms"] * (1 + tolerance / 100)
+                    and now["p50_ms"] - old["p50_ms"] > NOISE_MS
+                )
+                more_queries = now["queries"] > old["queries"]
+                if not (slower or more_queries):
+                    continue
+                regressions += 1
+                self.stdout.write(self.style.ERROR(
+                    f"{scale:>8} {label:<40} p50 {old['p50_ms']:.1f} -> {now['p50_ms']:.1f} ms, "
+                    f"queries {old['queries']} -> {now['queries']}"
+                ))
+        return regressions
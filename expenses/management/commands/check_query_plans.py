@@ -0,0 +1,171 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from expenses.models import (
+    ArchivedExpense, Budget, Category, Expense, Goal, GoalContribution,
+    Notification, RecurringExpense,
+)
+from expenses.pagination import encode_cursor
+
+
+# Read-only pages whose queries are checked, with the query strings that
+# switch on their different filters.
+VIEWS = [
+    ("dash", None, [""]),
+    ("expenses_list", None, [
+        "", "?status=PENDING", "?category={category}", "?search=rent",
+        "?after={cursor}", "?before={cursor}", "?status=PAID&after={cursor}",
+    ]),
+    ("expense_view", "expense", [""]),
+    ("expense_edit", "expense", [""]),
+    ("pending_expenses", None, ["", "?after={cursor}"]),
+    ("recurring_list", None, [""]),
+    ("recurring_edit", "recurring", [""]),
+    ("categories_list", None, [""]),
+    ("category_edit", "category", [""]),
+    ("budgets_list", None, [""]),
+    ("budget_history", None, ["", "?months=3"]),
+    ("budget_edit", "budget", [""]),
+    ("set_budget", None, [""]),
+    ("goal_detail", "goal", ["", "?after={cursor}"]),
+    ("monthly_overview", None, [""]),
+    ("monthly_report", None, [""]),
+    ("range_report", None, ["", "?group=week", "?from=2020-01-01&group=month", "?group=year"]),
+    ("notifications", None, [""]),
+    ("profile", None, [""]),
+    ("export_csv", None, ["", "?from=2000-01-01"]),
+    ("api_spend", None, ["", "?group=week", "?group=month&status=PAID"]),
+    ("api_categories", None, [""]),
+    ("api_budgets", None, [""]),
+]
+
+# Framework bookkeeping that is not part of any view's own work.
+IGNORED_TABLES = ("django_session",)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN QUERY PLAN on every query issued by the read-only views "
+        "and fail if any of them scans a whole table or sorts through a "
+        "temporary B-tree."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans", action="store_true",
+            help="Print the plan of every query, not only the failing ones.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("check_query_plans only understands SQLite query plans.")
+
+        failures = []
+        try:
+            with transaction.atomic():
+                fixture = self.make_fixture()
+                client = Client()
+                client.force_login(fixture["user"])
+                for name, obj, variants in VIEWS:
+                    args = [fixture[obj].pk] if obj else []
+                    for query in variants:
+                        url = reverse(name, args=args) + query.format(
+                            category=fixture["category"].pk,
+                            cursor=encode_cursor(fixture["expense"]),
+                        )
+                        failures += self.check_view(client, url, options["verbose_plans"])
+                raise Rollback
+        except Rollback:
+            pass
+
+        if failures:
+            for url, sql, problems in failures:
+                self.stderr.write(f"{url}: {', '.join(problems)}\n    {sql}")
+            raise CommandError(f"{len(failures)} queries need an index.")
+        self.stdout.write(self.style.SUCCESS("All view queries use an index."))
+
+    def make_fixture(self):
+        today = timezone.now().date()
+        user = User.objects.create_user("__query_plan_check__")
+        category = Category.objects.create(user=user, name="Rent")
+        expense = Expense.objects.create(
+            user=user, category=category, title="Rent", amount=100, date=today
+        )
+        Expense.objects.create(
+            user=user, category=category, title="Late rent", amount=10,
+            date=today - timedelta(days=1), status="PENDING",
+        )
+        ArchivedExpense.objects.create(
+            id=expense.pk + 1000, user=user, category=category, title="Old rent",
+            amount=90, date=today - timedelta(days=1000),
+        )
+        goal = Goal.objects.create(user=user, title="Holiday", target_amount=1000, deadline=today)
+        GoalContribution.objects.create(user=user, goal=goal, amount=100, date=today)
+        return {
+            "user": user,
+            "category": category,
+            "expense": expense,
+            "recurring": RecurringExpense.objects.create(
+                user=user, category=category, title="Rent", amount=100, next_date=today
+            ),
+            "budget": Budget.objects.create(
+                user=user, category=category, amount=500, month=today.replace(day=1)
+            ),
+            "goal": goal,
+            "notification": Notification.objects.create(user=user, message="Hi"),
+        }
+
+    def check_view(self, client, url, verbose):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+            if response.streaming:
+                # Drain streamed responses so their queries are captured too;
+                # the test client closes the response once it is exhausted.
+                b"".join(response.streaming_content)
+        if response.status_code >= 400:
+            raise CommandError(f"{url} returned {response.status_code}")
+
+        failures = []
+        for query in queries.captured_queries:
+            sql = query["sql"]
+            if not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            if any(table in sql for table in IGNORED_TABLES):
+                continue
+            plan = self.explain(sql)
+            if verbose:
+                self.stdout.write(f"{url}\n    {sql}\n      " + "\n      ".join(plan))
+            problems = self.problems(sql, plan)
+            if problems:
+                failures.append((url, sql, problems))
+        return failures
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def problems(self, sql, plan):
+        grouped = " GROUP BY " in sql.upper()
+        problems = []
+        for step in plan:
+            if "VIRTUAL TABLE INDEX" in step and ":M" in step:
+                continue  # an FTS5 MATCH lookup, not a scan
+            if step.startswith("SCAN ") and "USING" not in step:
+                problems.append(f"full scan ({step})")
+            elif step.startswith("USE TEMP B-TREE") and not grouped:
+                # Ordering a grouped result by its aggregate needs a sort no
+                # matter what; anything else should come out of an index.
+                problems.append(f"temp sort ({step})")
+        return problems
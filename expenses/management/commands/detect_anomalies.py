@@ -0,0 +1,43 @@
+import time
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses import anomalies
+
+
+class Command(BaseCommand):
+    help = (
+        "Look for unusual charges, month-over-month jumps and duplicate-looking "
+        "charges in every user's recent expenses and notify them. Findings that "
+        "were already sent are skipped, so it is safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Evaluate as of this day (default: today).")
+        parser.add_argument("--user", help="Only check this username.")
+
+    def handle(self, *args, **options):
+        today = date.today()
+        if options["date"]:
+            try:
+                today = date.fromisoformat(options["date"])
+            except ValueError:
+                raise CommandError("--date must be YYYY-MM-DD")
+
+        users = User.objects.order_by("pk")
+        if options["user"]:
+            users = users.filter(username=options["user"])
+            if not users.exists():
+                raise CommandError(f"User {options['user']!r} does not exist")
+
+        started = time.monotonic()
+        checked = created = 0
+        for user in users.iterator():
+            created += anomalies.notify(user, today)
+            checked += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} users, created {created} notifications "
+            f"in {time.monotonic() - started:.1f}s."
+        ))
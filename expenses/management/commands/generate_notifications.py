@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses import alerts
+
+
+class Command(BaseCommand):
+    help = (
+        "Create budget alerts and recurring-bill reminders for every user. "
+        "Alerts that were already sent are skipped, so it is safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Evaluate as of this day (default: today).")
+        parser.add_argument("--days", type=int, help="Remind about bills due within this many days.")
+
+    def handle(self, *args, **options):
+        today = date.today()
+        if options["date"]:
+            try:
+                today = date.fromisoformat(options["date"])
+            except ValueError:
+                raise CommandError("--date must be YYYY-MM-DD")
+
+        result = alerts.generate(today, days=options["days"])
+
+        for name, seconds in result.timings:
+            self.stdout.write(f"  {name:<10} {seconds * 1000:>9.1f} ms")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result.created} notifications "
+            f"({result.budget_alerts} budget alerts, {result.due_reminders} due reminders, "
+            f"{result.duplicates} already sent)."
+        ))
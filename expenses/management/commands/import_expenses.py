@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.importer import ExpenseImporter, detect_format
+
+
+class Command(BaseCommand):
+    help = "Bulk-import expenses for a user from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Default: guessed from the file name.")
+        parser.add_argument("--chunk-size", type=int, default=20000, help="Rows per transaction.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist")
+
+        fmt = options["format"] or detect_format(options["path"])
+        importer = ExpenseImporter(user, chunk_size=options["chunk_size"], progress=self.progress)
+        with open(options["path"], encoding="utf-8-sig", newline="") as stream:
+            result = importer.run(stream, fmt)
+
+        for line, reason in result.errors:
+            self.stderr.write(f"line {line}: {reason}")
+        if result.rejected > len(result.errors):
+            self.stderr.write(f"... and {result.rejected - len(result.errors)} more rejected rows")
+        if result.failed:
+            raise CommandError(
+                f"Import stopped: {result.failed}. {result.created} expenses were imported before that."
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} expenses in {result.elapsed:.1f}s "
+            f"({result.rows_per_second:,.0f} rows/s), rejected {result.rejected}, "
+            f"created {result.categories_created} categories."
+        ))
+
+    def progress(self, result):
+        self.stdout.write(
+            f"  {result.created:,} rows ({result.rows_per_second:,.0f} rows/s), "
+            f"{result.rejected:,} rejected"
+        )
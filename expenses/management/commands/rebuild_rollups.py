@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily spending rollup from the expense table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only rebuild this username.")
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']!r} does not exist")
+
+        buckets = rollups.rebuild(user)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} rollup buckets."))
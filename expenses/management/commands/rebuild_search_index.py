@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from expenses import search
+
+
+class Command(BaseCommand):
+    help = "Repopulate the FTS5 expense search index from the expense table."
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            raise CommandError("The search index needs SQLite with FTS5.")
+        with transaction.atomic():
+            search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from expenses import goals
+
+
+class Command(BaseCommand):
+    help = "Recompute every goal's saved total, contribution count and first date from its contributions."
+
+    def handle(self, *args, **options):
+        updated = goals.recompute()
+        self.stdout.write(self.style.SUCCESS(f"Recomputed {updated} goals."))
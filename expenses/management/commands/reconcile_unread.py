@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from expenses import unread
+
+
+class Command(BaseCommand):
+    help = "Recount every user's unread notifications and fix counters that drifted."
+
+    def handle(self, *args, **options):
+        fixed = unread.reconcile()
+        self.stdout.write(self.style.SUCCESS(f"Fixed {fixed} unread counters."))
@@ -0,0 +1,43 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses import recurring
+
+
+class Command(BaseCommand):
+    help = (
+        "Post an expense for every recurring expense that has come due, "
+        "catching up on missed cycles. Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Post everything due on or before this day (default: today).")
+        parser.add_argument("--batch-size", type=int, default=recurring.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        today = date.today()
+        if options["date"]:
+            try:
+                today = date.fromisoformat(options["date"])
+            except ValueError:
+                raise CommandError("--date must be YYYY-MM-DD")
+
+        result = recurring.run(today, batch_size=options["batch_size"])
+
+        if result.unknown_cycle:
+            self.stderr.write(
+                f"Skipped {len(result.unknown_cycle)} recurring expenses with an "
+                f"unknown cycle (ids {result.unknown_cycle[:20]})"
+            )
+        if result.failed:
+            self.stderr.write(
+                f"Left {len(result.failed)} recurring expenses for the next run after "
+                f"repeated collisions with a concurrent run (ids {result.failed[:20]})"
+            )
+        if result.already_posted:
+            self.stdout.write(f"Skipped {result.already_posted} cycles that were already posted.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Posted {result.posted} expenses for {result.definitions} recurring "
+            f"expenses in {result.elapsed:.1f}s."
+        ))
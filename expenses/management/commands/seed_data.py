@@ -0,0 +1,56 @@
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        "Create N synthetic users, each with categories, budgets, goals, "
+        "recurring bills, notifications and M expenses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1)
+        parser.add_argument("--expenses", type=int, default=1000, help="Expenses per user.")
+        parser.add_argument("--days", type=int, default=730, help="Days of history to spread them over.")
+        parser.add_argument("--notifications", type=int, default=30, help="Notifications per user.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="seed", help="Usernames are <prefix>1, <prefix>2, ...")
+        parser.add_argument(
+            "--password", default=None,
+            help="Password for every seeded user; without one they cannot log in.",
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["expenses"] < 0 or options["days"] < 1:
+            raise CommandError("--users and --days must be positive and --expenses not negative.")
+        usernames = [f"{options['prefix']}{i}" for i in range(1, options["users"] + 1)]
+        taken = list(User.objects.filter(username__in=usernames).values_list("username", flat=True))
+        if taken:
+            raise CommandError(f"Users already exist: {', '.join(sorted(taken))}. Pick another --prefix.")
+
+        # Hashed once: a PBKDF2 round per user would dominate small seeds.
+        password = make_password(options["password"])
+        started = time.monotonic()
+        for username in usernames:
+            user_started = time.monotonic()
+            seeding.seed_user(
+                username, options["expenses"], days=options["days"],
+                notifications=options["notifications"], seed=options["seed"],
+                password=password, progress=self.progress(username, options["expenses"]),
+            )
+            self.stdout.write(f"{username}: {options['expenses']} expenses in {time.monotonic() - user_started:.1f}s")
+
+        total = options["users"] * options["expenses"]
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['users']} users and {total} expenses in {time.monotonic() - started:.1f}s."
+        ))
+
+    def progress(self, username, expenses):
+        if expenses < 10 * seeding.CHUNK_SIZE:
+            return None
+        return lambda written: self.stdout.write(f"  {username}: {written}/{expenses}")
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database over the read replica "
+        "(EXPENSES_REPLICA_DB), for setups without another replication tool."
+    )
+
+    def handle(self, *args, **options):
+        if not settings.EXPENSES_REPLICA_ALIAS:
+            raise CommandError("No replica configured; set EXPENSES_REPLICA_DB.")
+        replicas.sync()
+        self.stdout.write(self.style.SUCCESS(
+            f"Copied the database to {settings.DATABASES[settings.EXPENSES_REPLICA_ALIAS]['NAME']}."
+        ))
@@ -0,0 +1,211 @@
+"""
+Per-view request metrics in Prometheus text format.
+
+``MetricsMiddleware`` times every request and, through
+``connection.execute_wrapper``, counts and times its SQL queries on every
+database connection, including those of parallel.gather's worker threads
+(see ``wrapping_current``). Totals are kept per URL name in this process and
+served at ``/metrics/`` (see ``render``), together with the context cache
+hit/miss counters from caching.py.
+
+Everything is off unless ``EXPENSES_METRICS`` is set. With
+``EXPENSES_QUERY_LOG_THRESHOLD`` set, any request issuing more queries
+than that is logged to the ``expenses.metrics`` logger with its SQL.
+Streamed responses (the CSV export) are measured until their last chunk
+has been sent, since that is when their queries run.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import ExitStack, nullcontext
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import caching
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNRESOLVED = "<unresolved>"
+
+# The Sample of the request being served; copied into worker threads by
+# sync_to_async along with the rest of the context.
+_current = contextvars.ContextVar("expenses_metrics_sample", default=None)
+
+
+class ViewStats:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.requests = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.response_bytes = 0
+
+    def add(self, sample):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if sample.seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.requests += 1
+        self.seconds += sample.seconds
+        self.queries += sample.queries
+        self.sql_seconds += sample.sql_seconds
+        self.response_bytes += sample.response_bytes
+
+
+_lock = threading.Lock()
+_views = {}
+
+
+def record(view, sample):
+    with _lock:
+        stats = _views.get(view)
+        if stats is None:
+            stats = _views[view] = ViewStats()
+        stats.add(sample)
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+class Sample:
+    """One request's measurements; also the execute wrapper counting its SQL."""
+
+    def __init__(self, keep_sql):
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.response_bytes = 0
+        self.sql = [] if keep_sql else None
+        # Worker threads may count into the same sample at once.
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.sql_seconds += elapsed
+                self.queries += 1
+                if self.sql is not None:
+                    self.sql.append(sql)
+
+    def wrapping(self):
+        """Count this thread's queries into the sample, and make it the current one."""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        stack.callback(_current.set, _current.get())
+        _current.set(self)
+        return stack
+
+
+def wrapping_current():
+    """
+    Count this thread's queries into the current request's Sample, if one
+    is being measured. For threads other than the request's own, whose
+    connections the middleware never wrapped.
+    """
+    sample = _current.get()
+    return sample.wrapping() if sample is not None else nullcontext()
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.EXPENSES_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = settings.EXPENSES_QUERY_LOG_THRESHOLD
+
+    def __call__(self, request):
+        sample = Sample(keep_sql=self.threshold is not None)
+        with sample.wrapping():
+            response = self.get_response(request)
+
+        if response.streaming:
+            response.streaming_content = self._measure_stream(request, response.streaming_content, sample)
+        else:
+            sample.response_bytes = len(response.content)
+            self._finish(request, sample)
+        return response
+
+    def _measure_stream(self, request, content, sample):
+        try:
+            with sample.wrapping():
+                for chunk in content:
+                    sample.response_bytes += len(chunk)
+                    yield chunk
+        finally:
+            self._finish(request, sample)
+
+    def _finish(self, request, sample):
+        sample.seconds = time.perf_counter() - sample.started
+        match = request.resolver_match
+        view = match.view_name if match is not None else UNRESOLVED
+        record(view, sample)
+        if self.threshold is not None and sample.queries > self.threshold:
+            logger.warning(
+                "%s %s (%s) issued %d queries, over the threshold of %d:\n%s",
+                request.method, request.path, view, sample.queries, self.threshold,
+                "\n".join(sample.sql),
+            )
+
+
+# ------------------------------------------------------
+# PROMETHEUS TEXT FORMAT
+# ------------------------------------------------------
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric(lines, name, kind, help_text, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for suffix, labels, value in samples:
+        rendered = ",".join(f'{key}="{_label(val)}"' for key, val in labels)
+        lines.append(f"{name}{suffix}{{{rendered}}} {value}")
+
+
+def render():
+    with _lock:
+        views = sorted((view, vars(stats).copy()) for view, stats in _views.items())
+    lines = []
+
+    latency = []
+    for view, stats in views:
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, stats["buckets"]):
+            cumulative += count
+            latency.append(("_bucket", [("view", view), ("le", bound)], cumulative))
+        latency.append(("_bucket", [("view", view), ("le", "+Inf")], stats["requests"]))
+        latency.append(("_sum", [("view", view)], stats["seconds"]))
+        latency.append(("_count", [("view", view)], stats["requests"]))
+    _metric(lines, "expenses_request_duration_seconds", "histogram",
+            "Request latency by URL name.", latency)
+
+    for name, field, help_text in [
+        ("expenses_sql_queries_total", "queries", "SQL queries issued, by URL name."),
+        ("expenses_sql_duration_seconds_total", "sql_seconds", "Time spent in SQL, by URL name."),
+        ("expenses_response_bytes_total", "response_bytes", "Response body bytes, by URL name."),
+    ]:
+        _metric(lines, name, "counter", help_text,
+                [("", [("view", view)], stats[field]) for view, stats in views])
+
+    _metric(lines, "expenses_context_cache_requests_total", "counter",
+            "Per-user context cache lookups, by context and outcome.", [
+                ("", [("context", name), ("outcome", outcome)], value)
+                for name, counts in sorted(caching.stats().items())
+                for outcome, value in sorted(counts.items())
+            ])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,54 @@
+# Generated by Django 6.0 on 2026-10-18 15:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rollups(apps, schema_editor):
+    Expense = apps.get_model('expenses', 'Expense')
+    SpendingRollup = apps.get_model('expenses', 'SpendingRollup')
+    rows = (
+        Expense.objects.values('user_id', 'category_id', 'date', 'status')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    SpendingRollup.objects.bulk_create(
+        (
+            SpendingRollup(
+                user_id=r['user_id'], category_id=r['category_id'], day=r['date'],
+                status=r['status'], total=r['total'], count=r['count'],
+            )
+            for r in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('PAID', 'Paid'), ('PENDING', 'Pending')], max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='expenses.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'status', 'day'], name='rollup_user_status_day')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'category', 'day', 'status'), name='uniq_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
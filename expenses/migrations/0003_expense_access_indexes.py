@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 15:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0002_spendingrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(fields=['user', 'month'], name='budget_user_month'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'date'], name='expense_user_date'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'status', 'date'], name='expense_user_status_date'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'category', 'date'], name='expense_user_category_date'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', 'created_at'], name='notif_user_read_created'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'created_at'], name='notif_user_created'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0003_expense_access_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportlog',
+            name='byte_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='exportlog',
+            name='duration_ms',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='exportlog',
+            name='gzipped',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='exportlog',
+            name='row_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
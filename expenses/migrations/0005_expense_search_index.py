@@ -0,0 +1,85 @@
+# Generated by Django 6.0 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE expenses_expense_fts USING fts5(
+        title, note, category, owner,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER expenses_expense_fts_insert AFTER INSERT ON expenses_expense BEGIN
+        INSERT INTO expenses_expense_fts (rowid, title, note, category, owner)
+        VALUES (
+            new.id, new.title, new.note,
+            COALESCE((SELECT name FROM expenses_category WHERE id = new.category_id), ''),
+            'u' || new.user_id
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER expenses_expense_fts_delete AFTER DELETE ON expenses_expense BEGIN
+        DELETE FROM expenses_expense_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER expenses_expense_fts_update
+    AFTER UPDATE OF title, note, category_id, user_id ON expenses_expense BEGIN
+        DELETE FROM expenses_expense_fts WHERE rowid = old.id;
+        INSERT INTO expenses_expense_fts (rowid, title, note, category, owner)
+        VALUES (
+            new.id, new.title, new.note,
+            COALESCE((SELECT name FROM expenses_category WHERE id = new.category_id), ''),
+            'u' || new.user_id
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER expenses_category_fts_rename AFTER UPDATE OF name ON expenses_category BEGIN
+        UPDATE expenses_expense_fts SET category = new.name
+        WHERE rowid IN (SELECT id FROM expenses_expense WHERE category_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO expenses_expense_fts (rowid, title, note, category, owner)
+    SELECT e.id, e.title, e.note, COALESCE(c.name, ''), 'u' || e.user_id
+    FROM expenses_expense e
+    LEFT JOIN expenses_category c ON c.id = e.category_id
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS expenses_category_fts_rename",
+    "DROP TRIGGER IF EXISTS expenses_expense_fts_update",
+    "DROP TRIGGER IF EXISTS expenses_expense_fts_delete",
+    "DROP TRIGGER IF EXISTS expenses_expense_fts_insert",
+    "DROP TABLE IF EXISTS expenses_expense_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        # The index is SQLite-only; other backends fall back to LIKE search.
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0004_exportlog_metrics'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'amount'], name='expense_user_amount'),
+        ),
+        migrations.RunPython(_run(CREATE_SQL), _run(DROP_SQL)),
+    ]
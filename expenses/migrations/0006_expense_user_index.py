@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 16:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0005_expense_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Dropped directly: an AlterField would rebuild the table on SQLite
+        # and lose the search index triggers from 0005.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='expense',
+                    name='user',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'DROP INDEX IF EXISTS "expenses_expense_user_id_ab1aae2b"',
+                    'CREATE INDEX "expenses_expense_user_id_ab1aae2b" ON "expenses_expense" ("user_id")',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 17:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0006_expense_user_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='recurring',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='postings', to='expenses.recurringexpense'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringexpense',
+            index=models.Index(fields=['next_date'], name='recurring_next_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='expense',
+            constraint=models.UniqueConstraint(condition=models.Q(('recurring__isnull', False)), fields=('recurring', 'date'), name='uniq_recurring_posting'),
+        ),
+    ]
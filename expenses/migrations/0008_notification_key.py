@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 17:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_recurring_postings'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='key',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(fields=['month'], name='budget_month'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 16:14
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    UserProfile = apps.get_model('expenses', 'UserProfile')
+    Notification = apps.get_model('expenses', 'Notification')
+    UserProfile.objects.bulk_create(
+        [UserProfile(user_id=pk) for pk in User.objects.filter(userprofile__isnull=True).values_list('pk', flat=True)],
+        batch_size=1000,
+    )
+    unread = (
+        Notification.objects.filter(user_id=OuterRef('user_id'), is_read=False)
+        .order_by().values('user_id').annotate(n=Count('id')).values('n')
+    )
+    UserProfile.objects.update(
+        unread_notifications=Coalesce(Subquery(unread), Value(0), output_field=IntegerField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0008_notification_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='unread_notifications',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_unread, migrations.RunPython.noop),
+    ]
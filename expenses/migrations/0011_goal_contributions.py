@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-18 18:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def open_ledgers(apps, schema_editor):
+    # Progress typed in by hand becomes each goal's first contribution.
+    Goal = apps.get_model('expenses', 'Goal')
+    GoalContribution = apps.get_model('expenses', 'GoalContribution')
+    today = timezone.now().date()
+    goals = Goal.objects.filter(current_progress__gt=0)
+    GoalContribution.objects.bulk_create(
+        [
+            GoalContribution(user_id=user_id, goal_id=pk, amount=amount, date=today, note='Opening balance')
+            for pk, user_id, amount in goals.values_list('pk', 'user_id', 'current_progress')
+        ],
+        batch_size=1000,
+    )
+    goals.update(contribution_count=1, first_contribution=today)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0010_archivedexpense'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goal',
+            name='contribution_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='goal',
+            name='first_contribution',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='GoalContribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('date', models.DateField()),
+                ('note', models.CharField(blank=True, max_length=100)),
+                ('goal', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='contributions', to='expenses.goal')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['goal', 'date'], name='contribution_goal_date')],
+            },
+        ),
+        migrations.RunPython(open_ledgers, migrations.RunPython.noop),
+    ]
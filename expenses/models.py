@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 
 
@@ -6,6 +6,9 @@ class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     role = models.CharField(max_length=20, default="User")
     currency = models.CharField(max_length=10, default="€")
+    # Maintained by expenses/unread.py so the badge needs no COUNT query;
+    # reconcile_unread repairs any drift.
+    unread_notifications = models.IntegerField(default=0)
 
     def __str__(self):
         return self.user.username
@@ -21,7 +24,9 @@ class Category(models.Model):
 
 
 class Expense(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Every index in Meta but expense_date leads with user; that one serves
+    # the admin's all-users list, newest first.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
     title = models.CharField(max_length=100)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -33,11 +38,99 @@ class Expense(models.Model):
         ("PENDING", "Pending"),
     )
     status = models.CharField(max_length=10, choices=STATUS, default="PAID")
+    # Set on expenses posted by run_recurring; indexed by the constraint below.
+    recurring = models.ForeignKey(
+        "RecurringExpense", on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="postings", db_index=False,
+    )
+
+    class Meta:
+        constraints = [
+            # One posting per recurring definition per due date, so a re-run
+            # or a concurrent run can never double-post. Partial, so ordinary
+            # expenses carry no extra index entry.
+            models.UniqueConstraint(
+                fields=["recurring", "date"], condition=models.Q(recurring__isnull=False),
+                name="uniq_recurring_posting",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "date"], name="expense_user_date"),
+            models.Index(fields=["user", "status", "date"], name="expense_user_status_date"),
+            models.Index(fields=["user", "category", "date"], name="expense_user_category_date"),
+            models.Index(fields=["user", "amount"], name="expense_user_amount"),
+            models.Index(fields=["date"], name="expense_date"),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.amount}"
+
+    def save(self, *args, **kwargs):
+        # Keep the row and its rollup delta (written by the signal
+        # receivers) in one transaction.
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using")):
+            return super().delete(*args, **kwargs)
+
+
+class ArchivedExpense(models.Model):
+    """
+    An expense older than the archive cutoff, moved out of the hot table by
+    expenses/archive.py. Its rollup buckets stay where they were.
+    """
+    # The expense's own id, so archiving twice or resuming never duplicates.
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
+    title = models.CharField(max_length=100)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    date = models.DateField()
+    note = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=Expense.STATUS, default="PAID")
+    recurring = models.ForeignKey(
+        "RecurringExpense", on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="+", db_index=False,
+    )
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # The id is not SQLite's rowid here, so it is indexed for the
+            # export's date, id ordering.
+            models.Index(fields=["user", "date", "id"], name="archived_user_date"),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.amount}"
 
 
+class SpendingRollup(models.Model):
+    """Per-day totals of a user's expenses, maintained incrementally."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
+    day = models.DateField()
+    status = models.CharField(max_length=10, choices=Expense.STATUS)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "category", "day", "status"],
+                name="uniq_rollup_bucket",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "status", "day"], name="rollup_user_status_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.day} {self.status}: {self.total}"
+
+
 class RecurringExpense(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
@@ -46,6 +139,11 @@ class RecurringExpense(models.Model):
     cycle = models.CharField(max_length=20, default="Monthly")
     next_date = models.DateField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["next_date"], name="recurring_next_date"),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.cycle})"
 
@@ -56,6 +154,12 @@ class Budget(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     month = models.DateField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "month"], name="budget_user_month"),
+            models.Index(fields=["month"], name="budget_month"),
+        ]
+
     def __str__(self):
         return f"{self.category.name} - {self.amount}"
 
@@ -64,19 +168,61 @@ class Goal(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=100)
     target_amount = models.DecimalField(max_digits=10, decimal_places=2)
-    current_progress = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     deadline = models.DateField()
+    # The contribution ledger's total, size and earliest date, maintained by
+    # expenses/goals.py so progress is read without summing the ledger;
+    # recompute_goals repairs any drift.
+    current_progress = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    contribution_count = models.IntegerField(default=0)
+    first_contribution = models.DateField(null=True, blank=True)
 
     def __str__(self):
         return self.title
 
 
+class GoalContribution(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Indexed by the (goal, date) index below.
+    goal = models.ForeignKey(Goal, on_delete=models.CASCADE, related_name="contributions", db_index=False)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    date = models.DateField()
+    note = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["goal", "date"], name="contribution_goal_date"),
+        ]
+
+    def __str__(self):
+        return f"{self.goal_id}: {self.amount}"
+
+    def save(self, *args, **kwargs):
+        # Keep the row and its goal's totals (updated by the signal
+        # receivers) in one transaction.
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using")):
+            return super().delete(*args, **kwargs)
+
+
 class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.TextField()
     icon = models.CharField(max_length=50, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
+    # Identifies generated alerts ("budget:12:100", "due:7:2025-03-01") so a
+    # batch run never sends the same one twice. Empty for ad-hoc messages.
+    key = models.CharField(max_length=100, null=True, blank=True, unique=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "is_read", "created_at"], name="notif_user_read_created"),
+            models.Index(fields=["user", "created_at"], name="notif_user_created"),
+            models.Index(fields=["created_at"], name="notif_created"),
+        ]
 
     def __str__(self):
         return self.message[:30]
@@ -85,6 +231,10 @@ class Notification(models.Model):
 class ExportLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     exported_at = models.DateTimeField(auto_now_add=True)
+    row_count = models.PositiveIntegerField(default=0)
+    byte_count = models.PositiveBigIntegerField(default=0)
+    duration_ms = models.PositiveIntegerField(default=0)
+    gzipped = models.BooleanField(default=False)
 
     def __str__(self):
         return f"Export by {self.user.username}"
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+Keyset (cursor) pagination over expenses ordered by (date, id), newest first.
+
+A page is addressed by the last row of the previous page instead of an
+offset, so page N costs the same single index range scan as page 1.
+"""
+from datetime import date
+
+from django.db.models import Q
+
+
+class KeysetPage:
+    def __init__(self, items, has_next, has_prev):
+        self.items = items
+        self.has_next = has_next
+        self.has_prev = has_prev
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.items[-1]) if self.has_next and self.items else None
+
+    @property
+    def prev_cursor(self):
+        return encode_cursor(self.items[0]) if self.has_prev and self.items else None
+
+
+def encode_cursor(expense):
+    return f"{expense.date.isoformat()}.{expense.pk}"
+
+
+def decode_cursor(value):
+    """Return ``(date, id)`` or None for a missing or malformed cursor."""
+    if not value:
+        return None
+    try:
+        day, pk = value.split(".")
+        return date.fromisoformat(day), int(pk)
+    except ValueError:
+        return None
+
+
+def paginate(queryset, page_size, after=None, before=None):
+    """
+    Return the page of ``queryset`` that follows the ``after`` cursor, or
+    precedes the ``before`` cursor when paging back.
+    """
+    after = decode_cursor(after)
+    before = decode_cursor(before)
+
+    if before:
+        day, pk = before
+        # Written as a range on date plus a tie-break so the (user, date)
+        # index can bound the scan.
+        rows = list(
+            queryset.filter(Q(date__gt=day) | Q(id__gt=pk), date__gte=day)
+            .order_by("date", "id")[:page_size + 1]
+        )
+        has_prev = len(rows) > page_size
+        rows = rows[:page_size]
+        rows.reverse()
+        return KeysetPage(rows, has_next=True, has_prev=has_prev)
+
+    if after:
+        day, pk = after
+        queryset = queryset.filter(Q(date__lt=day) | Q(id__lt=pk), date__lte=day)
+    rows = list(queryset.order_by("-date", "-id")[:page_size + 1])
+    return KeysetPage(rows[:page_size], has_next=len(rows) > page_size, has_prev=after is not None)
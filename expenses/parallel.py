@@ -0,0 +1,38 @@
+"""
+Running a request's independent queries at the same time, for async views.
+
+Django's async ORM hands every query of a request to the same thread, one
+after another, so awaiting several of them together saves nothing.
+``gather`` runs each query function in a worker thread of its own instead,
+on that thread's own database connection; SQLite releases the GIL while a
+statement executes, so the queries really overlap.
+
+Worker connections are treated like a request's: closed after each call
+unless CONN_MAX_AGE keeps them open (see the SQLite performance profile).
+Another connection only sees committed rows, so this is for reads outside
+any transaction that wrote them (not TestCase tests). Their queries are
+counted into the request's metrics like its own.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from . import metrics
+
+
+def _call(query):
+    try:
+        with metrics.wrapping_current():
+            return query()
+    finally:
+        close_old_connections()
+
+
+async def gather(queries):
+    """Call each function of ``{name: function}`` concurrently; ``{name: result}``."""
+    names = list(queries)
+    results = await asyncio.gather(*(
+        sync_to_async(_call, thread_sensitive=False)(queries[name]) for name in names
+    ))
+    return dict(zip(names, results))
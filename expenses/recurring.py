@@ -0,0 +1,166 @@
+"""
+Materialize due recurring expenses.
+
+``run()`` finds every RecurringExpense whose ``next_date`` has passed with
+one query on the ``next_date`` index, then works through them in batches:
+each batch re-reads its rows under lock, posts one Expense per missed cycle
+with ``bulk.insert_expenses``, folds them into the rollup, and moves
+``next_date`` past ``today``, all in one transaction.
+
+Every posting carries its ``recurring`` id and due date, which are unique
+together, so a re-run finds nothing left to do and a concurrent run can
+never post the same cycle twice. Cycles that are already posted (say a
+``next_date`` moved back by hand) are skipped and the definition advanced
+as usual.
+"""
+import calendar
+import time
+from datetime import date, timedelta
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+
+from . import bulk, caching, rollups
+from .models import Expense, RecurringExpense
+
+
+BATCH_SIZE = 2000
+
+# A batch that collides with a concurrent run is re-read and retried.
+MAX_ATTEMPTS = 3
+
+MONTHS = {"monthly": 1, "yearly": 12}
+
+COLUMNS = ["user", "category", "recurring", "title", "amount", "date", "note", "status"]
+
+
+def _add_months(day, months, anchor_day):
+    index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(index, 12)
+    month += 1
+    return date(year, month, min(anchor_day, calendar.monthrange(year, month)[1]))
+
+
+def schedule(next_date, cycle, today):
+    """
+    Return ``(due_dates, new_next_date)`` for one definition, or None when
+    ``cycle`` is not one we know.
+
+    Monthly and yearly cycles are anchored on the day of ``next_date``: while
+    catching up, a bill on the 31st lands on the last day of shorter months
+    and goes back to the 31st after them.
+    """
+    kind = (cycle or "").strip().lower()
+    if kind == "weekly":
+        def step(n):
+            return next_date + timedelta(weeks=n)
+    elif kind in MONTHS:
+        def step(n):
+            return _add_months(next_date, n * MONTHS[kind], next_date.day)
+    else:
+        return None
+
+    due = []
+    current = next_date
+    while current <= today:
+        due.append(current)
+        current = step(len(due))
+    return due, current
+
+
+class RunResult:
+    def __init__(self):
+        self.definitions = 0
+        self.posted = 0
+        self.already_posted = 0
+        self.unknown_cycle = []
+        self.failed = []
+        self.elapsed = 0.0
+
+
+def due_ids(today):
+    return list(
+        RecurringExpense.objects.filter(next_date__lte=today)
+        .order_by().values_list("id", flat=True)
+    )
+
+
+def run(today=None, batch_size=BATCH_SIZE):
+    today = today or date.today()
+    result = RunResult()
+    started = time.monotonic()
+
+    ids = due_ids(today)
+    for i in range(0, len(ids), batch_size):
+        batch = ids[i:i + batch_size]
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                post_batch(batch, today, result)
+                break
+            except IntegrityError:
+                # Another run posted some of these first; the re-read skips
+                # whatever it already advanced. A batch that keeps losing is
+                # left for the next run rather than stopping this one.
+                if attempt == MAX_ATTEMPTS:
+                    result.failed.extend(batch)
+
+    result.elapsed = time.monotonic() - started
+    return result
+
+
+def post_batch(ids, today, result):
+    status = settings.EXPENSES_RECURRING_STATUS
+    table = connection.ops.quote_name(RecurringExpense._meta.db_table)
+    advance = f"UPDATE {table} SET next_date = %s WHERE id = %s"
+
+    with transaction.atomic():
+        rows = (
+            RecurringExpense.objects.select_for_update(skip_locked=True)
+            .filter(id__in=ids, next_date__lte=today)
+            .values_list("id", "user_id", "category_id", "title", "amount", "cycle", "next_date")
+        )
+        postings, moves, unknown = [], [], []
+        for pk, user_id, category_id, title, amount, cycle, next_date in rows:
+            plan = schedule(next_date, cycle, today)
+            if plan is None:
+                unknown.append(pk)
+                continue
+            due, new_next = plan
+            moves.append((new_next, pk))
+            note = f"{cycle} recurring expense"
+            postings.extend(
+                (user_id, category_id, pk, title, amount, day, note, status) for day in due
+            )
+
+        if postings:
+            posted = set(
+                Expense.objects.filter(
+                    recurring_id__in=[pk for _, pk in moves],
+                    date__gte=min(posting[5] for posting in postings),
+                ).values_list("recurring_id", "date")
+            )
+            fresh = [posting for posting in postings if (posting[2], posting[5]) not in posted]
+            skipped = len(postings) - len(fresh)
+            postings = fresh
+        else:
+            skipped = 0
+
+        postings.sort(key=itemgetter(5))
+        bulk.insert_expenses(COLUMNS, [
+            (user_id, category_id, pk, title, str(amount), day.isoformat(), note, status)
+            for user_id, category_id, pk, title, amount, day, note, status in postings
+        ])
+        rollups.add_rows(
+            (user_id, category_id, day, status, amount)
+            for user_id, category_id, pk, title, amount, day, note, status in postings
+        )
+        if moves:
+            with connection.cursor() as cursor:
+                cursor.executemany(advance, moves)
+        caching.bump_many(user_id for user_id, *_ in postings)
+
+    result.definitions += len(moves)
+    result.posted += len(postings)
+    result.already_posted += skipped
+    result.unknown_cycle.extend(unknown)
@@ -0,0 +1,116 @@
+"""
+Sending the analytics views' reads to a read replica.
+
+Views wrapped in ``read_replica`` run their queries on the database alias
+named by ``EXPENSES_REPLICA_ALIAS``; every other read, and every write,
+stays on ``default``. ``ReplicaRouter`` makes the choice per query from a
+context variable the decorator sets, so the models and helpers the views
+call need no ``using()`` of their own.
+
+A replica lags behind, so a user who has just changed something is pinned
+to the primary for ``EXPENSES_REPLICA_PIN_SECONDS``. Every write to a
+user's data already bumps their version in caching.py, whose timestamp
+serves as "last written at"; the pin needs no state of its own.
+
+``sync`` copies one SQLite database into another with SQLite's backup API.
+It is how the tests, and ``manage.py sync_replica``, keep a local replica
+file current.
+"""
+import functools
+from contextvars import ContextVar
+from datetime import timedelta
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from . import caching
+
+
+_reading_from = ContextVar("expenses_replica", default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _reading_from.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Rows read from the replica are the primary's rows.
+        aliases = {"default", settings.EXPENSES_REPLICA_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy; its schema comes with its data.
+        if settings.EXPENSES_REPLICA_ALIAS and db == settings.EXPENSES_REPLICA_ALIAS:
+            return False
+        return None
+
+
+def pinned(user_id):
+    """Whether ``user_id`` wrote recently enough to be kept on the primary."""
+    window = timedelta(seconds=settings.EXPENSES_REPLICA_PIN_SECONDS)
+    return timezone.now() - caching.changed_at(user_id) < window
+
+
+def _stream(alias, content):
+    previous = _reading_from.get()
+    _reading_from.set(alias)
+    try:
+        yield from content
+    finally:
+        _reading_from.set(previous)
+
+
+def read_replica(view):
+    """
+    Run ``view``'s reads on the replica, unless none is configured or the
+    user is pinned. Streamed responses read while they are sent, so their
+    content is wrapped too. Works for async views as well.
+    """
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            alias = settings.EXPENSES_REPLICA_ALIAS
+            user = await request.auser()
+            if not alias or (user.is_authenticated and pinned(user.pk)):
+                return await view(request, *args, **kwargs)
+
+            # Copied into the threads that run the view's queries.
+            token = _reading_from.set(alias)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _reading_from.reset(token)
+
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        alias = settings.EXPENSES_REPLICA_ALIAS
+        if not alias or (request.user.is_authenticated and pinned(request.user.pk)):
+            return view(request, *args, **kwargs)
+
+        token = _reading_from.set(alias)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _reading_from.reset(token)
+        if response.streaming:
+            response.streaming_content = _stream(alias, response.streaming_content)
+        return response
+
+    return wrapper
+
+
+def sync(source="default", target=None):
+    """Copy the ``source`` SQLite database over ``target`` (the replica)."""
+    source, target = connections[source], connections[target or settings.EXPENSES_REPLICA_ALIAS]
+    source.ensure_connection()
+    target.ensure_connection()
+    source.connection.backup(target.connection)
@@ -0,0 +1,76 @@
+"""
+Spending reports over any date range.
+
+The rollup is grouped by bucket (day, week, month or year, truncated in the
+database), category and status in one query; its rows are already totals,
+so at most buckets x categories x statuses of them come back however many
+expenses the range covers. Buckets without spending are filled in with
+zeros so the table and chart have no gaps.
+"""
+from decimal import Decimal
+
+from . import rollups
+from .models import Expense
+
+
+STATUSES = [status for status, _ in Expense.STATUS]
+ZERO = Decimal("0.00")
+
+
+class Bucket:
+    def __init__(self, start):
+        self.start = start
+        self.total = ZERO
+        self.count = 0
+        self.by_status = dict.fromkeys(STATUSES, ZERO)
+
+
+class CategoryLine:
+    def __init__(self, name):
+        self.name = name
+        self.total = ZERO
+        self.count = 0
+        self.share = 0
+
+
+class Report:
+    def __init__(self, start, end, group, buckets, categories):
+        self.start = start
+        self.end = end
+        self.group = group
+        self.buckets = buckets
+        self.categories = categories
+        self.total = sum((b.total for b in buckets), ZERO)
+        self.count = sum(b.count for b in buckets)
+        self.by_status = {
+            status: sum((b.by_status[status] for b in buckets), ZERO) for status in STATUSES
+        }
+
+    @property
+    def average(self):
+        """Average spend per bucket, empty ones included."""
+        return self.total / len(self.buckets) if self.buckets else ZERO
+
+
+def build(user, start, end, group):
+    buckets = {day: Bucket(day) for day in rollups.buckets(start, end, group)}
+    categories = {}
+    for row in rollups.by_period_breakdown(user, group, start, end):
+        bucket = buckets[row["period"]]
+        bucket.total += row["total"]
+        bucket.count += row["count"]
+        bucket.by_status[row["status"]] += row["total"]
+
+        line = categories.get(row["category_id"])
+        if line is None:
+            line = categories[row["category_id"]] = CategoryLine(row["name"])
+        line.total += row["total"]
+        line.count += row["count"]
+
+    report = Report(
+        start, end, group, list(buckets.values()),
+        sorted(categories.values(), key=lambda line: line.total, reverse=True),
+    )
+    for line in report.categories:
+        line.share = line.total * 100 / report.total if report.total else 0
+    return report
@@ -0,0 +1,80 @@
+"""
+Retrying writes that lose the race for SQLite's write lock.
+
+SQLite has one writer at a time. With the performance profile in
+ea/settings.py a writer waits up to the busy timeout for the lock, and
+transactions take it when they begin (``BEGIN IMMEDIATE``), so a reader
+never has to upgrade to a writer halfway, which SQLite can only resolve by
+failing one of them. A write that still gives up with "database is locked"
+is retried here: the view runs in one transaction, so a failed attempt
+leaves nothing behind in the database, and the messages it queued are
+dropped before the next one. Each retry waits about twice as long as the
+one before.
+"""
+import functools
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+
+logger = logging.getLogger(__name__)
+
+LOCKED = ("database is locked", "database table is locked", "database is busy")
+
+
+def is_locked(exc):
+    return isinstance(exc, OperationalError) and any(text in str(exc) for text in LOCKED)
+
+
+def backoff(attempt):
+    """Seconds to wait before retry ``attempt`` (0-based), with jitter."""
+    return settings.EXPENSES_WRITE_RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1.5)
+
+
+def run(func, *args, **kwargs):
+    """
+    Call ``func`` in a transaction, retrying it while the database is
+    locked, up to ``EXPENSES_WRITE_RETRIES`` times.
+    """
+    # Inside an outer transaction a retry can't undo what that transaction
+    # already did, so the error is left for its owner.
+    retries = 0 if connection.in_atomic_block else settings.EXPENSES_WRITE_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        except OperationalError as exc:
+            if attempt == retries or not is_locked(exc):
+                raise
+            delay = backoff(attempt)
+            logger.info("%s: %s, retry %d in %.3fs", getattr(func, "__name__", func), exc, attempt + 1, delay)
+            time.sleep(delay)
+
+
+def retry_writes(view=None, *, methods=("POST",)):
+    """
+    Run a view's ``methods`` requests through ``run``. Other methods are
+    passed straight through, so showing a form takes no write lock.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return view(request, *args, **kwargs)
+            # messages.success() and friends are queued on the request, not
+            # written in the transaction; a retry must not repeat them.
+            queued = getattr(getattr(request, "_messages", None), "_queued_messages", [])
+            mark = len(queued)
+
+            def attempt():
+                del queued[mark:]
+                return view(request, *args, **kwargs)
+
+            attempt.__name__ = view.__name__
+            return run(attempt)
+        return wrapper
+
+    return decorator(view) if view is not None else decorator
@@ -0,0 +1,412 @@
+"""
+Incrementally maintained daily spending totals.
+
+Every Expense write moves its amount between SpendingRollup buckets keyed on
+(user, category, day, status). Dashboards and reports sum those buckets, so
+their cost grows with the number of days in the range instead of the number
+of expenses.
+"""
+import calendar
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek, TruncYear
+
+from .models import ArchivedExpense, Expense, SpendingRollup
+
+
+REBUILD_BATCH_SIZE = 2000
+
+
+def _normalize(category_id, day, status, amount):
+    # Views assign raw POST strings to the model before saving, so the
+    # instance may still hold "2025-01-31" / "12.50" at post_save time.
+    day = Expense._meta.get_field("date").to_python(day)
+    amount = Expense._meta.get_field("amount").to_python(amount)
+    return (category_id, day, status), amount
+
+
+def apply_delta(user_id, category_id, day, status, amount, count):
+    """Add ``amount``/``count`` to one bucket, creating or dropping it as needed."""
+    bucket = SpendingRollup.objects.filter(
+        user_id=user_id, category_id=category_id, day=day, status=status
+    )
+    with transaction.atomic():
+        updated = bucket.update(total=F("total") + amount, count=F("count") + count)
+        if updated:
+            if count < 0:
+                bucket.filter(count__lte=0).delete()
+            return
+        if count <= 0:
+            # Nothing to subtract from (e.g. the user is being deleted).
+            return
+        try:
+            with transaction.atomic():
+                SpendingRollup.objects.create(
+                    user_id=user_id, category_id=category_id, day=day,
+                    status=status, total=amount, count=count,
+                )
+        except IntegrityError:
+            # Another writer created the bucket in the meantime.
+            bucket.update(total=F("total") + amount, count=F("count") + count)
+
+
+def apply_many(deltas):
+    """
+    Apply many bucket deltas at once.
+
+    ``deltas`` maps ``(user_id, category_id, day, status)`` to
+    ``(amount, count)``. Existing buckets are located with one read per user
+    and incremented in place with a single ``executemany``; missing ones are
+    inserted with ``bulk_create``. Used by bulk paths that bypass the model
+    signals.
+    """
+    by_user = defaultdict(dict)
+    for (user_id, category_id, day, status), delta in deltas.items():
+        amount, count = delta
+        if not amount and not count:
+            continue
+        by_user[user_id][(category_id, day, status)] = (Decimal(amount), count)
+
+    table = connection.ops.quote_name(SpendingRollup._meta.db_table)
+    increment = (
+        f"UPDATE {table} SET total = total + %s, count = count + %s WHERE id = %s"
+    )
+
+    with transaction.atomic():
+        for user_id, user_deltas in by_user.items():
+            days = [key[1] for key in user_deltas]
+            existing = {
+                (category_id, day, status): (pk, count)
+                for pk, category_id, day, status, count in
+                SpendingRollup.objects.select_for_update().filter(
+                    user_id=user_id, day__gte=min(days), day__lte=max(days)
+                ).values_list("pk", "category_id", "day", "status", "count")
+            }
+            increments, to_create, emptied = [], [], []
+            for key, (amount, count) in user_deltas.items():
+                if key not in existing:
+                    if count > 0:
+                        to_create.append(SpendingRollup(
+                            user_id=user_id, category_id=key[0], day=key[1],
+                            status=key[2], total=amount, count=count,
+                        ))
+                    continue
+                pk, current = existing[key]
+                if current + count <= 0:
+                    emptied.append(pk)
+                else:
+                    increments.append((str(amount), count, pk))
+
+            if increments:
+                with connection.cursor() as cursor:
+                    cursor.executemany(increment, increments)
+            SpendingRollup.objects.bulk_create(to_create, batch_size=500)
+            if emptied:
+                SpendingRollup.objects.filter(pk__in=emptied).delete()
+
+
+def add_rows(rows):
+    """
+    Fold freshly inserted expenses into the rollup. ``rows`` yields
+    ``(user_id, category_id, day, status, amount)`` tuples.
+    """
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for user_id, category_id, day, status, amount in rows:
+        delta = deltas[(user_id, category_id, day, status)]
+        delta[0] += amount
+        delta[1] += 1
+    apply_many({key: tuple(value) for key, value in deltas.items()})
+
+
+def add_expenses(expenses):
+    """Fold freshly bulk-created Expense instances into the rollup."""
+    rows = []
+    for e in expenses:
+        (category_id, day, status), amount = _normalize(e.category_id, e.date, e.status, e.amount)
+        rows.append((e.user_id, category_id, day, status, amount))
+    add_rows(rows)
+
+
+# ------------------------------------------------------
+# SIGNAL HOOKS
+# ------------------------------------------------------
+def snapshot(instance):
+    """Remember the stored bucket of an expense that is about to be saved."""
+    instance._rollup_old = None
+    if instance._state.adding or instance.pk is None:
+        return
+    row = (
+        Expense.objects.filter(pk=instance.pk)
+        .values_list("category_id", "date", "status", "amount")
+        .first()
+    )
+    instance._rollup_old = row
+
+
+def record_save(instance):
+    new_key, new_amount = _normalize(
+        instance.category_id, instance.date, instance.status, instance.amount
+    )
+    old = getattr(instance, "_rollup_old", None)
+    instance._rollup_old = None
+
+    if old is not None:
+        old_key, old_amount = _normalize(*old)
+        if old_key == new_key:
+            if old_amount != new_amount:
+                apply_delta(instance.user_id, *new_key, new_amount - old_amount, 0)
+            return
+        apply_delta(instance.user_id, *old_key, -old_amount, -1)
+
+    apply_delta(instance.user_id, *new_key, new_amount, 1)
+
+
+def record_delete(instance):
+    key, amount = _normalize(
+        instance.category_id, instance.date, instance.status, instance.amount
+    )
+    apply_delta(instance.user_id, *key, -amount, -1)
+
+
+def release_category(category):
+    """
+    Move a category's buckets to the uncategorised bucket before the
+    category is deleted, mirroring the SET_NULL on its expenses.
+    """
+    rows = SpendingRollup.objects.filter(category=category)
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for r in rows:
+        delta = deltas[(r.user_id, None, r.day, r.status)]
+        delta[0] += r.total
+        delta[1] += r.count
+    with transaction.atomic():
+        rows.delete()
+        apply_many({key: tuple(value) for key, value in deltas.items()})
+
+
+# ------------------------------------------------------
+# QUERIES
+# ------------------------------------------------------
+def _range(user, start=None, end=None, status=None):
+    qs = SpendingRollup.objects.filter(user=user)
+    if start is not None:
+        qs = qs.filter(day__gte=start)
+    if end is not None:
+        qs = qs.filter(day__lte=end)
+    if status is not None:
+        qs = qs.filter(status=status)
+    return qs
+
+
+def total_spent(user, start=None, end=None, status=None):
+    return _range(user, start, end, status).aggregate(total=Sum("total"))["total"] or 0
+
+
+def by_category(user, start=None, end=None, status=None):
+    return (
+        _range(user, start, end, status)
+        .values("category_id", name=F("category__name"))
+        .annotate(total=Sum("total"))
+        .order_by("-total")
+    )
+
+
+# Bucket start for each grouping; weeks start on Monday.
+GROUPINGS = {
+    "day": F("day"),
+    "week": TruncWeek("day"),
+    "month": TruncMonth("day"),
+    "year": TruncYear("day"),
+}
+
+
+def bucket_start(day, group):
+    """The start of the GROUPINGS bucket ``day`` falls in, as the database has it."""
+    if group == "week":
+        return day - timedelta(days=day.weekday())
+    if group == "month":
+        return day.replace(day=1)
+    if group == "year":
+        return day.replace(month=1, day=1)
+    return day
+
+
+def bucket_count(start, end, group):
+    """How many buckets ``buckets(start, end, group)`` returns, without building them."""
+    first, last = bucket_start(start, group), bucket_start(end, group)
+    if group == "day":
+        return (last - first).days + 1
+    if group == "week":
+        return (last - first).days // 7 + 1
+    months = (last.year - first.year) * 12 + last.month - first.month
+    return (months // 12 if group == "year" else months) + 1
+
+
+def buckets(start, end, group):
+    """Every bucket start from the one holding ``start`` to the one holding ``end``."""
+    current = bucket_start(start, group)
+    result = []
+    while current <= end:
+        result.append(current)
+        try:
+            if group == "day":
+                current += timedelta(days=1)
+            elif group == "week":
+                current += timedelta(weeks=1)
+            else:
+                current = _shift_months(current, -12 if group == "year" else -1)
+        except (OverflowError, ValueError):
+            # The next bucket would start after date.max.
+            break
+    return result
+
+
+def by_period(user, group, start=None, end=None, status=None):
+    """Totals and counts per day, week, month or year (see GROUPINGS), oldest first."""
+    return (
+        _range(user, start, end, status)
+        .values(period=GROUPINGS[group])
+        .annotate(total=Sum("total"), count=Sum("count"))
+        .order_by("period")
+    )
+
+
+def by_period_breakdown(user, group, start=None, end=None):
+    """Totals and counts per (bucket, category, status), in one grouped query."""
+    return (
+        _range(user, start, end)
+        .values("category_id", "status", period=GROUPINGS[group], name=F("category__name"))
+        .annotate(total=Sum("total"), count=Sum("count"))
+        .order_by()
+    )
+
+
+def by_category_month(user, start=None, end=None, status=None):
+    """Totals per (category_id, month start)."""
+    return (
+        _range(user, start, end, status)
+        .values("category_id", month=TruncMonth("day"))
+        .annotate(total=Sum("total"))
+        .order_by()
+    )
+
+
+class Period:
+    def __init__(self, start, end, total, previous):
+        self.start = start
+        self.end = end
+        self.total = total
+        self.previous = previous
+
+    @property
+    def change(self):
+        return self.total - self.previous
+
+    @property
+    def change_percent(self):
+        """Change against the previous period in percent, None if that was 0."""
+        if not self.previous:
+            return None
+        return self.change * 100 / self.previous
+
+
+def _shift_months(day, months):
+    index = day.year * 12 + day.month - 1 - months
+    year, month = divmod(index, 12)
+    month += 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def period_ranges(today):
+    """
+    ``{name: ((start, end), (previous_start, previous_end))}`` for today,
+    this week (from Monday), this month and this year. The previous range
+    covers the same stretch of the period before (last week up to the same
+    weekday, last month up to the same day), so the two compare fairly.
+    """
+    yesterday = today - timedelta(days=1)
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    year_start = today.replace(month=1, day=1)
+    return {
+        "today": ((today, today), (yesterday, yesterday)),
+        "week": ((week_start, today), (week_start - timedelta(days=7), today - timedelta(days=7))),
+        "month": ((month_start, today), (_shift_months(month_start, 1), _shift_months(today, 1))),
+        "year": ((year_start, today), (_shift_months(year_start, 12), _shift_months(today, 12))),
+    }
+
+
+def period_totals(user, today, status=None):
+    """
+    Totals for every period in ``period_ranges`` and the one before it, in
+    a single conditional-aggregation query over one indexed day range.
+    Returns ``{name: Period}``.
+    """
+    ranges = period_ranges(today)
+    aggregates = {}
+    for name, (current, previous) in ranges.items():
+        aggregates[name] = Sum("total", filter=Q(day__range=current))
+        aggregates[f"{name}_previous"] = Sum("total", filter=Q(day__range=previous))
+
+    first_day = min(previous[0] for _, previous in ranges.values())
+    row = _range(user, first_day, today, status).aggregate(**aggregates)
+    return {
+        name: Period(current[0], current[1], row[name] or 0, row[f"{name}_previous"] or 0)
+        for name, (current, _) in ranges.items()
+    }
+
+
+# ------------------------------------------------------
+# REBUILD
+# ------------------------------------------------------
+def _grouped(expenses):
+    return (
+        expenses.values("user_id", "category_id", "date", "status")
+        .annotate(total=Sum("amount"), count=Count("id"))
+        .order_by()
+    )
+
+
+def rebuild(user=None):
+    """
+    Recompute the rollup from the expense table and the archive. Returns
+    the bucket count.
+    """
+    expenses = Expense.objects.all()
+    archived = ArchivedExpense.objects.all()
+    rollups = SpendingRollup.objects.all()
+    if user is not None:
+        expenses = expenses.filter(user=user)
+        archived = archived.filter(user=user)
+        rollups = rollups.filter(user=user)
+
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in _grouped(expenses).iterator(chunk_size=REBUILD_BATCH_SIZE):
+            batch.append(SpendingRollup(
+                user_id=row["user_id"], category_id=row["category_id"],
+                day=row["date"], status=row["status"],
+                total=row["total"], count=row["count"],
+            ))
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                SpendingRollup.objects.bulk_create(batch)
+                batch = []
+        SpendingRollup.objects.bulk_create(batch)
+
+        # Archived days can share buckets with expenses added later, so
+        # they are added on top rather than inserted.
+        deltas = {}
+        for row in _grouped(archived).iterator(chunk_size=REBUILD_BATCH_SIZE):
+            key = (row["user_id"], row["category_id"], row["date"], row["status"])
+            deltas[key] = (row["total"], row["count"])
+            if len(deltas) >= REBUILD_BATCH_SIZE:
+                apply_many(deltas)
+                deltas = {}
+        apply_many(deltas)
+
+        return rollups.count()
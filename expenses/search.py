@@ -0,0 +1,191 @@
+"""
+Expense search backed by an SQLite FTS5 index.
+
+``expenses_expense_fts`` holds the title, note and category name of every
+expense (rowid = expense id) plus an ``owner`` token, and is kept in sync by
+the triggers created in migration 0005, so bulk inserts and updates are
+covered as well as model saves. Words in a query become prefix matches
+against the index; numbers and dates become range filters on the indexed
+``amount``/``date`` columns.
+"""
+import re
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+FTS_TABLE = "expenses_expense_fts"
+
+# Relative weight of title, note, category and owner in the bm25 ranking.
+RANK = f"bm25({FTS_TABLE}, 10.0, 2.0, 5.0, 0.0)"
+
+# How many of the best matches are considered when ordering by relevance.
+RANKED_CANDIDATES = 500
+
+INDEX_SQL = f"""
+    INSERT INTO {FTS_TABLE} (rowid, title, note, category, owner)
+    SELECT e.id, e.title, e.note, COALESCE(c.name, ''), 'u' || e.user_id
+    FROM expenses_expense e
+    LEFT JOIN expenses_category c ON c.id = e.category_id
+"""
+
+REBUILD_SQL = [
+    f"DELETE FROM {FTS_TABLE}",
+    INDEX_SQL,
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')",
+]
+
+# Same definition as migration 0005; bulk_insert() swaps it out temporarily.
+INSERT_TRIGGER = "expenses_expense_fts_insert"
+INSERT_TRIGGER_SQL = f"""
+    CREATE TRIGGER {INSERT_TRIGGER} AFTER INSERT ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, title, note, category, owner)
+        VALUES (
+            new.id, new.title, new.note,
+            COALESCE((SELECT name FROM expenses_category WHERE id = new.category_id), ''),
+            'u' || new.user_id
+        );
+    END
+"""
+
+_DAY = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_MONTH = re.compile(r"^\d{4}-\d{2}$")
+_NUMBER = re.compile(r"^\d+(?:\.\d{1,2})?$")
+# FTS5 rejects a quoted string holding NUL, so no control characters get
+# as far as a MATCH expression.
+_CONTROL = re.compile(r"[\x00-\x1f\x7f-\x9f]")
+
+
+def fts_available():
+    return connection.vendor == "sqlite"
+
+
+def _month_range(year, month):
+    start = date(year, month, 1)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def _amount_range(token):
+    # "12" matches 12.00-12.99 and "12.5" matches 12.50-12.59, like the
+    # prefix match the old icontains filter gave.
+    value = Decimal(token)
+    step = Decimal(1).scaleb(value.as_tuple().exponent)
+    return Q(amount__gte=value, amount__lt=value + step)
+
+
+def parse_query(text):
+    """
+    Split a search string into FTS terms and a Q of range filters.
+
+    Every token has to match, as in any search box; a bare four-digit
+    number may be either a year or an amount.
+    """
+    terms = []
+    filters = Q()
+    for token in _CONTROL.sub(" ", text).split():
+        try:
+            if _DAY.match(token):
+                filters &= Q(date=date.fromisoformat(token))
+                continue
+            if _MONTH.match(token):
+                start, end = _month_range(*map(int, token.split("-")))
+                filters &= Q(date__gte=start, date__lt=end)
+                continue
+            if _NUMBER.match(token):
+                q = _amount_range(token)
+                if token.isdigit() and len(token) == 4 and 1900 <= int(token) <= 2100:
+                    q |= Q(date__gte=date(int(token), 1, 1), date__lt=date(int(token) + 1, 1, 1))
+                filters &= q
+                continue
+        except (ValueError, InvalidOperation):
+            pass
+        terms.append(token)
+    return terms, filters
+
+
+def match_expression(user_id, terms):
+    quoted = " AND ".join('"{}"*'.format(t.replace('"', '""')) for t in terms)
+    return f'owner : "u{user_id}" AND ({quoted})'
+
+
+def _like_filter(queryset, text):
+    # Fallback for databases without FTS5: the original unanchored match.
+    return queryset.filter(
+        Q(title__icontains=text) |
+        Q(amount__icontains=text) |
+        Q(date__icontains=text) |
+        Q(category__name__icontains=text)
+    )
+
+
+def filter_expenses(queryset, user, text):
+    """Restrict ``queryset`` to the user's expenses matching ``text``."""
+    if not fts_available():
+        return _like_filter(queryset, text)
+
+    terms, filters = parse_query(text)
+    if terms:
+        queryset = queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            (match_expression(user.pk, terms),),
+        ))
+    return queryset.filter(filters)
+
+
+def ranked(queryset, user, text, limit):
+    """
+    The ``limit`` best matches for ``text`` among ``queryset``, most
+    relevant first. Returns None when the query has no words to rank by.
+    """
+    terms, filters = parse_query(text)
+    if not terms or not fts_available():
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY {RANK} LIMIT %s",
+            (match_expression(user.pk, terms), RANKED_CANDIDATES),
+        )
+        order = {row[0]: position for position, row in enumerate(cursor.fetchall())}
+
+    matches = queryset.filter(filters, id__in=list(order))
+    return sorted(matches, key=lambda e: order[e.pk])[:limit]
+
+
+def rebuild_index():
+    with connection.cursor() as cursor:
+        for sql in REBUILD_SQL:
+            cursor.execute(sql)
+
+
+@contextmanager
+def bulk_insert():
+    """
+    Index the expenses inserted inside the block with one set-based
+    statement instead of the per-row trigger, which costs about as much as
+    the insert itself.
+
+    Must be used inside a transaction: the trigger is dropped and recreated
+    within it, so other connections never see the table without it, and a
+    rollback restores it.
+    """
+    if not fts_available():
+        yield
+        return
+    if not connection.in_atomic_block:
+        raise RuntimeError("search.bulk_insert() must run inside a transaction.")
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM expenses_expense")
+        last_id = cursor.fetchone()[0]
+        cursor.execute(f"DROP TRIGGER IF EXISTS {INSERT_TRIGGER}")
+    yield
+    with connection.cursor() as cursor:
+        # Expense ids are AUTOINCREMENT, so everything new sorts after last_id.
+        cursor.execute(INDEX_SQL + " WHERE e.id > %s", [last_id])
+        cursor.execute(INSERT_TRIGGER_SQL)
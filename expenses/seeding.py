@@ -0,0 +1,219 @@
+"""
+Synthetic users for benchmarks and local development.
+
+``seed_user`` creates a user with categories, budgets, goals, recurring
+bills, notifications and any number of expenses. Everything is drawn from
+a ``random.Random`` seeded with the seed and username, so the same
+arguments give the same data.
+Expenses are written like an import (bulk.insert_expenses in date-ordered
+chunks, rollup and context cache kept in step); the rest is small and goes
+through ``bulk_create``, with the unread counter and goal totals set to
+match.
+"""
+import math
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from . import bulk, caching, rollups, unread
+from .importer import COLUMNS
+from .models import Budget, Category, Goal, GoalContribution, Notification, RecurringExpense
+
+
+# name, icon, typical amount range, relative frequency, titles
+CATEGORIES = [
+    ("Food", "🍔", (60, 1200), 40, ["Groceries", "Lunch", "Coffee", "Dinner with friends", "Bakery"]),
+    ("Transport", "🚕", (30, 900), 20, ["Uber to airport", "Taxi", "Train ticket", "Petrol", "Metro card"]),
+    ("Housing", "🏠", (800, 25000), 2, ["Rent", "Maintenance", "Furniture"]),
+    ("Utilities", "💡", (200, 3000), 6, ["Electricity bill", "Water bill", "Phone recharge", "Internet"]),
+    ("Leisure", "🎬", (150, 3000), 12, ["Netflix", "Movie tickets", "Bookstore", "Concert"]),
+    ("Health", "💊", (100, 2500), 6, ["Pharmacy", "Gym membership", "Doctor visit"]),
+]
+CATEGORY_NAMES = [name for name, *_ in CATEGORIES]
+TITLES = [title for *_, titles in CATEGORIES for title in titles]
+NOTES = ["", "", "", "paid by card", "split with flatmates", "office reimbursable"]
+
+# title, category, amount, cycle
+BILLS = [
+    ("Rent", "Housing", 18000, "Monthly"),
+    ("Internet", "Utilities", 999, "Monthly"),
+    ("Netflix", "Leisure", 649, "Monthly"),
+    ("Gym membership", "Health", 1500, "Monthly"),
+    ("Vegetable box", "Food", 450, "Weekly"),
+    ("Health insurance", "Health", 12000, "Yearly"),
+]
+
+# title, target, months to deadline
+GOALS = [
+    ("Emergency fund", 150000, 18),
+    ("Holiday", 60000, 8),
+    ("New laptop", 90000, 12),
+]
+
+NOTIFICATIONS = [
+    ("💰", "Your {category} budget is {percent}% used."),
+    ("📅", "{bill} is due soon."),
+    ("🎯", "You are {percent}% of the way to your {goal} goal."),
+    ("⚠️", "You exceeded your {category} budget."),
+]
+
+BUDGET_MONTHS = 12
+PENDING_SHARE = 0.08
+CHUNK_SIZE = 20_000
+
+
+def _month_start(day, months_back=0):
+    index = day.year * 12 + day.month - 1 - months_back
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class Seeder:
+    def __init__(self, user, rng, today, days):
+        self.user = user
+        self.rng = rng
+        self.today = today
+        self.days = days
+        # (category id, first of month) -> total, for realistic budgets
+        self.spent = defaultdict(Decimal)
+
+    def categories(self):
+        created = Category.objects.bulk_create([
+            Category(user=self.user, name=name, icon=icon) for name, icon, *_ in CATEGORIES
+        ])
+        self.by_name = {c.name: c for c in created}
+        spec = [(self.by_name[name].pk, amounts, weight, titles) for name, _, amounts, weight, titles in CATEGORIES]
+        self.weights = [weight for _, _, weight, _ in spec]
+        self.kinds = [(pk, math.log(lo), math.log(hi), titles) for pk, (lo, hi), _, titles in spec]
+
+    def expense_rows(self, count):
+        """``count`` rows in COLUMNS order, oldest first; amounts are Decimals."""
+        rng = self.rng
+        first = self.today - timedelta(days=self.days - 1)
+        offsets = sorted(rng.randrange(self.days) for _ in range(count))
+        kinds = rng.choices(self.kinds, weights=self.weights, k=count)
+        for offset, (category_id, lo, hi, titles) in zip(offsets, kinds):
+            day = first + timedelta(days=offset)
+            amount = Decimal(int(math.exp(rng.uniform(lo, hi)) * 100)).scaleb(-2)
+            status = "PENDING" if rng.random() < PENDING_SHARE else "PAID"
+            self.spent[(category_id, day.replace(day=1))] += amount
+            yield (
+                self.user.pk, category_id, rng.choice(titles), amount, day,
+                rng.choice(NOTES), status,
+            )
+
+    def expenses(self, count, progress=None):
+        chunk = []
+        written = 0
+        for row in self.expense_rows(count):
+            chunk.append(row)
+            if len(chunk) == CHUNK_SIZE:
+                written += self.write(chunk)
+                if progress:
+                    progress(written)
+                chunk = []
+        if chunk:
+            written += self.write(chunk)
+            if progress:
+                progress(written)
+
+    def write(self, chunk):
+        with transaction.atomic():
+            bulk.insert_expenses(COLUMNS, [
+                (user_id, category_id, title, str(amount), day.isoformat(), note, status)
+                for user_id, category_id, title, amount, day, note, status in chunk
+            ])
+            caching.bump(self.user.pk)
+            rollups.add_rows(
+                (user_id, category_id, day, status, amount)
+                for user_id, category_id, title, amount, day, note, status in chunk
+            )
+        return len(chunk)
+
+    def budgets(self):
+        months = [_month_start(self.today, back) for back in range(BUDGET_MONTHS)]
+        budgets = []
+        for category in self.by_name.values():
+            for month in months:
+                spent = self.spent.get((category.pk, month))
+                if spent is None:
+                    continue
+                # Somewhere between a little under and comfortably over.
+                amount = max(round(float(spent) * self.rng.uniform(0.8, 1.4), -2), 100)
+                budgets.append(Budget(user=self.user, category=category, amount=amount, month=month))
+        Budget.objects.bulk_create(budgets, batch_size=500)
+
+    def goals(self):
+        rng = self.rng
+        goals, ledgers = [], []
+        for title, target, months in GOALS:
+            # A monthly saving towards some share of the target so far.
+            saved_months = rng.randrange(3, 13)
+            amount = Decimal(round(target * rng.uniform(0.05, 0.9) / saved_months, -1))
+            ledger = [
+                (min(_month_start(self.today, back) + timedelta(days=rng.randrange(28)), self.today), amount)
+                for back in range(saved_months - 1, -1, -1)
+            ]
+            goals.append(Goal(
+                user=self.user, title=title, target_amount=target,
+                deadline=_month_start(self.today, -months),
+                current_progress=amount * len(ledger), contribution_count=len(ledger),
+                first_contribution=min(day for day, _ in ledger),
+            ))
+            ledgers.append(ledger)
+        Goal.objects.bulk_create(goals)
+        GoalContribution.objects.bulk_create([
+            GoalContribution(user=self.user, goal=goal, amount=amount, date=day, note="Monthly saving")
+            for goal, ledger in zip(goals, ledgers)
+            for day, amount in ledger
+        ])
+
+    def bills(self):
+        RecurringExpense.objects.bulk_create([
+            RecurringExpense(
+                user=self.user, category=self.by_name[category], title=title,
+                amount=amount, cycle=cycle,
+                next_date=self.today + timedelta(days=self.rng.randrange(1, 28)),
+            )
+            for title, category, amount, cycle in BILLS
+        ])
+
+    def notifications(self, count):
+        rng = self.rng
+        notifications = []
+        for _ in range(count):
+            icon, template = rng.choice(NOTIFICATIONS)
+            notifications.append(Notification(
+                user=self.user, icon=icon, is_read=rng.random() < 0.7,
+                message=template.format(
+                    category=rng.choice(CATEGORY_NAMES), percent=rng.randrange(50, 130),
+                    bill=rng.choice(BILLS)[0], goal=rng.choice(GOALS)[0],
+                ),
+            ))
+        Notification.objects.bulk_create(notifications, batch_size=500)
+        unread.adjust(self.user.pk, sum(not n.is_read for n in notifications))
+
+
+def seed_user(username, expenses, days=730, notifications=30, seed=0,
+              password="!", today=None, progress=None):
+    """
+    Create ``username`` with a full set of data and ``expenses`` expenses
+    over the last ``days`` days; returns the user. ``password`` is stored
+    as given, so pass a hash (``make_password``) or leave it unusable.
+    ``progress`` is called with the number of expenses written so far.
+    """
+    seeder = Seeder(None, random.Random(f"{seed}:{username}"), today or date.today(), days)
+    with transaction.atomic():
+        seeder.user = User.objects.create(username=username, password=password)
+        seeder.categories()
+        seeder.bills()
+        seeder.goals()
+    seeder.expenses(expenses, progress)
+    with transaction.atomic():
+        seeder.budgets()
+        seeder.notifications(notifications)
+        caching.bump(seeder.user.pk)
+    return seeder.user
@@ -0,0 +1,121 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import caching, goals, rollups, unread
+from .models import Budget, Category, Expense, Goal, GoalContribution, Notification, UserProfile
+
+
+def _cascading_from_user(origin):
+    # Deleting a user removes their rollup rows too, so there is nothing to
+    # keep in sync for the expenses and categories going with them.
+    return isinstance(origin, User)
+
+
+def _cascading_from_goal(origin):
+    return isinstance(origin, (User, Goal))
+
+
+# ------------------------------------------------------
+# SPENDING ROLLUP
+# ------------------------------------------------------
+@receiver(pre_save, sender=Expense)
+def expense_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        rollups.snapshot(instance)
+
+
+@receiver(post_save, sender=Expense)
+def expense_post_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        rollups.record_save(instance)
+
+
+@receiver(post_delete, sender=Expense)
+def expense_post_delete(sender, instance, origin=None, **kwargs):
+    if not _cascading_from_user(origin):
+        rollups.record_delete(instance)
+
+
+@receiver(pre_delete, sender=Category)
+def category_pre_delete(sender, instance, origin=None, **kwargs):
+    if not _cascading_from_user(origin):
+        rollups.release_category(instance)
+
+
+# ------------------------------------------------------
+# GOAL LEDGER
+# ------------------------------------------------------
+@receiver(pre_save, sender=GoalContribution)
+def contribution_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        goals.snapshot(instance)
+
+
+@receiver(post_save, sender=GoalContribution)
+def contribution_post_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        goals.record_save(instance)
+
+
+@receiver(post_delete, sender=GoalContribution)
+def contribution_post_delete(sender, instance, origin=None, **kwargs):
+    if not _cascading_from_goal(origin):
+        goals.record_delete(instance)
+
+
+# ------------------------------------------------------
+# UNREAD COUNTER
+# ------------------------------------------------------
+@receiver(pre_save, sender=Notification)
+def notification_pre_save(sender, instance, raw=False, **kwargs):
+    instance._was_unread = None
+    if not raw and not instance._state.adding and instance.pk is not None:
+        stored = Notification.objects.filter(pk=instance.pk).values_list("is_read", flat=True).first()
+        if stored is not None:
+            instance._was_unread = not stored
+
+
+@receiver(post_save, sender=Notification)
+def notification_post_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    was_unread = getattr(instance, "_was_unread", None)
+    instance._was_unread = None
+    before = bool(was_unread)
+    now = not instance.is_read
+    if now != before:
+        unread.adjust(instance.user_id, 1 if now else -1)
+
+
+@receiver(post_delete, sender=Notification)
+def notification_post_delete(sender, instance, origin=None, **kwargs):
+    if not instance.is_read and not _cascading_from_user(origin):
+        unread.adjust(instance.user_id, -1)
+
+
+@receiver(post_save, sender=User)
+def user_profile_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserProfile.objects.get_or_create(user=instance)
+
+
+# ------------------------------------------------------
+# CONTEXT CACHE
+# ------------------------------------------------------
+@receiver([post_save, post_delete], sender=Expense)
+@receiver([post_save, post_delete], sender=Budget)
+@receiver([post_save, post_delete], sender=Goal)
+@receiver([post_save, post_delete], sender=GoalContribution)
+@receiver([post_save, post_delete], sender=Notification)
+@receiver([post_save, post_delete], sender=Category)
+def user_data_changed(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and not _cascading_from_user(origin):
+        caching.bump(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    # Ids can be handed out again after a rollback (tests, check_query_plans).
+    if created and not raw:
+        caching.new_user(instance.pk)
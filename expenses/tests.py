@@ -1,3 +1,1553 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.auth.models import User
+from django.contrib.messages.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import alerts, anomalies, archive, budgets, bulk, caching, changelists, exports, forecast, goals, metrics, parallel, recurring, replicas, reports, retry, rollups, search, seeding, unread
+from . import views
+from .importer import ExpenseImporter
+from .management.commands import bench_views
+from .models import (
+    ArchivedExpense, Budget, Category, Expense, ExportLog, Goal, GoalContribution, Notification, RecurringExpense, SpendingRollup,
+    UserProfile,
+)
+
+
+def rollup_state(user):
+    return sorted(
+        SpendingRollup.objects.filter(user=user)
+        .values_list("category_id", "day", "status", "total", "count")
+    )
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="pw")
+        self.food = Category.objects.create(user=self.user, name="Food")
+        self.rent = Category.objects.create(user=self.user, name="Rent")
+
+    def add(self, amount, day, category=None, status="PAID"):
+        return Expense.objects.create(
+            user=self.user, title="x", amount=amount, date=day,
+            category=category or self.food, status=status,
+        )
+
+    def test_create_edit_delete_keep_buckets_in_sync(self):
+        e = self.add("10.00", date(2025, 3, 1))
+        self.add("5.50", date(2025, 3, 1))
+        self.assertEqual(rollup_state(self.user), [
+            (self.food.id, date(2025, 3, 1), "PAID", Decimal("15.50"), 2),
+        ])
+
+        # expense_edit assigns raw POST strings before saving.
+        e.amount = "20"
+        e.date = "2025-03-02"
+        e.category_id = self.rent.id
+        e.status = "PENDING"
+        e.save()
+        self.assertEqual(rollup_state(self.user), [
+            (self.food.id, date(2025, 3, 1), "PAID", Decimal("5.50"), 1),
+            (self.rent.id, date(2025, 3, 2), "PENDING", Decimal("20.00"), 1),
+        ])
+
+        e.delete()
+        self.assertEqual(rollup_state(self.user), [
+            (self.food.id, date(2025, 3, 1), "PAID", Decimal("5.50"), 1),
+        ])
+
+    def test_deleting_category_moves_totals_to_uncategorised(self):
+        self.add("10", date(2025, 3, 1))
+        self.add("4", date(2025, 3, 1), category=self.rent)
+        self.rent.delete()
+        self.food.delete()
+        self.assertEqual(rollup_state(self.user), [
+            (None, date(2025, 3, 1), "PAID", Decimal("14.00"), 2),
+        ])
+
+    def test_rebuild_matches_incremental_state(self):
+        for i in range(1, 6):
+            self.add(f"{i}.25", date(2025, 1, i % 3 + 1), status="PAID" if i % 2 else "PENDING")
+        incremental = rollup_state(self.user)
+        SpendingRollup.objects.all().delete()
+        rollups.rebuild()
+        self.assertEqual(rollup_state(self.user), incremental)
+
+    def test_dashboard_reads_rollup(self):
+        today = date.today()
+        self.add("12.00", today)
+        self.add("3.00", today, status="PENDING")
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("dash"))
+        self.assertEqual(response.context["today_spent"], Decimal("12.00"))
+        self.assertEqual(response.context["top_categories"][0]["name"], "Food")
+
+    def test_period_totals_compare_like_for_like(self):
+        today = date(2025, 3, 31)   # a Monday
+        for amount, day in [
+            ("1", today), ("2", date(2025, 3, 30)),          # today, yesterday
+            ("4", date(2025, 3, 24)), ("8", date(2025, 3, 25)),  # last week: only the Monday counts
+            ("16", date(2025, 3, 1)), ("32", date(2025, 2, 28)),
+            ("64", date(2024, 3, 31)), ("128", date(2024, 4, 1)),
+        ]:
+            self.add(amount, day)
+        self.add("1000", today, status="PENDING")
+
+        periods = rollups.period_totals(self.user, today, status="PAID")
+        self.assertEqual(
+            {name: (p.total, p.previous) for name, p in periods.items()},
+            {
+                "today": (1, 2),
+                "week": (1, 4),
+                "month": (1 + 2 + 4 + 8 + 16, 32),
+                "year": (1 + 2 + 4 + 8 + 16 + 32, 64),
+            },
+        )
+        self.assertEqual(periods["today"].change_percent, -50)
+        self.assertEqual(rollups.period_totals(self.user, today)["today"].total, 1001)
+
+    def test_dashboard_query_budget(self):
+        today = date.today()
+        for i in range(20):
+            self.add(i + 1, today - timedelta(days=i * 9), category=self.rent if i % 2 else None)
+        self.client.force_login(self.user)
+        forecast.model(self.user, today)  # cached for the day
+        # Session, user, period totals, budgets, month by category (forecast),
+        # recent, top categories, goals, insights; independent of how much
+        # data there is. The unread badge comes from the profile loaded with
+        # the user.
+        with self.assertNumQueries(9):
+            response = self.client.get(reverse("dash"))
+        self.assertEqual(response.context["periods"]["today"].total, Decimal("1.00"))
+
+
+class QueryPlanTests(TestCase):
+    def test_view_queries_use_indexes(self):
+        call_command("check_query_plans", stdout=StringIO())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("bob", password="pw")
+        food = Category.objects.create(user=self.user, name="Food")
+        for i in range(30):
+            Expense.objects.create(
+                user=self.user, title=f"e{i}", amount="1.00", date=date(2025, 1, 1 + i % 28),
+                category=food if i % 2 else None,
+            )
+        self.client.force_login(self.user)
+
+    def test_streams_csv_with_constant_queries_and_logs_export(self):
+        # session, user, archive probe, one joined SELECT for all rows,
+        # ExportLog insert
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("export_csv"))
+            body = b"".join(response.streaming_content)
+            response.close()
+        lines = body.decode().splitlines()
+        self.assertEqual(lines[0], "Title,Category,Amount,Date,Status")
+        self.assertEqual(len(lines), 31)
+        self.assertIn("e29,Food,1.00,2025-01-02,PAID", lines)
+        self.assertIn("e28,-,1.00,2025-01-01,PAID", lines)
+
+        log = ExportLog.objects.get(user=self.user)
+        self.assertEqual((log.row_count, log.byte_count, log.gzipped), (30, len(body), False))
+
+    def test_gzip_and_date_range(self):
+        response = self.client.get(reverse("export_csv") + "?gzip=1&from=2025-01-01&to=2025-01-01")
+        body = b"".join(response.streaming_content)
+        response.close()
+        lines = gzip.decompress(body).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(ExportLog.objects.get(user=self.user).gzipped)
+
+    def test_rejects_malformed_dates(self):
+        for query in ("?from=garbage", "?to=2025-02-30"):
+            response = self.client.get(reverse("export_csv") + query)
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(ExportLog.objects.exists())
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("bob", password="pw")
+        food = Category.objects.create(user=self.user, name="Food")
+        for i in range(6):
+            Expense.objects.create(
+                user=self.user, category=food, title=f"old{i}", amount="10.00", date=date(2022, 1, 1 + i),
+            )
+        Expense.objects.create(user=self.user, category=food, title="new", amount="5.00", date=date(2025, 1, 1))
+        self.cutoff = date(2024, 1, 1)
+
+    def test_moves_old_expenses_in_resumable_batches(self):
+        state = rollup_state(self.user)
+        self.assertEqual(archive.archive(self.cutoff, batch_size=2, max_batches=2), 4)
+        self.assertEqual(archive.archive(self.cutoff, batch_size=2), 2)
+        self.assertEqual(archive.archive(self.cutoff), 0)
+
+        self.assertEqual(list(Expense.objects.values_list("title", flat=True)), ["new"])
+        self.assertEqual(ArchivedExpense.objects.filter(user=self.user).count(), 6)
+        # Reports are summed from the rollup, which still holds everything.
+        self.assertEqual(rollup_state(self.user), state)
+        report = reports.build(self.user, date(2022, 1, 1), date(2025, 1, 31), "year")
+        self.assertEqual(report.total, Decimal("65.00"))
+
+    def test_rebuild_includes_archived_expenses(self):
+        archive.archive(self.cutoff)
+        # A later expense on an archived day shares its bucket.
+        Expense.objects.create(user=self.user, category=self.user.category_set.get(), title="late", amount="1.00", date=date(2022, 1, 1))
+        state = rollup_state(self.user)
+        SpendingRollup.objects.all().delete()
+        rollups.rebuild(self.user)
+        self.assertEqual(rollup_state(self.user), state)
+
+    def test_export_unions_the_archive_only_when_reaching_back(self):
+        archive.archive(self.cutoff)
+        titles = [row[0] for row in exports.expense_rows(self.user)]
+        self.assertEqual(titles, ["new", "old5", "old4", "old3", "old2", "old1", "old0"])
+
+        # The archive probe finds nothing, so the plain query runs alone.
+        with CaptureQueriesContext(connection) as queries:
+            titles = [row[0] for row in exports.expense_rows(self.user, start="2024-06-01")]
+        self.assertEqual(titles, ["new"])
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn("UNION", queries[-1]["sql"])
+
+    def test_command(self):
+        out = StringIO()
+        call_command("archive_expenses", before=self.cutoff, batch_size=4, stdout=out)
+        self.assertIn("Archived 6 expenses", out.getvalue())
+
+
+@override_settings(EXPENSES_LIST_PAGE_SIZE=4)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("carol", password="pw")
+        self.food = Category.objects.create(user=self.user, name="Food")
+        # Several rows per day so the id tie-break matters.
+        self.expenses = [
+            Expense.objects.create(
+                user=self.user, title=f"e{i}", amount=1, date=date(2025, 1, 1 + i // 3),
+                category=self.food, status="PENDING" if i % 2 else "PAID",
+            )
+            for i in range(10)
+        ]
+        self.client.force_login(self.user)
+
+    def titles(self, response):
+        return [e.title for e in response.context["expenses"]]
+
+    def test_walks_forward_and_back_without_gaps(self):
+        url = reverse("expenses_list")
+        first = self.client.get(url)
+        self.assertEqual(self.titles(first), ["e9", "e8", "e7", "e6"])
+
+        second = self.client.get(url, {"after": first.context["page"].next_cursor})
+        self.assertEqual(self.titles(second), ["e5", "e4", "e3", "e2"])
+
+        third = self.client.get(url, {"after": second.context["page"].next_cursor})
+        self.assertEqual(self.titles(third), ["e1", "e0"])
+        self.assertFalse(third.context["page"].has_next)
+
+        back = self.client.get(url, {"before": third.context["page"].prev_cursor})
+        self.assertEqual(self.titles(back), ["e5", "e4", "e3", "e2"])
+
+    def test_filters_are_kept_in_cursor_links(self):
+        response = self.client.get(reverse("expenses_list"), {"status": "PENDING"})
+        self.assertEqual(self.titles(response), ["e9", "e7", "e5", "e3"])
+        cursor = response.context["page"].next_cursor
+        self.assertContains(response, f"?status=PENDING&amp;after={cursor}")
+
+    def test_deep_page_costs_same_queries_and_joins_category(self):
+        cursor = f"{self.expenses[3].date.isoformat()}.{self.expenses[3].pk}"
+        # session, user, categories, one joined page query
+        with self.assertNumQueries(4):
+            self.client.get(reverse("expenses_list"), {"after": cursor})
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser("root", password="pw")
+        self.users = [User.objects.create_user(f"u{i}") for i in range(3)]
+        self.food = Category.objects.create(user=self.users[0], name="Food")
+        self.expenses = [
+            Expense.objects.create(
+                user=self.users[i % 3], title=f"e{i}", amount=1, date=date(2025, 1, 1 + i // 3),
+                category=self.food,
+            )
+            for i in range(10)
+        ]
+        model_admin = admin.site.get_model_admin(Expense)
+        self.addCleanup(setattr, model_admin, "list_per_page", model_admin.list_per_page)
+        model_admin.list_per_page = 4
+        self.url = reverse("admin:expenses_expense_changelist")
+        self.client.force_login(self.admin)
+
+    def titles(self, response):
+        return [e.title for e in response.context["cl"].result_list]
+
+    def test_pages_by_keyset_in_both_directions(self):
+        first = self.client.get(self.url)
+        self.assertEqual(self.titles(first), ["e9", "e8", "e7", "e6"])
+        self.assertIsNone(first.context["cl"].prev_url)
+
+        second = self.client.get(self.url + first.context["cl"].next_url)
+        self.assertEqual(self.titles(second), ["e5", "e4", "e3", "e2"])
+        third = self.client.get(self.url + second.context["cl"].next_url)
+        self.assertEqual(self.titles(third), ["e1", "e0"])
+        self.assertIsNone(third.context["cl"].next_url)
+
+        back = self.client.get(self.url + third.context["cl"].prev_url)
+        self.assertEqual(self.titles(back), ["e5", "e4", "e3", "e2"])
+
+    def test_cursor_keeps_filters_and_new_filters_drop_it(self):
+        admin.site.get_model_admin(Expense).list_per_page = 3
+        first = self.client.get(self.url, {"user__id__exact": self.users[0].pk})
+        self.assertEqual(self.titles(first), ["e9", "e6", "e3"])
+        next_url = first.context["cl"].next_url
+        self.assertIn(f"user__id__exact={self.users[0].pk}", next_url)
+
+        second = self.client.get(self.url + next_url)
+        self.assertEqual(self.titles(second), ["e0"])
+        self.assertNotIn("after=", second.context["cl"].get_query_string({"status__exact": "PAID"}))
+
+    def test_filters_are_autocompletes_and_the_list_is_joined(self):
+        # session, user, statistics probe, capped count, joined page, next-page probe
+        with self.assertNumQueries(6):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'data-field-name="user"')
+        self.assertNotContains(response, f"?user__id__exact={self.users[1].pk}")
+        self.assertIsNone(response.context["cl"].date_hierarchy)
+
+    def test_counts_stop_at_the_limit_or_use_the_estimate(self):
+        with override_settings(EXPENSES_ADMIN_COUNT_LIMIT=5):
+            response = self.client.get(self.url, {"status__exact": "PAID"})
+        self.assertContains(response, "5+ expenses")
+        self.assertIsNone(changelists.estimated_count(Notification))
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.assertEqual(changelists.estimated_count(Expense), 10)
+        self.assertContains(self.client.get(self.url), "~10 expenses")
+
+    def test_sorting_by_a_column_falls_back_to_numbered_pages(self):
+        response = self.client.get(self.url, {"o": "4"})
+        self.assertIsNone(response.context["cl"].keyset)
+        self.assertEqual(response.context["cl"].paginator.num_pages, 3)
+
+    @override_settings(EXPENSES_ADMIN_PERFORMANCE=False)
+    def test_off_is_the_stock_changelist(self):
+        response = self.client.get(self.url)
+        self.assertNotIsInstance(response.context["cl"], changelists.PerformanceChangeList)
+        self.assertContains(response, f"?user__id__exact={self.users[1].pk}")
+        self.assertEqual(response.context["cl"].date_hierarchy, "date")
+
+
+class BulkActionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("dora", password="pw")
+        self.food = Category.objects.create(user=self.user, name="Food")
+        self.travel = Category.objects.create(user=self.user, name="Travel")
+        self.expenses = [
+            Expense.objects.create(
+                user=self.user, category=self.food, title=f"e{i}", amount="10.00",
+                date=date(2025, 1, 1 + i % 3), status="PENDING",
+            )
+            for i in range(6)
+        ]
+        other = User.objects.create_user("eve")
+        self.theirs = Expense.objects.create(user=other, title="x", amount=5, date=date(2025, 1, 1), status="PENDING")
+        self.client.force_login(self.user)
+
+    def post(self, **data):
+        ids = [e.pk for e in self.expenses[:4]] + [self.theirs.pk]
+        return self.client.post(reverse("expenses_bulk"), {"ids": ids, **data})
+
+    def assert_rollup_matches_rebuild(self):
+        state = rollup_state(self.user)
+        SpendingRollup.objects.filter(user=self.user).delete()
+        rollups.rebuild(self.user)
+        self.assertEqual(rollup_state(self.user), state)
+
+    def test_updates_move_the_rollup_in_bulk(self):
+        version = caching.data_version(self.user.pk)
+        self.post(action="paid")
+        self.post(action="category", category=self.travel.pk)
+        self.post(action="date", date="2025-02-01", next=reverse("pending_expenses"))
+        self.assertNotEqual(caching.data_version(self.user.pk), version)
+
+        moved = Expense.objects.filter(user=self.user, status="PAID", category=self.travel, date=date(2025, 2, 1))
+        self.assertEqual(sorted(moved.values_list("title", flat=True)), ["e0", "e1", "e2", "e3"])
+        self.assert_rollup_matches_rebuild()
+        self.theirs.refresh_from_db()
+        self.assertEqual(self.theirs.status, "PENDING")
+
+    def test_delete_is_one_statement_whatever_the_selection(self):
+        ids = [e.pk for e in self.expenses]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(bulk.delete_expenses(self.user, ids), 6)
+        deletes = [q["sql"] for q in queries.captured_queries if q["sql"].startswith("DELETE FROM \"expenses_expense\"")]
+        self.assertEqual(len(deletes), 1)
+        self.assertFalse(Expense.objects.filter(user=self.user).exists())
+        self.assertFalse(SpendingRollup.objects.filter(user=self.user).exists())
+
+    def test_recurring_postings_cannot_share_a_date(self):
+        bill = RecurringExpense.objects.create(
+            user=self.user, title="Rent", amount=10, next_date=date(2025, 3, 1),
+        )
+        Expense.objects.filter(pk__in=[e.pk for e in self.expenses[:2]]).update(recurring=bill)
+        response = self.post(action="date", date="2025-02-01")
+        self.assertRedirects(response, reverse("expenses_list"))
+        self.assertFalse(Expense.objects.filter(date=date(2025, 2, 1)).exists())
+        self.assert_rollup_matches_rebuild()
+
+    def test_notifications_keep_the_unread_counter(self):
+        notes = [
+            Notification.objects.create(user=self.user, message=str(i), is_read=i == 0)
+            for i in range(4)
+        ]
+        url = reverse("notifications_bulk")
+        response = self.client.post(url, {"action": "read", "ids": [notes[0].pk, notes[1].pk]})
+        # The first was read already.
+        self.assertEqual([str(m) for m in messages.get_messages(response.wsgi_request)], ["1 notifications marked read."])
+        self.assertEqual(UserProfile.objects.get(user=self.user).unread_notifications, 2)
+
+        self.client.post(url, {"action": "delete", "ids": [notes[1].pk, notes[2].pk]})
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(UserProfile.objects.get(user=self.user).unread_notifications, 1)
+        self.assertEqual(unread.reconcile(), 0)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("dave", password="pw")
+        self.other = User.objects.create_user("erin", password="pw")
+        self.travel = Category.objects.create(user=self.user, name="Travel")
+        self.make("Uber to airport", "12.50", date(2025, 3, 4), self.travel)
+        self.make("Coffee", "3.20", date(2025, 3, 5), None, note="airport lounge")
+        self.make("Groceries", "120.00", date(2024, 12, 1), None)
+        Expense.objects.create(user=self.other, title="Uber", amount=1, date=date(2025, 3, 4))
+        self.client.force_login(self.user)
+
+    def make(self, title, amount, day, category, note=""):
+        return Expense.objects.create(
+            user=self.user, title=title, amount=amount, date=day, category=category, note=note
+        )
+
+    def titles(self, text, **params):
+        response = self.client.get(reverse("expenses_list"), {"search": text, **params})
+        return sorted(e.title for e in response.context["expenses"])
+
+    def test_prefix_words_over_title_note_and_category(self):
+        self.assertEqual(self.titles("ub"), ["Uber to airport"])
+        self.assertEqual(self.titles("airp"), ["Coffee", "Uber to airport"])
+        self.assertEqual(self.titles("trav"), ["Uber to airport"])
+        self.assertEqual(self.titles("uber coffee"), [])
+
+    def test_numbers_and_dates_become_ranges(self):
+        self.assertEqual(self.titles("12"), ["Uber to airport"])
+        self.assertEqual(self.titles("12.5"), ["Uber to airport"])
+        self.assertEqual(self.titles("2025-03"), ["Coffee", "Uber to airport"])
+        self.assertEqual(self.titles("2024"), ["Groceries"])
+        self.assertEqual(self.titles("2025-03-05 airport"), ["Coffee"])
+
+    def test_index_follows_edits_and_category_renames(self):
+        coffee = Expense.objects.get(title="Coffee")
+        coffee.title = "Espresso"
+        coffee.save()
+        self.assertEqual(self.titles("espr"), ["Espresso"])
+
+        self.travel.name = "Commute"
+        self.travel.save()
+        self.assertEqual(self.titles("commute"), ["Uber to airport"])
+
+        self.travel.delete()
+        self.assertEqual(self.titles("commute"), [])
+
+    def test_control_characters_are_ignored(self):
+        self.assertEqual(len(self.titles("\x00")), 3)
+        self.assertEqual(self.titles("ub\x00"), ["Uber to airport"])
+        self.assertEqual(self.titles("coffee\x01airp"), ["Coffee"])
+        self.assertEqual(self.titles("ub\x00", sort="relevance"), ["Uber to airport"])
+
+    def test_relevance_ranks_title_matches_first(self):
+        response = self.client.get(reverse("expenses_list"), {"search": "airport", "sort": "relevance"})
+        self.assertEqual([e.title for e in response.context["expenses"]], ["Uber to airport", "Coffee"])
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("frank", password="pw")
+        self.food = Category.objects.create(user=self.user, name="Food")
+
+    def test_csv_import_resolves_categories_and_reports_rejects(self):
+        stream = StringIO(
+            "Title,Category,Amount,Date,Status\n"
+            "Lunch,food,12.50,2025-02-01,PAID\n"
+            "Bus,Transport,2,2025-02-01,pending\n"
+            ",Food,1,2025-02-01,PAID\n"
+            "Taxi,Transport,abc,2025-02-02,PAID\n"
+            "Tea,-,1.5,2025-02-31,PAID\n"
+            "Cab,Transport,7.25,2025-02-02,PAID\n"
+        )
+        result = ExpenseImporter(self.user, chunk_size=2).run(stream, "csv")
+
+        self.assertEqual((result.created, result.rejected, result.categories_created), (3, 3, 1))
+        self.assertEqual([line for line, _ in result.errors], [4, 5, 6])
+        self.assertEqual(Expense.objects.filter(user=self.user, category=self.food).count(), 1)
+        self.assertEqual(Category.objects.filter(user=self.user).count(), 2)
+
+        imported = rollup_state(self.user)
+        rollups.rebuild(self.user)
+        self.assertEqual(rollup_state(self.user), imported)
+
+    def test_jsonl_upload_through_view(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile(
+            "history.jsonl",
+            b'{"title": "Rent", "amount": "900", "date": "2025-01-01", "category": "Housing"}\n'
+            b'not json\n'
+            b'{"title": "Gas", "amount": 40.1, "date": "2025-01-03", "note": "winter"}\n',
+        )
+        response = self.client.post(reverse("expense_import"), {"file": upload})
+        result = response.context["result"]
+        self.assertEqual((result.created, result.rejected), (2, 1))
+        self.assertEqual(Expense.objects.get(title="Gas").note, "winter")
+
+    def test_upload_reports_bad_encoding_and_rejects(self):
+        self.client.force_login(self.user)
+
+        def upload(content):
+            response = self.client.post(
+                reverse("expense_import"), {"file": SimpleUploadedFile("history.csv", content)}
+            )
+            self.assertEqual(response.status_code, 200)
+            # The page doesn't show messages, so earlier ones are still queued.
+            return [(m.level_tag, str(m)) for m in messages.get_messages(response.wsgi_request)][-1:]
+
+        self.assertEqual(upload(b"title,amount,date\nCaf\xe9,3,2025-01-01\n"), [
+            ("error", "Import stopped: the file is not UTF-8 text. 0 expenses were imported before that."),
+        ])
+        self.assertEqual(upload(b"Lunch,3,2025-01-01\nTea,2,2025-01-02\n"), [
+            ("warning", "Imported 0 expenses; 1 rows were rejected."),
+        ])
+        self.assertEqual(upload(b"title,amount,date\nLunch,3,2025-01-01\n"), [
+            ("success", "Imported 1 expenses."),
+        ])
+
+    def test_command_fails_on_bad_encoding(self):
+        with tempfile.NamedTemporaryFile(suffix=".csv") as f:
+            f.write(b"title,amount,date\nLunch,3,2025-01-01\n" + b"Caf\xe9,3,2025-01-01\n" * 5000)
+            f.flush()
+            with self.assertRaisesMessage(CommandError, "not UTF-8"):
+                call_command("import_expenses", "frank", f.name, stdout=StringIO(), stderr=StringIO())
+
+    def test_imported_rows_are_searchable_and_trigger_restored(self):
+        ExpenseImporter(self.user, chunk_size=1).run(
+            StringIO("title,category,amount,date\nLunch,Food,9,2025-02-01\nTaxi,Cab,4,2025-02-02\n")
+        )
+        Expense.objects.create(user=self.user, title="Dinner", amount=20, date=date(2025, 2, 3))
+
+        def found(text):
+            qs = search.filter_expenses(Expense.objects.filter(user=self.user), self.user, text)
+            return sorted(qs.values_list("title", flat=True))
+
+        self.assertEqual(found("cab"), ["Taxi"])
+        self.assertEqual(found("food"), ["Lunch"])
+        self.assertEqual(found("dinner"), ["Dinner"])
+
+
+class RecurringTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("grace", password="pw")
+        self.bills = Category.objects.create(user=self.user, name="Bills")
+
+    def recurring(self, title, cycle, next_date, amount=10):
+        return RecurringExpense.objects.create(
+            user=self.user, category=self.bills, title=title,
+            amount=amount, cycle=cycle, next_date=next_date,
+        )
+
+    def test_schedule_catches_up_and_keeps_month_end_anchor(self):
+        self.assertEqual(
+            recurring.schedule(date(2025, 1, 31), "Monthly", date(2025, 4, 1)),
+            ([date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31)], date(2025, 4, 30)),
+        )
+        self.assertEqual(
+            recurring.schedule(date(2024, 2, 29), "yearly", date(2025, 3, 1)),
+            ([date(2024, 2, 29), date(2025, 2, 28)], date(2026, 2, 28)),
+        )
+        self.assertEqual(
+            recurring.schedule(date(2025, 1, 1), "Weekly", date(2025, 1, 15)),
+            ([date(2025, 1, 1), date(2025, 1, 8), date(2025, 1, 15)], date(2025, 1, 22)),
+        )
+        self.assertIsNone(recurring.schedule(date(2025, 1, 1), "Fortnightly", date(2025, 2, 1)))
+
+    def test_run_posts_missed_cycles_once(self):
+        rent = self.recurring("Rent", "Monthly", date(2025, 1, 5), amount=900)
+        self.recurring("Gym", "Weekly", date(2025, 3, 1))
+        odd = self.recurring("Odd", "Fortnightly", date(2025, 1, 1))
+        self.recurring("Later", "Monthly", date(2025, 6, 1))
+
+        result = recurring.run(date(2025, 3, 10))
+        self.assertEqual((result.definitions, result.posted), (2, 5))
+        self.assertEqual(result.unknown_cycle, [odd.pk])
+
+        rent.refresh_from_db()
+        self.assertEqual(rent.next_date, date(2025, 4, 5))
+        self.assertEqual(
+            list(rent.postings.order_by("date").values_list("date", "amount", "status")),
+            [(date(2025, m, 5), Decimal("900.00"), "PENDING") for m in (1, 2, 3)],
+        )
+        self.assertEqual(rollups.total_spent(self.user), Decimal("2720.00"))
+
+        again = recurring.run(date(2025, 3, 10))
+        self.assertEqual(again.posted, 0)
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 5)
+
+        posted = rollup_state(self.user)
+        rollups.rebuild(self.user)
+        self.assertEqual(rollup_state(self.user), posted)
+
+    def test_stale_next_date_cannot_double_post(self):
+        rent = self.recurring("Rent", "Monthly", date(2025, 1, 5))
+        gym = self.recurring("Gym", "Monthly", date(2025, 1, 10))
+        recurring.run(date(2025, 1, 31))
+        # next_date moved back over cycles that were already posted.
+        RecurringExpense.objects.filter(pk=rent.pk).update(next_date=date(2024, 12, 5))
+        RecurringExpense.objects.filter(pk=gym.pk).update(next_date=date(2025, 2, 10))
+        result = recurring.run(date(2025, 2, 28))
+        self.assertEqual((result.definitions, result.posted, result.already_posted), (2, 3, 1))
+        self.assertEqual(result.failed, [])
+        self.assertEqual(
+            list(rent.postings.order_by("date").values_list("date", flat=True)),
+            [date(2024, 12, 5), date(2025, 1, 5), date(2025, 2, 5)],
+        )
+        rent.refresh_from_db()
+        self.assertEqual(rent.next_date, date(2025, 3, 5))
+        self.assertEqual(gym.postings.count(), 2)
+
+        posted = rollup_state(self.user)
+        rollups.rebuild(self.user)
+        self.assertEqual(rollup_state(self.user), posted)
+
+    def test_query_count_does_not_grow_with_definitions(self):
+        for i in range(30):
+            self.recurring(f"Bill {i}", "Monthly", date(2025, 1, 1))
+        with self.assertNumQueries(15):
+            call_command("run_recurring", "--date", "2025-03-01", stdout=StringIO())
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 90)
+
+
+class AlertTests(TestCase):
+    def setUp(self):
+        self.today = date(2025, 3, 20)
+        self.user = User.objects.create_user("heidi", password="pw")
+        self.other = User.objects.create_user("ivan", password="pw")
+        self.food = Category.objects.create(user=self.user, name="Food")
+        self.fun = Category.objects.create(user=self.user, name="Fun")
+        self.books = Category.objects.create(user=self.other, name="Books")
+        for user, category, amount in [
+            (self.user, self.food, 100), (self.user, self.fun, 100), (self.other, self.books, 50),
+        ]:
+            Budget.objects.create(user=user, category=category, amount=amount, month=date(2025, 3, 1))
+
+    def spend(self, user, category, amount, day, status="PAID"):
+        Expense.objects.create(
+            user=user, category=category, title="x", amount=amount, date=day, status=status,
+        )
+
+    def test_budget_alerts_use_month_to_date_paid_spend(self):
+        self.spend(self.user, self.food, 85, date(2025, 3, 2))
+        self.spend(self.user, self.food, 50, date(2025, 2, 27))     # last month
+        self.spend(self.user, self.fun, 90, date(2025, 3, 5), status="PENDING")
+        self.spend(self.other, self.books, 30, date(2025, 3, 1))
+        self.spend(self.other, self.books, 30, date(2025, 3, 19))
+        self.spend(self.other, self.books, 500, date(2025, 3, 25))  # after today
+
+        result = alerts.generate(self.today)
+        self.assertEqual(result.created, 2)
+        self.assertEqual(
+            sorted(Notification.objects.values_list("user__username", "key")),
+            sorted([
+                ("heidi", f"budget:{Budget.objects.get(category=self.food).pk}:80"),
+                ("ivan", f"budget:{Budget.objects.get(category=self.books).pk}:100"),
+            ]),
+        )
+
+        self.spend(self.user, self.food, 20, date(2025, 3, 20))
+        again = alerts.generate(self.today)
+        self.assertEqual((again.created, again.duplicates), (1, 1))
+        self.assertEqual([name for name, _ in again.timings], ["budgets", "reminders", "dedupe", "insert"])
+
+    def test_due_reminders_are_sent_once_per_due_date(self):
+        rent = RecurringExpense.objects.create(
+            user=self.user, title="Rent", amount=900, cycle="Monthly", next_date=date(2025, 3, 22),
+        )
+        RecurringExpense.objects.create(
+            user=self.user, title="Gym", amount=30, cycle="Monthly", next_date=date(2025, 4, 1),
+        )
+        self.assertEqual(alerts.generate(self.today, days=3).due_reminders, 1)
+        self.assertEqual(alerts.generate(self.today, days=3).created, 0)
+
+        rent.next_date = date(2025, 4, 22)
+        rent.save()
+        self.assertEqual(alerts.generate(date(2025, 4, 20), days=3).created, 1)
+        self.assertEqual(
+            list(Notification.objects.order_by("id").values_list("message", flat=True)),
+            ["Rent (₹900.00) is due on Mar 22.", "Rent (₹900.00) is due on Apr 22."],
+        )
+
+    def test_query_count_does_not_grow_with_users(self):
+        for i in range(20):
+            user = User.objects.create_user(f"bulk{i}")
+            category = Category.objects.create(user=user, name="Food")
+            Budget.objects.create(user=user, category=category, amount=10, month=date(2025, 3, 1))
+            self.spend(user, category, 11, date(2025, 3, 3))
+        with self.assertNumQueries(8):
+            result = alerts.generate(self.today)
+        self.assertEqual(result.created, 20)
+
+    def test_unread_counts_only_inserted_rows(self):
+        # A concurrent run sent one of the alerts after this run's dedupe.
+        Notification.objects.create(user=self.user, key="due:1:2025-03-22", message="x")
+        created = alerts.send([
+            (self.user.pk, "due:1:2025-03-22", "Rent is due.", "🔔"),
+            (self.user.pk, "due:2:2025-03-22", "Gym is due.", "🔔"),
+            (self.other.pk, "due:3:2025-03-22", "Rent is due.", "🔔"),
+        ])
+        self.assertEqual(created, 2)
+        self.assertEqual(UserProfile.objects.get(user=self.user).unread_notifications, 2)
+        self.assertEqual(UserProfile.objects.get(user=self.other).unread_notifications, 1)
+
+
+class BudgetProgressTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("bea", password="pw")
+        self.food = Category.objects.create(user=self.user, name="Food")
+        self.rent = Category.objects.create(user=self.user, name="Rent")
+        self.today = date.today()
+        self.months = budgets.month_starts(self.today, 3)
+        this, last, before = self.months
+        for amount, day, category, status in [
+            (30, this, self.food, "PAID"),
+            (55, this, self.food, "PAID"),
+            (99, this, self.food, "PENDING"),
+            (200, last, self.food, "PAID"),
+            (40, before, self.rent, "PAID"),
+        ]:
+            Expense.objects.create(user=self.user, category=category, title="x", amount=amount, date=day, status=status)
+        for category, amount, month in [
+            (self.food, 100, this), (self.rent, 500, this),
+            (self.food, 150, last), (self.rent, 0, before),
+        ]:
+            Budget.objects.create(user=self.user, category=category, amount=amount, month=month)
+        self.client.force_login(self.user)
+
+    def test_progress_per_budget_and_month(self):
+        history = budgets.history(self.user, self.today, 3)
+        self.assertEqual([month.start for month in history], self.months)
+
+        this, last, before = history
+        self.assertEqual(
+            [(b.category.name, b.spent, b.remaining, b.state) for b in this.budgets],
+            [("Food", 85, 15, "near"), ("Rent", 0, 500, "ok")],
+        )
+        self.assertEqual((this.amount, this.spent, this.over), (600, 85, 0))
+        [food] = last.budgets
+        self.assertEqual((food.spent, food.remaining, food.state), (200, -50, "over"))
+        self.assertAlmostEqual(food.used_percent, Decimal("133.33"), places=2)
+        self.assertEqual(last.over, 1)
+        # A zero budget has no percentage; any spend is over it.
+        self.assertEqual([(b.used_percent, b.state) for b in before.budgets], [(None, "over")])
+
+    def test_history_is_one_query_for_any_number_of_months(self):
+        with self.assertNumQueries(1):
+            budgets.history(self.user, self.today, 3)
+        with self.assertNumQueries(1):
+            history = budgets.history(self.user, self.today, 24)
+        self.assertEqual(sum(len(month.budgets) for month in history), 4)
+
+    def test_pages(self):
+        # session, user, budgets with their spend
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("budgets_list"))
+        self.assertEqual(response.context["month"].spent, 85)
+        self.assertContains(response, "₹15.00 left")
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("budget_history") + "?months=6")
+        self.assertEqual(len(response.context["history"]), 6)
+        self.assertContains(response, "1 over")
+
+    def test_dashboard_budget_is_this_months(self):
+        response = self.client.get(reverse("dash"))
+        self.assertEqual(response.context["total_budget"], 600)
+        self.assertEqual(response.context["remaining_budget"], 600 - 85)
+
+
+class ContextCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("judy", password="pw")
+        self.food = Category.objects.create(user=self.user, name="Food")
+        self.client.force_login(self.user)
+        caching.reset_stats()
+
+    def dash(self):
+        return self.client.get(reverse("dash")).context
+
+    def test_repeat_visit_is_served_from_cache(self):
+        self.dash()
+        # Only the session and user lookups remain.
+        with self.assertNumQueries(2):
+            self.dash()
+        self.assertEqual(caching.stats()["dash"], {"hits": 1, "misses": 1})
+
+    def test_every_kind_of_write_invalidates(self):
+        today = date.today()
+        self.assertEqual(self.dash()["month_spent"], 0)
+
+        expense = Expense.objects.create(user=self.user, category=self.food, title="Soup", amount=7, date=today)
+        self.assertEqual(self.dash()["month_spent"], Decimal("7.00"))
+
+        Budget.objects.create(user=self.user, category=self.food, amount=100, month=today.replace(day=1))
+        self.assertEqual(self.dash()["total_budget"], Decimal("100.00"))
+
+        Goal.objects.create(user=self.user, title="Bike", target_amount=500, deadline=today)
+        self.assertEqual(len(self.dash()["goals"]), 1)
+
+        Notification.objects.create(user=self.user, message="hi")
+        self.assertEqual(self.dash()["notifications_unread_count"], 1)
+        self.client.get(reverse("notifications_mark_all_read"))
+        self.assertEqual(self.dash()["notifications_unread_count"], 0)
+
+        self.food.name = "Groceries"
+        self.food.save()
+        self.assertEqual(self.dash()["top_categories"][0]["name"], "Groceries")
+
+        expense.delete()
+        self.assertEqual(self.dash()["month_spent"], 0)
+
+        ExpenseImporter(self.user).run(StringIO(f"title,amount,date\nTea,3,{today}\n"))
+        self.assertEqual(self.dash()["month_spent"], Decimal("3.00"))
+
+    @unittest.skipIf(
+        settings.CACHES[settings.EXPENSES_CACHE_ALIAS]["BACKEND"].endswith("LocMemCache"),
+        "local memory is per process",
+    )
+    def test_a_bump_in_another_process_reaches_this_one(self):
+        before = caching.data_version(self.user.pk)
+        # What a management command does after writing.
+        subprocess.run(
+            [sys.executable, "manage.py", "shell", "-c", f"from expenses import caching; caching.bump({self.user.pk})"],
+            cwd=settings.BASE_DIR, check=True, capture_output=True,
+        )
+        self.assertNotEqual(caching.data_version(self.user.pk), before)
+
+    def test_users_do_not_share_entries(self):
+        other = User.objects.create_user("ken", password="pw")
+        Expense.objects.create(user=other, title="Rent", amount=900, date=date.today())
+        self.assertEqual(self.dash()["month_spent"], 0)
+        self.client.force_login(other)
+        self.assertEqual(self.dash()["month_spent"], Decimal("900.00"))
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("lena", password="pw")
+        self.client.force_login(self.user)
+
+    def counter(self):
+        return UserProfile.objects.get(user=self.user).unread_notifications
+
+    def test_counter_follows_notifications(self):
+        first = Notification.objects.create(user=self.user, message="a")
+        Notification.objects.create(user=self.user, message="b")
+        Notification.objects.create(user=self.user, message="c", is_read=True)
+        self.assertEqual(self.counter(), 2)
+
+        self.client.get(reverse("notification_toggle_read", args=[first.id]))
+        self.assertEqual(self.counter(), 1)
+        self.client.get(reverse("notification_toggle_read", args=[first.id]))
+        self.assertEqual(self.counter(), 2)
+
+        first.message = "edited"
+        first.save()
+        self.assertEqual(self.counter(), 2)
+
+        first.delete()
+        self.assertEqual(self.counter(), 1)
+        self.client.get(reverse("notifications_mark_all_read"))
+        self.assertEqual(self.counter(), 0)
+
+        Budget.objects.create(
+            user=self.user, amount=10, month=date(2025, 3, 1),
+            category=Category.objects.create(user=self.user, name="Food"),
+        )
+        Expense.objects.create(user=self.user, title="x", amount=20, date=date(2025, 3, 2),
+                               category=Category.objects.get(name="Food"))
+        alerts.generate(date(2025, 3, 20))
+        self.assertEqual(self.counter(), 1)
+
+    def test_badge_costs_no_query(self):
+        Notification.objects.create(user=self.user, message="a")
+        self.client.get(reverse("categories_list"))
+        # Session and user (with profile), then the categories themselves.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("categories_list"))
+        self.assertEqual(response.context["notifications_unread_count"], 1)
+        self.assertContains(response, "Notifications")
+
+    def test_reconcile_repairs_drift(self):
+        Notification.objects.create(user=self.user, message="a")
+        UserProfile.objects.filter(user=self.user).update(unread_notifications=7)
+        other = User.objects.create_user("mo")
+        UserProfile.objects.filter(user=other).delete()
+        Notification.objects.bulk_create([Notification(user=other, message="x") for _ in range(2)])
+
+        out = StringIO()
+        call_command("reconcile_unread", stdout=out)
+        self.assertIn("Fixed 2", out.getvalue())
+        self.assertEqual(self.counter(), 1)
+        self.assertEqual(UserProfile.objects.get(user=other).unread_notifications, 2)
+        self.assertEqual(unread.reconcile(), 0)
+
+
+class GoalLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("gus", password="pw")
+        self.today = date.today()
+        self.goal = Goal.objects.create(user=self.user, title="Bike", target_amount=1000, deadline=self.today + timedelta(days=60))
+        self.other = Goal.objects.create(user=self.user, title="Trip", target_amount=500, deadline=self.today)
+        self.client.force_login(self.user)
+
+    def contribute(self, amount, days_ago=0, goal=None):
+        return GoalContribution.objects.create(
+            user=self.user, goal=goal or self.goal, amount=amount, date=self.today - timedelta(days=days_ago),
+        )
+
+    def totals(self, goal=None):
+        goal = goal or self.goal
+        goal.refresh_from_db()
+        return goal.current_progress, goal.contribution_count, goal.first_contribution
+
+    def test_totals_follow_the_ledger(self):
+        first = self.contribute("100.50", days_ago=9)
+        self.contribute(50)
+        self.assertEqual(self.totals(), (Decimal("150.50"), 2, self.today - timedelta(days=9)))
+
+        first.amount = "120.50"
+        first.save()
+        self.assertEqual(self.totals()[0], Decimal("170.50"))
+
+        first.goal = self.other
+        first.save()
+        self.assertEqual(self.totals(), (50, 1, self.today))
+        self.assertEqual(self.totals(self.other), (Decimal("120.50"), 1, self.today - timedelta(days=9)))
+
+        first.delete()
+        self.assertEqual(self.totals(self.other), (0, 0, None))
+
+    def test_projection_from_the_average_rate(self):
+        self.contribute(100, days_ago=9)
+        self.contribute(100)
+        [goal] = goals.progress(Goal.objects.filter(pk=self.goal.pk), self.today)
+        # 200 in 10 days is 20 a day; 800 to go.
+        self.assertEqual(goal.projected, self.today + timedelta(days=40))
+        self.assertTrue(goal.on_track)
+        self.assertEqual((goal.percent, goal.remaining), (20, 800))
+
+        [trip] = goals.progress([self.other], self.today)
+        self.assertEqual((trip.projected, trip.on_track), (None, False))
+
+    def test_recompute_repairs_drift(self):
+        self.contribute(100, days_ago=3)
+        Goal.objects.update(current_progress=999, contribution_count=7, first_contribution=None)
+        self.assertEqual(goals.recompute(), 2)
+        self.assertEqual(self.totals(), (100, 1, self.today - timedelta(days=3)))
+        self.assertEqual(self.totals(self.other), (0, 0, None))
+
+    def test_dashboard_goals_are_one_query_however_many_contributions(self):
+        for days_ago in range(30):
+            self.contribute(10, days_ago=days_ago)
+        with self.assertNumQueries(1):
+            result = views._dash_queries(self.user, self.today)["goals"]()
+        self.assertEqual([(g.title, g.current_progress) for g in result], [("Bike", 300), ("Trip", 0)])
+
+    def test_bad_contributions_are_rejected(self):
+        url = reverse("goal_contribute", args=[self.goal.pk])
+        for data in [
+            {"amount": "1e400", "date": self.today.isoformat()},
+            {"amount": "inf", "date": self.today.isoformat()},
+            {"amount": "abc", "date": self.today.isoformat()},
+            {"amount": "10", "date": "bad"},
+            {"amount": "10", "date": self.today.isoformat(), "note": "x" * 101},
+            {},
+        ]:
+            with self.subTest(data=data):
+                response = self.client.post(url, data)
+                self.assertRedirects(response, reverse("goal_detail", args=[self.goal.pk]))
+                self.assertIn("Enter an amount", [str(m) for m in messages.get_messages(response.wsgi_request)][0])
+        self.assertFalse(GoalContribution.objects.exists())
+        self.assertEqual(self.client.get(reverse("dash")).status_code, 200)
+        self.assertEqual(self.client.get(reverse("goal_detail", args=[self.goal.pk])).status_code, 200)
+
+    def test_pages(self):
+        response = self.client.post(
+            reverse("goal_contribute", args=[self.goal.pk]),
+            {"amount": "75.00", "date": self.today.isoformat(), "note": "Birthday money"},
+        )
+        self.assertRedirects(response, reverse("goal_detail", args=[self.goal.pk]))
+        self.assertEqual(self.totals()[0], 75)
+
+        response = self.client.get(reverse("goal_detail", args=[self.goal.pk]))
+        self.assertContains(response, "Birthday money")
+        self.assertEqual(response.context["months"], [(self.today.replace(day=1), 75, 75)])
+
+        contribution = GoalContribution.objects.get()
+        self.client.get(reverse("contribution_delete", args=[contribution.pk]))
+        self.assertEqual(self.totals(), (0, 0, None))
+
+
+class AnalyticsApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("nina", password="pw")
+        self.food = Category.objects.create(user=self.user, name="Food")
+        self.rent = Category.objects.create(user=self.user, name="Rent")
+        for amount, day, category, status in [
+            (10, date(2025, 3, 3), self.food, "PAID"),
+            (5, date(2025, 3, 3), self.food, "PAID"),
+            (900, date(2025, 3, 10), self.rent, "PAID"),
+            (40, date(2025, 4, 2), self.food, "PENDING"),
+        ]:
+            Expense.objects.create(user=self.user, category=category, title="x", amount=amount, date=day, status=status)
+        Budget.objects.create(user=self.user, category=self.rent, amount=1000, month=date(2025, 3, 1))
+        Budget.objects.create(user=self.user, category=self.food, amount=100, month=date(2025, 3, 1))
+        Budget.objects.create(user=self.user, category=self.food, amount=50, month=date(2025, 4, 1))
+        self.client.force_login(self.user)
+
+    def get(self, name, query="", **headers):
+        return self.client.get(reverse(name) + query, headers=headers)
+
+    def test_payloads_are_columnar(self):
+        day = self.get("api_spend", "?from=2025-03-01&to=2025-04-30").json()
+        self.assertEqual(day["period"], ["2025-03-03", "2025-03-10", "2025-04-02"])
+        self.assertEqual(day["total"], [15.0, 900.0, 40.0])
+        self.assertEqual(day["count"], [2, 1, 1])
+
+        month = self.get("api_spend", "?group=month&status=PAID&from=2025-01-01&to=2025-12-31").json()
+        self.assertEqual((month["period"], month["total"]), (["2025-03-01"], [915.0]))
+        week = self.get("api_spend", "?group=week&from=2025-03-01&to=2025-03-31").json()
+        self.assertEqual(week["period"], ["2025-03-03", "2025-03-10"])
+
+        categories = self.get("api_categories", "?from=2025-03-01&to=2025-03-31").json()
+        self.assertEqual((categories["category"], categories["total"]), (["Rent", "Food"], [900.0, 15.0]))
+
+        budgets = self.get("api_budgets", "?from=2025-03-01&to=2025-04-30").json()
+        self.assertEqual(budgets["month"], ["2025-03-01", "2025-03-01", "2025-04-01"])
+        self.assertEqual(budgets["category"], ["Food", "Rent", "Food"])
+        self.assertEqual(budgets["budget"], [100.0, 1000.0, 50.0])
+        self.assertEqual(budgets["spent"], [15.0, 900.0, 0.0])
+
+        self.assertEqual(self.get("api_spend", "?group=decade").status_code, 400)
+        self.assertEqual(self.get("api_budgets", "?from=2025-05-01&to=2025-04-01").status_code, 400)
+
+    def test_unchanged_data_is_revalidated_without_aggregates(self):
+        query = "?from=2025-03-01&to=2025-03-31"
+        first = self.get("api_spend", query)
+        self.assertIn("no-cache", first["Cache-Control"])
+        # Session and user only.
+        with self.assertNumQueries(2):
+            again = self.get("api_spend", query, if_none_match=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(
+            self.get("api_spend", query, if_modified_since=first["Last-Modified"]).status_code, 304
+        )
+
+        Expense.objects.create(user=self.user, category=self.food, title="x", amount=1, date=date(2025, 3, 4))
+        changed = self.get("api_spend", query, if_none_match=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()["total"], [15.0, 1.0, 900.0])
+
+
+class AnomalyTests(TestCase):
+    def setUp(self):
+        self.today = date(2025, 3, 20)
+        self.user = User.objects.create_user("olga", password="pw")
+        self.food = Category.objects.create(user=self.user, name="Food")
+        self.travel = Category.objects.create(user=self.user, name="Travel")
+
+    def spend(self, amount, day, category=None):
+        return Expense.objects.create(
+            user=self.user, category=category or self.food, title="x", amount=amount, date=day,
+        )
+
+    def test_history_loads_as_arrays(self):
+        self.spend("12.34", date(2025, 3, 1))
+        Expense.objects.create(user=self.user, title="x", amount=5, date=date(2025, 3, 2))
+        history = anomalies.load(self.user, self.today)
+        order = history.days.argsort()
+        self.assertEqual(history.days[order].tolist(), [date(2025, 3, 1).toordinal(), date(2025, 3, 2).toordinal()])
+        self.assertEqual(history.cents[order].tolist(), [1234, 500])
+        self.assertEqual(history.categories[order].tolist(), [self.food.pk, anomalies.NO_CATEGORY])
+
+    def test_finds_outliers_jumps_and_duplicates(self):
+        for i in range(10):
+            self.spend(20 + i % 3, date(2025, 2, 1) + timedelta(days=i))
+        outlier = self.spend(400, date(2025, 3, 18))
+        self.spend(10, date(2024, 12, 1))                   # too old to announce
+        self.spend(600, date(2025, 3, 15), self.travel)
+        duplicate = self.spend(600, date(2025, 3, 16), self.travel)
+
+        found = {key: message for _, key, message, _ in anomalies.detect(self.user, self.today)}
+        self.assertEqual(sorted(found), sorted([
+            f"anomaly:outlier:{outlier.pk}",
+            f"anomaly:jump:{self.food.pk}:2025-03",
+            f"anomaly:duplicate:{duplicate.pk}",
+        ]))
+        self.assertIn("Mar 15 and Mar 16", found[f"anomaly:duplicate:{duplicate.pk}"])
+
+        out = StringIO()
+        call_command("detect_anomalies", "--date", "2025-03-20", stdout=out)
+        self.assertIn("created 3 notifications", out.getvalue())
+        self.assertEqual(anomalies.notify(self.user, self.today), 0)
+        self.assertEqual(UserProfile.objects.get(user=self.user).unread_notifications, 3)
+
+        self.client.force_login(self.user)
+        self.assertEqual(len(self.client.get(reverse("dash")).context["insights"]), 3)
+
+
+class ForecastTests(TestCase):
+    def setUp(self):
+        self.today = date(2025, 3, 15)
+        self.user = User.objects.create_user("pia", password="pw")
+        self.food = Category.objects.create(user=self.user, name="Food")
+        self.home = Category.objects.create(user=self.user, name="Home")
+        for month in [date(2024, 12, 10), date(2025, 1, 10), date(2025, 2, 10)]:
+            Expense.objects.create(user=self.user, category=self.food, title="x", amount=300, date=month)
+        Expense.objects.create(user=self.user, category=self.food, title="x", amount=200, date=date(2025, 3, 5))
+        self.rent = RecurringExpense.objects.create(
+            user=self.user, category=self.home, title="Rent", amount=1000, cycle="Monthly",
+            next_date=date(2025, 3, 20),
+        )
+        RecurringExpense.objects.create(
+            user=self.user, category=self.home, title="Gym", amount=10, cycle="Weekly",
+            next_date=date(2025, 3, 17),
+        )
+        # Last month's rent, posted by run_recurring: a bill, not everyday spend.
+        Expense.objects.create(
+            user=self.user, category=self.home, recurring=self.rent, title="Rent", amount=1000,
+            date=date(2025, 2, 20),
+        )
+
+    def test_month_end_and_outlook(self):
+        result = forecast.project(self.user, self.today)
+        # Food: 200 so far, the 300/month history blended with this month's
+        # rate for the 16 days left; Home: rent plus three gym sessions.
+        rate = (200 + 300 / 31 * forecast.PRIOR_DAYS) / (15 + forecast.PRIOR_DAYS)
+        self.assertAlmostEqual(result.month_end, 200 + rate * 16 + 1030, places=1)
+        self.assertEqual(result.month_to_date, 200)
+        self.assertEqual(result.months[0], date(2025, 3, 1))
+        self.assertEqual(result.months[-1], date(2026, 2, 1))
+
+        rows = dict(result.rows)
+        self.assertEqual(rows["Food"][1:], [300.0] * 11)
+        self.assertEqual(rows["Home"][1:4], [1040.0, 1040.0, 1050.0])  # five Mondays in June
+
+    def test_model_is_cached_for_the_day(self):
+        forecast.project(self.user, self.today)
+        Expense.objects.create(user=self.user, category=self.food, title="x", amount=50, date=self.today)
+        # Only this month's actual spend is re-read.
+        with self.assertNumQueries(1):
+            result = forecast.project(self.user, self.today)
+        self.assertEqual(result.month_to_date, 250)
+
+    def test_expand_follows_cycles(self):
+        amounts = forecast.expand(
+            [date(2025, 1, 31).toordinal(), date(2025, 3, 1).toordinal(), date(2025, 6, 1).toordinal()],
+            ["Monthly", "Weekly", "Fortnightly"],
+            [100, 5, 1],
+            first_month=int(forecast._month_index(date(2025, 3, 1).toordinal())),
+            months=3,
+        )
+        # January and February are overdue, so they land on March.
+        self.assertEqual(amounts.tolist(), [[300, 100, 100], [25, 20, 25], [0, 0, 0]])
+
+
+class RangeReportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("quinn", password="pw")
+        self.food = Category.objects.create(user=self.user, name="Food")
+        self.rent = Category.objects.create(user=self.user, name="Rent")
+        for amount, day, category, status in [
+            (10, date(2024, 12, 30), self.food, "PAID"),
+            (5, date(2025, 1, 2), self.food, "PENDING"),
+            (900, date(2025, 1, 20), self.rent, "PAID"),
+            (7, date(2025, 3, 1), self.food, "PAID"),
+        ]:
+            Expense.objects.create(user=self.user, category=category, title="x", amount=amount, date=day, status=status)
+        self.client.force_login(self.user)
+
+    def test_buckets_are_filled_and_broken_down(self):
+        with self.assertNumQueries(1):
+            report = reports.build(self.user, date(2024, 12, 15), date(2025, 3, 31), "month")
+        self.assertEqual(
+            [(b.start, b.total, b.count) for b in report.buckets],
+            [
+                (date(2024, 12, 1), Decimal("10.00"), 1),
+                (date(2025, 1, 1), Decimal("905.00"), 2),
+                (date(2025, 2, 1), Decimal("0.00"), 0),
+                (date(2025, 3, 1), Decimal("7.00"), 1),
+            ],
+        )
+        self.assertEqual(report.buckets[1].by_status, {"PAID": Decimal("900.00"), "PENDING": Decimal("5.00")})
+        self.assertEqual([(c.name, c.total, c.count) for c in report.categories], [
+            ("Rent", Decimal("900.00"), 1), ("Food", Decimal("22.00"), 3),
+        ])
+        self.assertEqual(report.total, Decimal("922.00"))
+
+        weeks = reports.build(self.user, date(2024, 12, 30), date(2025, 1, 12), "week")
+        # 2024-12-30 is a Monday, so the first week spans the new year.
+        self.assertEqual([(b.start, b.total) for b in weeks.buckets], [
+            (date(2024, 12, 30), Decimal("15.00")), (date(2025, 1, 6), Decimal("0.00")),
+        ])
+        years = reports.build(self.user, date(2024, 1, 1), date(2025, 12, 31), "year")
+        self.assertEqual([b.total for b in years.buckets], [Decimal("10.00"), Decimal("912.00")])
+
+    def test_view(self):
+        response = self.client.get(reverse("range_report") + "?from=2025-01-01&to=2025-01-31&group=day")
+        self.assertEqual(len(response.context["report"].buckets), 31)
+        self.assertContains(response, "₹905.00")
+        response = self.client.get(reverse("range_report") + "?group=decade")
+        self.assertEqual(response.context["report"].group, "day")
+        self.assertIn("group must be one of", response.context["error"])
+
+    def test_range_is_bounded(self):
+        response = self.client.get(reverse("range_report") + "?from=1000-01-01&to=9998-12-31&group=day")
+        self.assertIn("at most 3660 days", response.context["error"])
+        self.assertEqual(response.context["report"].group, "day")
+        self.assertLessEqual(len(response.context["report"].buckets), 31)
+
+        for group, count in [("day", 365), ("week", 53), ("month", 12), ("year", 1)]:
+            response = self.client.get(reverse("range_report") + f"?from=9999-01-01&to=9999-12-31&group={group}")
+            self.assertIsNone(response.context["error"])
+            self.assertEqual(len(response.context["report"].buckets), count)
+            self.assertEqual(rollups.bucket_count(date(9999, 1, 1), date(9999, 12, 31), group), count)
+
+
+@override_settings(EXPENSES_METRICS=True, EXPENSES_QUERY_LOG_THRESHOLD=None)
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ruth", password="pw")
+        Expense.objects.create(user=self.user, title="Tea", amount=3, date=date.today())
+        self.client.force_login(self.user)
+        metrics.reset()
+
+    def scrape(self):
+        return self.client.get(reverse("metrics")).content.decode()
+
+    def test_views_are_measured(self):
+        self.client.get(reverse("categories_list"))
+        self.client.get(reverse("categories_list"))
+        export = self.client.get(reverse("export_csv"))
+        body = b"".join(export.streaming_content)
+        text = self.scrape()
+
+        self.assertIn('expenses_request_duration_seconds_count{view="categories_list"} 2', text)
+        self.assertIn('expenses_request_duration_seconds_bucket{view="categories_list",le="+Inf"} 2', text)
+        # Session, user and the categories, twice.
+        self.assertIn('expenses_sql_queries_total{view="categories_list"} 6', text)
+        # The export's queries and bytes are counted as it streams.
+        self.assertIn(f'expenses_response_bytes_total{{view="export_csv"}} {len(body)}', text)
+        export_queries = next(
+            line for line in text.splitlines() if line.startswith('expenses_sql_queries_total{view="export_csv"}')
+        )
+        self.assertGreater(int(export_queries.split()[-1]), 2)
+
+        caching.reset_stats()
+        self.client.get(reverse("dash"))
+        self.assertIn('expenses_context_cache_requests_total{context="dash",outcome="misses"} 1', self.scrape())
+
+    def test_query_threshold_logs_sql(self):
+        with self.settings(EXPENSES_QUERY_LOG_THRESHOLD=2):
+            client = self.client_class()
+            client.force_login(self.user)
+            with self.assertLogs("expenses.metrics", "WARNING") as logs:
+                client.get(reverse("categories_list"))
+        self.assertIn("issued 3 queries", logs.output[0])
+        self.assertIn("expenses_category", logs.output[0])
+
+    @override_settings(EXPENSES_METRICS=False)
+    def test_endpoint_is_opt_in(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+
+class SeedingTests(TestCase):
+    def test_seeded_user_is_consistent(self):
+        user = seeding.seed_user("seeded", 500, days=90, notifications=10, today=date(2025, 3, 20))
+
+        self.assertEqual(Expense.objects.filter(user=user).count(), 500)
+        self.assertFalse(Expense.objects.filter(user=user, date__gt=date(2025, 3, 20)).exists())
+        self.assertEqual(Category.objects.filter(user=user).count(), len(seeding.CATEGORIES))
+        self.assertEqual(RecurringExpense.objects.filter(user=user).count(), len(seeding.BILLS))
+        self.assertEqual(Goal.objects.filter(user=user).count(), len(seeding.GOALS))
+        self.assertTrue(Budget.objects.filter(user=user, month=date(2025, 3, 1)).exists())
+
+        # Rollup, goal totals, unread counter and search index match what
+        # was written.
+        seeded = rollup_state(user)
+        rollups.rebuild(user)
+        self.assertEqual(rollup_state(user), seeded)
+        self.assertEqual(
+            unread.count_for(User.objects.get(pk=user.pk)),
+            Notification.objects.filter(user=user, is_read=False).count(),
+        )
+        self.assertEqual(
+            search.filter_expenses(Expense.objects.filter(user=user), user, "coffee").count(),
+            Expense.objects.filter(user=user, title="Coffee").count(),
+        )
+        seeded = list(Goal.objects.filter(user=user).values_list("current_progress", "contribution_count", "first_contribution"))
+        goals.recompute()
+        self.assertEqual(
+            list(Goal.objects.filter(user=user).values_list("current_progress", "contribution_count", "first_contribution")),
+            seeded,
+        )
+
+    def test_same_seed_same_data(self):
+        def amounts(username):
+            user = seeding.seed_user(username, 50, seed=3, today=date(2025, 3, 20))
+            return list(Expense.objects.filter(user=user).order_by("id").values_list("date", "amount", "title"))
+
+        # The username is part of the seed, so compare two runs of one name.
+        first = amounts("repeat")
+        User.objects.get(username="repeat").delete()
+        self.assertEqual(amounts("repeat"), first)
+
+    def test_seed_data_command(self):
+        call_command("seed_data", "--users", "2", "--expenses", "20", "--prefix", "demo", stdout=StringIO())
+        self.assertEqual(Expense.objects.filter(user__username__in=["demo1", "demo2"]).count(), 40)
+
+
+class BenchViewsTests(TestCase):
+    def test_every_url_is_benchmarked_or_skipped(self):
+        self.assertEqual(bench_views.unlisted_views(), [])
+
+    def test_baseline_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.json")
+            out = StringIO()
+            call_command("bench_views", "--scales", "30", "--repeat", "1", "--save", path, stdout=out)
+            with open(path) as f:
+                results = json.load(f)["scales"]["30"]
+            self.assertIn("expense_view", results)
+            self.assertIn("expenses_list?after={cursor}", results)
+            self.assertGreater(results["dash"]["queries"], 0)
+            # Nothing seeded survives the run.
+            self.assertFalse(User.objects.filter(username__startswith="__bench_views_").exists())
+
+            results["dash"]["queries"] = 0
+            with open(path, "w") as f:
+                json.dump({"scales": {"30": results}}, f)
+            with self.assertRaisesMessage(CommandError, "regressed"):
+                call_command("bench_views", "--scales", "30", "--repeat", "1", "--baseline", path, stdout=out)
+
+
+@override_settings(EXPENSES_WRITE_RETRIES=2, EXPENSES_WRITE_RETRY_DELAY=0)
+class WriteRetryTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="pw")
+
+    def flaky(self, failures, error="database is locked"):
+        calls = []
+
+        def write():
+            calls.append(1)
+            # Written before failing, so a retry must not leave it behind.
+            Category.objects.create(user=self.user, name=f"Try {len(calls)}")
+            if len(calls) <= failures:
+                raise OperationalError(error)
+            return len(calls)
+
+        return write
+
+    def test_locked_write_is_retried_in_a_fresh_transaction(self):
+        self.assertEqual(retry.run(self.flaky(2)), 3)
+        self.assertEqual(list(Category.objects.values_list("name", flat=True)), ["Try 3"])
+
+    def test_gives_up_after_the_last_retry(self):
+        with self.assertRaisesMessage(OperationalError, "locked"):
+            retry.run(self.flaky(3))
+        self.assertFalse(Category.objects.exists())
+
+    def test_other_errors_are_not_retried(self):
+        write = self.flaky(1, error="no such table: nope")
+        with self.assertRaisesMessage(OperationalError, "no such table"):
+            retry.run(write)
+        self.assertFalse(Category.objects.exists())
+
+    def test_retried_view_reports_its_messages_once(self):
+        calls = []
+
+        @retry.retry_writes
+        def view(request):
+            calls.append(1)
+            messages.success(request, "Saved.")
+            if len(calls) == 1:
+                raise OperationalError("database is locked")
+            return HttpResponse()
+
+        request = RequestFactory().post("/")
+        request.session = {}
+        request._messages = default_storage(request)
+        view(request)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual([str(m) for m in request._messages], ["Saved."])
+
+    def test_views_only_retry_writes(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse("category_add"), {"name": "Food"})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Category.objects.filter(user=self.user, name="Food").exists())
+
+
+class SqliteProfileTests(TestCase):
+    def test_profile_configures_new_connections(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = dict(connection.settings_dict, NAME=os.path.join(tmp, "tuned.sqlite3"))
+            db.update(settings.EXPENSES_SQLITE_PROFILE)
+            tuned = connections["default"].__class__(db, alias="tuned")
+            try:
+                with tuned.cursor() as cursor:
+                    cursor.execute("PRAGMA journal_mode")
+                    self.assertEqual(cursor.fetchone()[0], "wal")
+                    cursor.execute("PRAGMA temp_store")
+                    self.assertEqual(cursor.fetchone()[0], 2)
+                self.assertEqual(tuned.transaction_mode, "IMMEDIATE")
+            finally:
+                tuned.close()
+
+
+@override_settings(EXPENSES_REPLICA_ALIAS="replica", EXPENSES_REPLICA_PIN_SECONDS=0)
+class ReplicaTests(TransactionTestCase):
+    """A second SQLite file as the replica, refreshed by replicas.sync()."""
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="pw")
+        self.client.force_login(self.user)
+        self.add("Synced")
+        replicas.sync()
+        # Only on the primary from here on.
+        self.add("Not yet replicated")
+
+    def add(self, title):
+        Expense.objects.create(user=self.user, title=title, amount=10, date=date.today())
+
+    def titles(self, response):
+        return {e.title for e in response.context["recent_expenses"]}
+
+    def test_analytics_views_read_from_the_replica(self):
+        with CaptureQueriesContext(connections["replica"]) as on_replica:
+            response = self.client.get(reverse("dash"))
+        self.assertEqual(self.titles(response), {"Synced"})
+        self.assertTrue(on_replica.captured_queries)
+
+        export = self.client.get(reverse("export_csv"))
+        body = b"".join(export.streaming_content).decode()
+        self.assertIn("Synced", body)
+        self.assertNotIn("Not yet replicated", body)
+        # The export log is a write, so it went to the primary.
+        self.assertEqual(ExportLog.objects.using("default").count(), 1)
+
+        # Everything else stays on the primary.
+        response = self.client.get(reverse("expenses_list"))
+        self.assertEqual(len(response.context["expenses"]), 2)
+
+    @override_settings(EXPENSES_REPLICA_PIN_SECONDS=60)
+    def test_recent_writers_are_pinned_to_the_primary(self):
+        with CaptureQueriesContext(connections["replica"]) as on_replica:
+            response = self.client.get(reverse("dash"))
+        self.assertEqual(self.titles(response), {"Synced", "Not yet replicated"})
+        self.assertEqual(on_replica.captured_queries, [])
+
+
+def without_csrf(response):
+    return re.sub(r'name="csrfmiddlewaretoken" value="[^"]*"', "", response.content.decode())
+
+
+class AsyncViewTests(TransactionTestCase):
+    """parallel.gather reads on other connections, which only see committed rows."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="pw")
+        food = Category.objects.create(user=self.user, name="Food")
+        today = date.today()
+        for days, amount in [(0, "12.50"), (3, "40.00"), (40, "99.00")]:
+            Expense.objects.create(user=self.user, category=food, title="Lunch", amount=amount, date=today - timedelta(days=days))
+        Budget.objects.create(user=self.user, category=food, amount=500, month=today.replace(day=1))
+        Goal.objects.create(user=self.user, title="Holiday", target_amount=1000, deadline=today)
+        Notification.objects.create(user=self.user, message="Budget at 80%")
+
+    def request(self, path):
+        request = RequestFactory().get(path)
+        request.user = self.user
+
+        async def auser():
+            return self.user
+
+        request.auser = auser
+        return request
+
+    def test_queries_run_concurrently_with_the_same_results(self):
+        queries = {
+            "count": lambda: Expense.objects.filter(user=self.user).count(),
+            "titles": lambda: sorted(Category.objects.values_list("name", flat=True)),
+        }
+        self.assertEqual(async_to_sync(parallel.gather)(queries), {"count": 3, "titles": ["Food"]})
+
+    def test_worker_queries_are_counted_in_the_request_sample(self):
+        sample = metrics.Sample(keep_sql=True)
+        with sample.wrapping():
+            async_to_sync(parallel.gather)({
+                "count": lambda: Expense.objects.filter(user=self.user).count(),
+                "titles": lambda: list(Category.objects.values_list("name", flat=True)),
+            })
+        self.assertEqual(sample.queries, 2)
+        self.assertIsNone(metrics._current.get())
+
+    def test_async_pages_render_like_the_sync_ones(self):
+        for sync_view, async_view, path in [
+            (views.dash, views.dash_async, "/dash/"),
+            (views.monthly_overview, views.monthly_overview_async, "/overview/"),
+            (views.notifications, views.notifications_async, "/notifications/"),
+        ]:
+            with self.subTest(path=path):
+                # Neither may be served the other's cached context.
+                caching.bump(self.user.pk)
+                expected = sync_view(self.request(path))
+                caching.bump(self.user.pk)
+                response = async_to_sync(async_view)(self.request(path))
+                self.assertEqual(response.status_code, 200)
+                # CSRF tokens are masked afresh on every render.
+                self.assertEqual(without_csrf(response), without_csrf(expected))
@@ -0,0 +1,84 @@
+"""
+Per-user unread notification counter.
+
+``UserProfile.unread_notifications`` is kept in step with the Notification
+rows so the badge on every page is read from the profile instead of a COUNT.
+Single saves and deletes go through signals.py; bulk paths (mark all read,
+generate_notifications) call ``adjust``/``adjust_many`` with the number of
+rows they changed. Every change is an ``UPDATE ... SET n = n + delta``, so
+concurrent requests can't lose each other's updates. ``reconcile`` recounts
+from the notifications in one statement if the two ever drift apart.
+"""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Notification, UserProfile
+
+
+def _actual_count():
+    return Coalesce(
+        Subquery(
+            Notification.objects.filter(user_id=OuterRef("user_id"), is_read=False)
+            .order_by()
+            .values("user_id")
+            .annotate(n=Count("id"))
+            .values("n")
+        ),
+        Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _create_missing(user_ids):
+    # Profiles are made on sign-up; this covers users from before that.
+    UserProfile.objects.bulk_create(
+        [UserProfile(user_id=pk) for pk in user_ids], ignore_conflicts=True
+    )
+
+
+def adjust(user_id, delta):
+    adjust_many({user_id: delta})
+
+
+def adjust_many(deltas):
+    """Add ``deltas[user_id]`` to each user's counter."""
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    table = connection.ops.quote_name(UserProfile._meta.db_table)
+    sql = f"UPDATE {table} SET unread_notifications = unread_notifications + %s WHERE user_id = %s"
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(delta, pk) for pk, delta in deltas.items()])
+        if cursor.rowcount == len(deltas):
+            return
+    existing = set(UserProfile.objects.filter(user_id__in=deltas).values_list("user_id", flat=True))
+    missing = [pk for pk in deltas if pk not in existing]
+    _create_missing(missing)
+    UserProfile.objects.filter(user_id__in=missing).update(unread_notifications=_actual_count())
+
+
+def count_for(user):
+    """
+    The user's unread count. Free when ``user.userprofile`` is already
+    loaded (see backends.ProfileBackend), one query otherwise.
+    """
+    try:
+        count = user.userprofile.unread_notifications
+    except UserProfile.DoesNotExist:
+        return 0
+    return max(count, 0)
+
+
+def reconcile():
+    """Recount every user's unread notifications; returns the profiles fixed."""
+    _create_missing(
+        User.objects.filter(userprofile__isnull=True).values_list("pk", flat=True)
+    )
+    actual = _actual_count()
+    return (
+        UserProfile.objects.annotate(actual=actual)
+        .filter(~Q(unread_notifications=F("actual")))
+        .update(unread_notifications=actual)
+    )
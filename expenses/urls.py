@@ -1,22 +1,29 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Under ASGI (ea/asgi.py turns EXPENSES_ASYNC_VIEWS on) these pages are
+# served by their async versions.
+ASYNC = settings.EXPENSES_ASYNC_VIEWS
+
 urlpatterns = [
     
 
     # Dashboard
     path('', views.home ,name= 'home'),
-    path("dash/", views.dash, name="dash"),
+    path("dash/", views.dash_async if ASYNC else views.dash, name="dash"),
     path('login/', views.login_view, name="login"),
     path('register/', views.register, name="register"),
 
     # Expenses
     path("expenses/", views.expenses_list, name="expenses_list"),
     path("expense/add/", views.expense_add, name="expense_add"),
+    path("expenses/import/", views.expense_import, name="expense_import"),
     path("expense/<int:id>/edit/", views.expense_edit, name="expense_edit"),
     path("expense/<int:id>/view/", views.expense_view, name="expense_view"),
     path("expense/<int:id>/delete/", views.expense_delete, name="expense_delete"),
     path("expenses/pending/", views.pending_expenses, name="pending_expenses"),
+    path("expenses/bulk/", views.expenses_bulk, name="expenses_bulk"),
 
     # Recurring Expenses
     path("recurring/", views.recurring_list, name="recurring_list"),
@@ -32,25 +39,41 @@ urlpatterns = [
 
     # Budgets
     path("budgets/", views.budgets_list, name="budgets_list"),
+    path("budgets/history/", views.budget_history, name="budget_history"),
     path("budget/add/", views.budget_add, name="budget_add"),
     path("budget/<int:id>/edit/", views.budget_edit, name="budget_edit"),
     path("budget/<int:id>/delete/", views.budget_delete, name="budget_delete"),
     path("budget/set/", views.set_budget, name="set_budget"),
 
+    # Goals
+    path("goal/<int:id>/", views.goal_detail, name="goal_detail"),
+    path("goal/<int:id>/contribute/", views.goal_contribute, name="goal_contribute"),
+    path("contribution/<int:id>/delete/", views.contribution_delete, name="contribution_delete"),
+
     # Monthly Overview
-    path("overview/", views.monthly_overview, name="monthly_overview"),
+    path("overview/", views.monthly_overview_async if ASYNC else views.monthly_overview, name="monthly_overview"),
 
     # Monthly Report
     path("report/", views.monthly_report, name="monthly_report"),
+    path("report/range/", views.range_report, name="range_report"),
+
+    # Analytics API (JSON)
+    path("api/spend/", views.api_spend, name="api_spend"),
+    path("api/categories/", views.api_categories, name="api_categories"),
+    path("api/budgets/", views.api_budgets, name="api_budgets"),
 
     # Notifications
-    path("notifications/", views.notifications, name="notifications"),
+    path("notifications/", views.notifications_async if ASYNC else views.notifications, name="notifications"),
     path("notifications/mark-all/", views.notifications_mark_all_read, name="notifications_mark_all_read"),
     path("notification/<int:id>/toggle/", views.notification_toggle_read, name="notification_toggle_read"),
+    path("notifications/bulk/", views.notifications_bulk, name="notifications_bulk"),
 
     # Profile
     path("profile/", views.profile, name="profile"),
 
     # Export CSV
     path("export/", views.export_csv, name="export_csv"),
+
+    # Prometheus metrics (EXPENSES_METRICS)
+    path("metrics/", views.prometheus_metrics, name="metrics"),
 ]
\ No newline at end of file
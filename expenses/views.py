@@ -1,17 +1,29 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Sum, Q
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.contrib.auth.models import User
-import csv
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+import io
+from asgiref.sync import sync_to_async
 from datetime import date
+from decimal import Decimal
 from .models import (
     Expense, Category, RecurringExpense, Budget,
-    Goal, Notification, UserProfile
+    Goal, GoalContribution, Notification, UserProfile
 )
+from . import analytics, anomalies, budgets, bulk, caching, exports, forecast, goals, metrics, pagination, parallel, reports, rollups, unread
+from . import search as search_index
+from .importer import ExpenseImporter, detect_format
+from .replicas import read_replica
+from .retry import retry_writes
 
 # ------------------------------------------------------
 # AUTH
@@ -70,56 +82,69 @@ def home(request):
 # ------------------------------------------------------
 # DASHBOARD
 # ------------------------------------------------------
-@login_required
-def dash(request):
-    today = timezone.now().date()
-    month_start = today.replace(day=1)
-
-    today_spent = Expense.objects.filter(
-        user=request.user, date=today, status="PAID"
-    ).aggregate(total=Sum("amount"))["total"] or 0
-
-    month_spent = Expense.objects.filter(
-        user=request.user, date__gte=month_start, status="PAID"
-    ).aggregate(total=Sum("amount"))["total"] or 0
-
-    budgets = Budget.objects.filter(user=request.user)
-    total_budget = sum(b.amount for b in budgets)
+def _dash_queries(user, today):
+    """The dashboard's independent queries, run in turn by ``dash`` and together by ``dash_async``."""
+    return {
+        "periods": lambda: rollups.period_totals(user, today, status="PAID"),
+        "total_budget": lambda: budgets.month_total(user, today.replace(day=1)),
+        "forecast": lambda: forecast.project(user, today),
+        "recent_expenses": lambda: list(Expense.objects.filter(
+            user=user
+        ).select_related("category").order_by("-date")[:5]),
+        "top_categories": lambda: list(rollups.by_category(user)[:5]),
+        # Progress is kept on the goal, so this is one query however long
+        # the contribution ledgers are.
+        "goals": lambda: goals.progress(Goal.objects.filter(user=user), today),
+        # Written by detect_anomalies; newest first.
+        "insights": lambda: list(Notification.objects.filter(
+            user=user, key__startswith=anomalies.KEY_PREFIX
+        ).order_by("-created_at")[:3]),
+    }
+
+
+def _dash_summary(today, results):
+    periods = results["periods"]
+    today_spent = periods["today"].total
+    month_spent = periods["month"].total
+
+    total_budget = results["total_budget"]
     remaining_budget = total_budget - month_spent
-    estimated_savings = remaining_budget
+    estimated_savings = total_budget - Decimal(str(results["forecast"].month_end))
 
     used_percent = (month_spent * 100 / total_budget) if total_budget > 0 else 0
 
-    recent_expenses = Expense.objects.filter(
-        user=request.user
-    ).order_by("-date")[:5]
-
-    top_categories = (
-        Expense.objects.filter(user=request.user)
-        .values("category__name")
-        .annotate(total=Sum("amount"))
-        .order_by("-total")[:5]
-    )
-
-    goals = Goal.objects.filter(user=request.user)
-
-    notifications_unread = Notification.objects.filter(
-        user=request.user, is_read=False
-    ).count()
-
-    return render(request, "expenses/dash.html", {
+    return {
         "today": today,
+        "periods": periods,
         "today_spent": today_spent,
         "month_spent": month_spent,
         "total_budget": total_budget,
         "remaining_budget": remaining_budget,
         "estimated_savings": estimated_savings,
         "used_percent": used_percent,
-        "recent_expenses": recent_expenses,
-        "top_categories": top_categories,
-        "goals": goals,
-        "notifications_unread_count": notifications_unread,
-    })
+        "recent_expenses": results["recent_expenses"],
+        "top_categories": results["top_categories"],
+        "goals": results["goals"],
+        "insights": results["insights"],
+    }
+
+
+def _run_in_turn(queries):
+    return {name: query() for name, query in queries.items()}
+
+
+def _dash_context(user, today):
+    return _dash_summary(today, _run_in_turn(_dash_queries(user, today)))
+
+
+@login_required
+@read_replica
+def dash(request):
+    today = timezone.now().date()
+    context = caching.cached_context(
+        request.user, "dash", [today], lambda: _dash_context(request.user, today)
+    )
+    return render(request, "expenses/dash.html", context)
 
 
 # ------------------------------------------------------
@@ -127,34 +152,69 @@ def dash(request):
 # ------------------------------------------------------
 @login_required
 def expenses_list(request):
-    expenses = Expense.objects.filter(user=request.user).order_by('-date')
+    expenses = Expense.objects.filter(user=request.user).select_related("category")
     categories = Category.objects.filter(user=request.user)
 
     search = request.GET.get("search", "")
     category_id = request.GET.get("category", "")
     status = request.GET.get("status", "")
 
-    if search:
-        expenses = expenses.filter(
-            Q(title__icontains=search) |
-            Q(amount__icontains=search) |
-            Q(date__icontains=search) |
-            Q(category__name__icontains=search)
-        )
-
     if category_id:
         expenses = expenses.filter(category__id=category_id)
 
     if status:
         expenses = expenses.filter(status=status)
 
+    if search and request.GET.get("sort") == "relevance":
+        best = search_index.ranked(
+            expenses, request.user, search, settings.EXPENSES_LIST_PAGE_SIZE
+        )
+        if best is not None:
+            return render(request, "expenses/expenses_list.html", {
+                "expenses": best,
+                "categories": categories,
+            })
+
+    if search:
+        expenses = search_index.filter_expenses(expenses, request.user, search)
+
+    page = pagination.paginate(
+        expenses,
+        settings.EXPENSES_LIST_PAGE_SIZE,
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+    )
+
     return render(request, "expenses/expenses_list.html", {
-        "expenses": expenses,
+        "expenses": page,
+        "page": page,
         "categories": categories,
     })
 
 
 @login_required
+def expense_import(request):
+    result = None
+
+    if request.method == "POST" and request.FILES.get("file"):
+        upload = request.FILES["file"]
+        fmt = request.POST.get("format") or detect_format(upload.name)
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        result = ExpenseImporter(request.user).run(stream, fmt)
+        if result.failed:
+            messages.error(
+                request, f"Import stopped: {result.failed}. {result.created} expenses were imported before that."
+            )
+        elif result.rejected or not result.created:
+            messages.warning(request, f"Imported {result.created} expenses; {result.rejected} rows were rejected.")
+        else:
+            messages.success(request, f"Imported {result.created} expenses.")
+
+    return render(request, "expenses/expense_import.html", {"result": result})
+
+
+@login_required
+@retry_writes
 def expense_add(request):
     categories = Category.objects.filter(user=request.user)
 
@@ -177,6 +237,7 @@ def expense_add(request):
 
 
 @login_required
+@retry_writes
 def expense_edit(request, id):
     expense = get_object_or_404(Expense, id=id, user=request.user)
     categories = Category.objects.filter(user=request.user)
@@ -206,6 +267,7 @@ def expense_view(request, id):
 
 
 @login_required
+@retry_writes(methods=("GET", "POST"))
 def expense_delete(request, id):
     expense = get_object_or_404(Expense, id=id, user=request.user)
     expense.delete()
@@ -217,8 +279,78 @@ def expense_delete(request, id):
 def pending_expenses(request):
     pending = Expense.objects.filter(
         user=request.user, status="PENDING"
+    ).select_related("category")
+
+    page = pagination.paginate(
+        pending,
+        settings.EXPENSES_PENDING_PAGE_SIZE,
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
     )
-    return render(request, "expenses/pending_expenses.html", {"pending": pending})
+    return render(request, "expenses/pending_expenses.html", {
+        "pending": page,
+        "page": page,
+        "categories": Category.objects.filter(user=request.user),
+    })
+
+
+def _selection(request):
+    """The ids ticked on a list page; None when more than bulk.MAX_SELECTION."""
+    ids = {int(pk) for pk in request.POST.getlist("ids") if pk.isdigit()}
+    return sorted(ids) if len(ids) <= bulk.MAX_SELECTION else None
+
+
+def _back(request, fallback):
+    # Back to the list page (with its filters and cursor) the form was on.
+    url = request.POST.get("next", "")
+    if url_has_allowed_host_and_scheme(url, allowed_hosts={request.get_host()}, require_https=request.is_secure()):
+        return redirect(url)
+    return redirect(fallback)
+
+
+@login_required
+@retry_writes
+def expenses_bulk(request):
+    if request.method != "POST":
+        return redirect("expenses_list")
+
+    ids = _selection(request)
+    action = request.POST.get("action")
+    if ids is None:
+        messages.error(request, f"Select at most {bulk.MAX_SELECTION} expenses at a time.")
+    elif not ids:
+        messages.error(request, "Select some expenses first.")
+    elif action == "paid":
+        changed = bulk.update_expenses(request.user, ids, status="PAID")
+        messages.success(request, f"{changed} expenses marked paid.")
+    elif action == "category":
+        category_id = request.POST.get("category", "")
+        category = Category.objects.filter(
+            user=request.user, id=int(category_id) if category_id.isdigit() else None
+        ).first()
+        if category is None:
+            messages.error(request, "Choose a category.")
+        else:
+            changed = bulk.update_expenses(request.user, ids, category_id=category.pk)
+            messages.success(request, f"{changed} expenses moved to {category.name}.")
+    elif action == "date":
+        try:
+            day = date.fromisoformat(request.POST.get("date", ""))
+        except ValueError:
+            messages.error(request, "Choose a date.")
+        else:
+            try:
+                changed = bulk.update_expenses(request.user, ids, date=day)
+            except IntegrityError:
+                messages.error(request, "Postings of one recurring expense can't share a date.")
+            else:
+                messages.success(request, f"{changed} expenses moved to {day}.")
+    elif action == "delete":
+        deleted = bulk.delete_expenses(request.user, ids)
+        messages.success(request, f"{deleted} expenses deleted.")
+    else:
+        messages.error(request, "Unknown action.")
+    return _back(request, "expenses_list")
 
 
 # ------------------------------------------------------
@@ -231,6 +363,7 @@ def recurring_list(request):
 
 
 @login_required
+@retry_writes
 def recurring_add(request):
     categories = Category.objects.filter(user=request.user)
 
@@ -256,6 +389,7 @@ def recurring_add(request):
 
 
 @login_required
+@retry_writes
 def recurring_edit(request, id):
     r = get_object_or_404(RecurringExpense, id=id, user=request.user)
 
@@ -273,10 +407,12 @@ def recurring_edit(request, id):
         "form_title": "Edit",
         "button_text": "Update",
         "r": r,
+        "today": date.today().isoformat(),
     })
 
 
 @login_required
+@retry_writes(methods=("GET", "POST"))
 def recurring_delete(request, id):
     r = get_object_or_404(RecurringExpense, id=id, user=request.user)
     r.delete()
@@ -294,6 +430,7 @@ def categories_list(request):
 
 
 @login_required
+@retry_writes
 def category_add(request):
     if request.method == "POST":
         Category.objects.create(
@@ -311,6 +448,7 @@ def category_add(request):
 
 
 @login_required
+@retry_writes
 def category_edit(request, id):
     c = get_object_or_404(Category, id=id, user=request.user)
 
@@ -330,6 +468,7 @@ def category_edit(request, id):
 
 
 @login_required
+@retry_writes(methods=("GET", "POST"))
 def category_delete(request, id):
     c = get_object_or_404(Category, id=id, user=request.user)
     c.delete()
@@ -345,16 +484,39 @@ def budgets_list(request):
     today = timezone.now().date()
     month_start = today.replace(day=1)
 
-    budgets = Budget.objects.filter(user=request.user, month=month_start)
-    total_budget = sum(b.amount for b in budgets)
+    month = budgets.Month(month_start, budgets.progress(
+        Budget.objects.filter(user=request.user, month=month_start).select_related("category"),
+        end=today,
+    ))
 
     return render(request, "expenses/budgets_list.html", {
-        "budgets": budgets,
-        "total_budget": total_budget,
+        "budgets": month.budgets,
+        "month": month,
+        "total_budget": month.amount,
+    })
+
+
+@login_required
+def budget_history(request):
+    today = timezone.now().date()
+    try:
+        months = int(request.GET.get("months", settings.EXPENSES_BUDGET_HISTORY_MONTHS))
+    except ValueError:
+        months = settings.EXPENSES_BUDGET_HISTORY_MONTHS
+    months = min(max(months, 1), budgets.MAX_HISTORY_MONTHS)
+
+    history = caching.cached_context(
+        request.user, "budget_history", [today, months],
+        lambda: budgets.history(request.user, today, months),
+    )
+    return render(request, "expenses/budget_history.html", {
+        "history": history,
+        "months": months,
     })
 
 
 @login_required
+@retry_writes
 def budget_add(request):
     categories = Category.objects.filter(user=request.user)
 
@@ -377,6 +539,7 @@ def budget_add(request):
 
 
 @login_required
+@retry_writes
 def budget_edit(request, id):
     budget = get_object_or_404(Budget, id=id, user=request.user)
     categories = Category.objects.filter(user=request.user)
@@ -399,6 +562,7 @@ def budget_edit(request, id):
 
 
 @login_required
+@retry_writes(methods=("GET", "POST"))
 def budget_delete(request, id):
     budget = get_object_or_404(Budget, id=id, user=request.user)
     budget.delete()
@@ -407,6 +571,7 @@ def budget_delete(request, id):
 
 
 @login_required
+@retry_writes
 def set_budget(request):
     categories = Category.objects.filter(user=request.user)
     today = timezone.now().date()
@@ -441,66 +606,217 @@ def set_budget(request):
 
 
 # ------------------------------------------------------
-# MONTHLY OVERVIEW
+# GOALS
 # ------------------------------------------------------
 @login_required
-def monthly_overview(request):
+def goal_detail(request, id):
     today = timezone.now().date()
-    month_start = today.replace(day=1)
+    goal = get_object_or_404(Goal, id=id, user=request.user)
+    goals.progress([goal], today)
+
+    page = pagination.paginate(
+        goal.contributions.all(),
+        settings.EXPENSES_LIST_PAGE_SIZE,
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+    )
+    return render(request, "expenses/goal_detail.html", {
+        "goal": goal,
+        "months": goals.monthly_totals(goal),
+        "contributions": page,
+        "page": page,
+        "today": today,
+    })
 
-    month_spent = Expense.objects.filter(
-        user=request.user, date__gte=month_start, status="PAID"
-    ).aggregate(total=Sum("amount"))["total"] or 0
 
-    top_categories = (
-        Expense.objects.filter(user=request.user, date__gte=month_start)
-        .values("category__name")
-        .annotate(total=Sum("amount"))
-        .order_by("-total")
-    )
+@login_required
+@retry_writes
+def goal_contribute(request, id):
+    goal = get_object_or_404(Goal, id=id, user=request.user)
 
-    budgets = Budget.objects.filter(user=request.user)
-    total_budget = sum(b.amount for b in budgets)
-    remaining_budget = total_budget - month_spent
+    if request.method == "POST":
+        # Cleaned by the model's own fields: the signal copies the amount
+        # into the goal's totals, where a non-finite one breaks every page.
+        fields = GoalContribution._meta
+        try:
+            values = {
+                name: fields.get_field(name).clean(request.POST.get(name, ""), None)
+                for name in ("amount", "date", "note")
+            }
+        except ValidationError:
+            messages.error(request, "Enter an amount (up to 99,999,999.99) and a date.")
+        else:
+            GoalContribution.objects.create(user=request.user, goal=goal, **values)
+            messages.success(request, "Contribution added!")
 
-    return render(request, "expenses/monthly_overview.html", {
-        "month_spent": month_spent,
-        "top_categories": top_categories,
-        "remaining_budget": remaining_budget,
-    })
+    return redirect("goal_detail", id=goal.id)
+
+
+@login_required
+@retry_writes(methods=("GET", "POST"))
+def contribution_delete(request, id):
+    contribution = get_object_or_404(GoalContribution, id=id, user=request.user)
+    contribution.delete()
+    messages.success(request, "Contribution deleted.")
+    return redirect("goal_detail", id=contribution.goal_id)
 
 
 # ------------------------------------------------------
-# MONTHLY REPORT
+# MONTHLY OVERVIEW
 # ------------------------------------------------------
+def _monthly_overview_queries(user, today):
+    return {
+        "month": lambda: rollups.period_totals(user, today, status="PAID")["month"],
+        "top_categories": lambda: list(rollups.by_category(user, start=today.replace(day=1))),
+        "total_budget": lambda: budgets.month_total(user, today.replace(day=1)),
+        "forecast": lambda: forecast.project(user, today),
+    }
+
+
+def _monthly_overview_summary(results):
+    month = results["month"]
+    month_spent = month.total
+    total_budget = results["total_budget"]
+    projection = results["forecast"]
+
+    return {
+        "month": month,
+        "month_spent": month_spent,
+        "top_categories": results["top_categories"],
+        "remaining_budget": total_budget - month_spent,
+        "forecast": projection,
+        "projected_remaining": total_budget - Decimal(str(projection.month_end)),
+    }
+
+
+def _monthly_overview_context(user, today):
+    return _monthly_overview_summary(_run_in_turn(_monthly_overview_queries(user, today)))
+
+
 @login_required
-def monthly_report(request):
+@read_replica
+def monthly_overview(request):
     today = timezone.now().date()
+    context = caching.cached_context(
+        request.user, "monthly_overview", [today],
+        lambda: _monthly_overview_context(request.user, today),
+    )
+    return render(request, "expenses/monthly_overview.html", context)
+
+
+# ------------------------------------------------------
+# MONTHLY REPORT
+# ------------------------------------------------------
+def _monthly_report_context(user, today):
     month_start = today.replace(day=1)
 
-    month_spent = Expense.objects.filter(
-        user=request.user, date__gte=month_start
-    ).aggregate(total=Sum("amount"))["total"] or 0
+    month = rollups.period_totals(user, today)["month"]
+    month_spent = month.total
 
-    top_categories = (
-        Expense.objects.filter(user=request.user, date__gte=month_start)
-        .values("category__name")
-        .annotate(total=Sum("amount"))
-        .order_by("-total")
-    )
+    top_categories = list(rollups.by_category(user, start=month_start))
 
-    return render(request, "expenses/monthly_report.html", {
+    return {
+        "month": month,
         "month_spent": month_spent,
         "top_categories": top_categories,
         "net_savings": 0,
         "total_income": 0,
+    }
+
+
+@login_required
+@read_replica
+def monthly_report(request):
+    today = timezone.now().date()
+    context = caching.cached_context(
+        request.user, "monthly_report", [today],
+        lambda: _monthly_report_context(request.user, today),
+    )
+    return render(request, "expenses/monthly_report.html", context)
+
+
+# ------------------------------------------------------
+# RANGE REPORT
+# ------------------------------------------------------
+@login_required
+def range_report(request):
+    today = timezone.now().date()
+    error = None
+    try:
+        group = analytics.parse_group(request.GET)
+        start, end = analytics.parse_range(request.GET, today, group)
+    except analytics.InvalidQuery as e:
+        error = str(e)
+        start, end, group = today.replace(day=1), today, "day"
+
+    report = caching.cached_context(
+        request.user, "range_report", [start, end, group],
+        lambda: reports.build(request.user, start, end, group),
+    )
+    return render(request, "expenses/range_report.html", {
+        "report": report,
+        "groups": list(rollups.GROUPINGS),
+        "error": error,
     })
 
 
+# ------------------------------------------------------
+# ANALYTICS API
+# ------------------------------------------------------
+# ETag and Last-Modified come from the user's data version (a cache read),
+# so a poll with If-None-Match / If-Modified-Since is answered with a 304
+# before any aggregate runs. no-cache makes browsers revalidate every time.
+def _analytics_etag(request, *args, **kwargs):
+    return analytics.etag(request.user, timezone.now().date())
+
+
+def _analytics_last_modified(request, *args, **kwargs):
+    return analytics.last_modified(request.user, timezone.now().date())
+
+
+def _analytics_endpoint(view):
+    view = condition(etag_func=_analytics_etag, last_modified_func=_analytics_last_modified)(view)
+    view = cache_control(private=True, no_cache=True)(view)
+    return login_required(view)
+
+
+def _analytics_response(request, name, parse, build):
+    today = timezone.now().date()
+    try:
+        args = parse(request.GET, today)
+    except analytics.InvalidQuery as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    payload = caching.cached_context(
+        request.user, name, [today, *args], lambda: build(request.user, *args)
+    )
+    return JsonResponse(payload)
+
+
+@_analytics_endpoint
+def api_spend(request):
+    def parse(params, today):
+        group = analytics.parse_group(params)
+        return (group, *analytics.parse_range(params, today, group), analytics.parse_status(params))
+    return _analytics_response(request, "api_spend", parse, analytics.spend_series)
+
+
+@_analytics_endpoint
+def api_categories(request):
+    def parse(params, today):
+        return (*analytics.parse_range(params, today), analytics.parse_status(params))
+    return _analytics_response(request, "api_categories", parse, analytics.spend_by_category)
+
+
+@_analytics_endpoint
+def api_budgets(request):
+    return _analytics_response(request, "api_budgets", analytics.parse_range, analytics.budget_vs_actual)
+
+
 # ------------------------------------------------------
 # PROFILE
 # ------------------------------------------------------
 @login_required
+@retry_writes
 def profile(request):
     profile, created = UserProfile.objects.get_or_create(user=request.user)
 
@@ -529,16 +845,45 @@ def notifications(request):
 
 
 @login_required
+@retry_writes(methods=("GET", "POST"))
 def notifications_mark_all_read(request):
-    Notification.objects.filter(user=request.user).update(is_read=True)
+    with transaction.atomic():
+        changed = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        unread.adjust(request.user.pk, -changed)
+    caching.bump(request.user.pk)
     return redirect("notifications")
 
 
 @login_required
+@retry_writes(methods=("GET", "POST"))
 def notification_toggle_read(request, id):
-    n = get_object_or_404(Notification, id=id, user=request.user)
-    n.is_read = not n.is_read
-    n.save()
+    with transaction.atomic():
+        n = get_object_or_404(Notification, id=id, user=request.user)
+        n.is_read = not n.is_read
+        n.save()
+    return redirect("notifications")
+
+
+@login_required
+@retry_writes
+def notifications_bulk(request):
+    if request.method != "POST":
+        return redirect("notifications")
+
+    ids = _selection(request)
+    action = request.POST.get("action")
+    if ids is None:
+        messages.error(request, f"Select at most {bulk.MAX_SELECTION} notifications at a time.")
+    elif not ids:
+        messages.error(request, "Select some notifications first.")
+    elif action == "read":
+        marked = bulk.mark_notifications_read(request.user, ids)
+        messages.success(request, f"{marked} notifications marked read.")
+    elif action == "delete":
+        deleted = bulk.delete_notifications(request.user, ids)
+        messages.success(request, f"{deleted} notifications deleted.")
+    else:
+        messages.error(request, "Unknown action.")
     return redirect("notifications")
 
 
@@ -546,23 +891,70 @@ def notification_toggle_read(request, id):
 # EXPORT CSV
 # ------------------------------------------------------
 @login_required
+@read_replica
 def export_csv(request):
-    expenses = Expense.objects.filter(user=request.user)
-
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = "attachment; filename=expenses.csv"
-    
-    writer = csv.writer(response)
-    writer.writerow(["Title", "Category", "Amount", "Date", "Status"])
-
-    for e in expenses:
-        writer.writerow([
-            e.title,
-            e.category.name if e.category else "-",
-            e.amount,
-            e.date,
-            e.status
-        ])
+    gzip = request.GET.get("gzip") == "1"
+    try:
+        start, end = (
+            date.fromisoformat(request.GET[name]) if request.GET.get(name) else None
+            for name in ("from", "to")
+        )
+    except ValueError:
+        return HttpResponse("from and to must be YYYY-MM-DD", status=400, content_type="text/plain")
+    rows = exports.expense_rows(request.user, start=start, end=end)
 
+    response = StreamingHttpResponse(
+        exports.stream_csv(request.user, rows, gzip=gzip),
+        content_type="application/gzip" if gzip else "text/csv",
+    )
+    filename = "expenses.csv.gz" if gzip else "expenses.csv"
+    response["Content-Disposition"] = f"attachment; filename={filename}"
     return response
-    
+
+
+# ------------------------------------------------------
+# ASYNC VERSIONS (ASGI, EXPENSES_ASYNC_VIEWS)
+# ------------------------------------------------------
+# The same pages with their independent queries run at once (parallel.py).
+# Templates are rendered in a worker thread: the context processors and
+# templates may still touch the database through the sync ORM.
+@login_required
+@read_replica
+async def dash_async(request):
+    request.user = await request.auser()
+    today = timezone.now().date()
+
+    async def build():
+        return _dash_summary(today, await parallel.gather(_dash_queries(request.user, today)))
+
+    context = await caching.acached_context(request.user, "dash", [today], build)
+    return await sync_to_async(render)(request, "expenses/dash.html", context)
+
+
+@login_required
+@read_replica
+async def monthly_overview_async(request):
+    request.user = await request.auser()
+    today = timezone.now().date()
+
+    async def build():
+        return _monthly_overview_summary(await parallel.gather(_monthly_overview_queries(request.user, today)))
+
+    context = await caching.acached_context(request.user, "monthly_overview", [today], build)
+    return await sync_to_async(render)(request, "expenses/monthly_overview.html", context)
+
+
+@login_required
+async def notifications_async(request):
+    request.user = await request.auser()
+    notes = [n async for n in Notification.objects.filter(user=request.user).order_by("-created_at")]
+    return await sync_to_async(render)(request, "expenses/notifications.html", {"notifications": notes})
+
+
+# ------------------------------------------------------
+# METRICS
+# ------------------------------------------------------
+def prometheus_metrics(request):
+    if not settings.EXPENSES_METRICS:
+        raise Http404
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")